@@ -0,0 +1,78 @@
+import os
+import time
+import json
+import boto3
+import logging
+from botocore.exceptions import ClientError
+
+# Setup logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Idempotency table shared with the worker: one record per request_id
+dynamodb = boto3.resource('dynamodb')
+table = dynamodb.Table(os.environ['IDEMPOTENCY_TABLE_NAME'])
+
+STATUS_IN_PROGRESS = "IN_PROGRESS"
+STATUS_CANCELLED = "CANCELLED"
+
+# Cancel markers are removed by the table's TTL after this many seconds
+RECORD_TTL_SECONDS = int(os.environ.get("IDEMPOTENCY_TTL_SECONDS", str(24 * 3600)))
+
+
+def lambda_handler(event, context):
+    """
+    Marks a request as cancelled so the worker skips it instead of calling Bedrock.
+
+    Accepts request_id as a query string parameter or in a JSON body. A request that
+    has already been answered can't be cancelled (409). One that is being answered right
+    now finishes, but won't be retried.
+    """
+    try:
+        query_params = event.get('queryStringParameters') or {}
+        body = event.get('body') or {}
+        if isinstance(body, str):
+            body = json.loads(body) if body else {}
+        request_id = query_params.get('request_id') or body.get('request_id')
+
+        if not request_id:
+            return {
+                'statusCode': 400,
+                'body': json.dumps({'error': 'Missing request_id'})
+            }
+
+        now = int(time.time())
+        try:
+            table.update_item(
+                Key={'request_id': request_id},
+                UpdateExpression="SET #status = :cancelled, cancelled_at = :now, "
+                                 "expires_at = if_not_exists(expires_at, :expires)",
+                ConditionExpression="attribute_not_exists(request_id) OR #status IN (:in_progress, :cancelled)",
+                ExpressionAttributeNames={'#status': 'status'},
+                ExpressionAttributeValues={
+                    ':cancelled': STATUS_CANCELLED,
+                    ':in_progress': STATUS_IN_PROGRESS,
+                    ':now': now,
+                    ':expires': now + RECORD_TTL_SECONDS
+                }
+            )
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+                raise
+            return {
+                'statusCode': 409,
+                'body': json.dumps({'error': 'Request already answered', 'request_id': request_id})
+            }
+
+        logger.info(f"🚫 Request {request_id} cancelled")
+        return {
+            'statusCode': 200,
+            'body': json.dumps({'request_id': request_id, 'status': STATUS_CANCELLED})
+        }
+
+    except Exception as e:
+        logger.error(f"Error in cancel Lambda: {str(e)}")
+        return {
+            'statusCode': 500,
+            'body': json.dumps({'error': str(e)})
+        }
@@ -43,7 +43,11 @@ def lambda_handler(event, context):
 
         return {
             'statusCode': 200,
-            'body': json.dumps({'answer': clean_item.get('answer', 'No answer yet')})
+            'body': json.dumps({
+                'answer': clean_item.get('answer', 'No answer yet'),
+                'degradation_mode': clean_item.get('degradation_mode', 'normal'),
+                'trace_id': clean_item.get('trace_id')
+            })
         }
 
     except Exception as e:
@@ -2,10 +2,12 @@ import os
 import json
 import boto3
 from boto3.dynamodb.conditions import Attr
+from utils.profiling import profiled
 
 dynamodb = boto3.resource('dynamodb')
 table = dynamodb.Table(os.environ['TABLE_NAME'])
 
+@profiled
 def lambda_handler(event, context):
     try:
         query_params = event.get('queryStringParameters') or {}
@@ -1,10 +1,12 @@
 import os
 import boto3
 import json
+import time
 import uuid
 import logging
 from datetime import datetime
 from utils.validation import validate_input_fields
+from utils import tracing
 
 # Setup logging
 logger = logging.getLogger()
@@ -16,6 +18,42 @@ sqs = boto3.client('sqs')
 # Get the SQS queue URL from environment variables
 QUEUE_URL = os.environ['QUEUE_URL']
 
+# Worker function invoked synchronously for dry runs (cost estimates without calling the model)
+WORKER_FUNCTION_NAME = os.environ.get('WORKER_FUNCTION_NAME')
+lambda_client = boto3.client('lambda') if WORKER_FUNCTION_NAME else None
+
+
+def dry_run(question, topic):
+    """
+    Asks the worker what the question would cost, without queueing it.
+
+    Returns:
+        dict: API Gateway response with the worker's estimate.
+    """
+    if lambda_client is None:
+        return {
+            'statusCode': 501,
+            'body': json.dumps({'error': 'Dry runs are not configured (WORKER_FUNCTION_NAME is not set)'})
+        }
+
+    response = lambda_client.invoke(
+        FunctionName=WORKER_FUNCTION_NAME,
+        InvocationType='RequestResponse',
+        Payload=json.dumps({'dry_run': True, 'question': question, 'topic': topic})
+    )
+    estimate = json.loads(response['Payload'].read())
+    if 'FunctionError' in response or 'error' in estimate:
+        logger.warning(f"Dry run failed: {json.dumps(estimate)}")
+        return {
+            'statusCode': 400 if 'error' in estimate else 502,
+            'body': json.dumps({'error': estimate.get('error') or estimate.get('errorMessage', 'Dry run failed')})
+        }
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps({'dry_run': estimate})
+    }
+
 def lambda_handler(event, context):
     try:
         # Try parsing from API Gateway body
@@ -40,6 +78,10 @@ def lambda_handler(event, context):
         user_id = body['user_id'].strip()
         topic = body['topic'].strip().lower()
 
+        # 🧮 Estimate only: nothing is queued and the model is not called
+        if body.get('dry_run') is True:
+            return dry_run(question, topic)
+
         # Create a unique question ID and timestamp
         request_id = str(uuid.uuid4())
         timestamp = datetime.utcnow().isoformat()
@@ -50,21 +92,37 @@ def lambda_handler(event, context):
             'user_id': user_id,
             'question': question,
             'topic': topic,
-            'timestamp': timestamp
+            'timestamp': timestamp,
+            'submitted_at': int(time.time())  # lets the worker drop requests nobody waits for any more
         }
 
+        # 🐞 Ask the worker to log this request in full (every level, no sampling)
+        if body.get('debug') is True:
+            message['debug'] = True
+
         logger.info(f"Sending message to SQS: {json.dumps(message)}")
 
-        # Send the message to the SQS queue
-        sqs.send_message(
-            QueueUrl=QUEUE_URL,
-            MessageBody=json.dumps(message)
-        )
+        # 🧵 The trace runs from here to the stored answer; the worker continues it from the
+        # traceparent message attribute. Debug requests are always kept.
+        with tracing.start_trace("submit.ask", sampled=body.get('debug') is True, request_id=request_id, topic=topic):
+            with tracing.span("sqs.send_message"):
+                # Send the message to the SQS queue
+                sqs.send_message(
+                    QueueUrl=QUEUE_URL,
+                    MessageBody=json.dumps(message),
+                    MessageAttributes={
+                        tracing.TRACEPARENT_ATTRIBUTE: {
+                            'DataType': 'String',
+                            'StringValue': tracing.current_traceparent()
+                        }
+                    }
+                )
+            trace_id = tracing.current_trace_id()
 
         # Return the full message sent to SQS in the response
         return {
             'statusCode': 200,
-            'body': json.dumps({'message': message})
+            'body': json.dumps({'message': message, 'trace_id': trace_id})
         }
 
     except Exception as e:
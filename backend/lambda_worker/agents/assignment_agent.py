@@ -1,21 +1,22 @@
 import os
-import boto3
 import json
 import logging
-from agents.owasp_agent import handle_owasp_question
+from agents.owasp_agent import build_owasp_prompt
+from agents.orchestrator import get_policy
+from utils.bedrock import retrieve_and_generate
+from utils.deadline import DeadlineExceeded
+from utils.structured_log import get_logger
 
 # Setup logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+slog = get_logger("assignment_agent")
+
 # Load config
-model_id = os.environ["MODEL_ID"]
 kb_id = os.environ["KB_ID"]
 region = os.environ.get("AWS_REGION", "ap-northeast-1")
 
-# Bedrock runtime client
-bedrock_runtime = boto3.client("bedrock-agent-runtime", region_name=region)
-
 # Load prompt template
 PROMPT_FILE = os.path.join(os.path.dirname(__file__), "prompts", "assignment_prompt.txt")
 with open(PROMPT_FILE, "r", encoding="utf-8") as f:
@@ -35,34 +36,55 @@ def expand_if_vague(question: str) -> str:
         return f"can you tell me  about : '{question}'?"
     return question
 
-def handle_assignment_question(question: str) -> str:
+def handoff_topic(question: str) -> str:
+    """
+    Returns the topic that should answer an assignment question.
+
+    Security questions go to "owasp". The orchestrator routes them there itself, so they
+    get the OWASP policy (degraded like any OWASP request) and wait for an OWASP slot.
     """
-    Handles assignment questions. Routes to OWASP agent if security-related.
-    Otherwise, queries Bedrock knowledge base.
+    return "owasp" if is_owasp_related(question) else "assignment"
+
+
+def build_assignment_prompt(question: str, policy=None):
     """
-    logger.info(f"Assignment Agent received question: {question}")
+    Renders the input an assignment question is sent with (also used by dry runs).
 
+    Returns:
+        tuple: (agent, prompt) where agent is "owasp" for security questions, which
+        are handed to the OWASP agent, and "assignment" otherwise.
+    """
     if is_owasp_related(question):
-        logger.info("Detected OWASP-related topic. Routing to OWASP agent.")
-        return handle_owasp_question(question)
+        return build_owasp_prompt(question)
+    return "assignment", f"{static_prompt}\n\nQuestion: {expand_if_vague(question)}"
+
+
+def handle_assignment_question(question: str, deadline=None, policy=None) -> str:
+    """
+    Handles assignment questions by querying the Bedrock knowledge base.
+    Security-related ones never get here: see handoff_topic.
+    """
+    slog.info("Assignment Agent received question", question=question, question_chars=len(question))
+    policy = policy or get_policy("assignment")
 
-    expanded_question = expand_if_vague(question)
-    full_input = f"{static_prompt}\n\nQuestion: {expanded_question}"
+    _, full_input = build_assignment_prompt(question, policy)
 
     try:
-        response = bedrock_runtime.retrieve_and_generate(
-            input={"text": full_input},
-            retrieveAndGenerateConfiguration={
-                "type": "KNOWLEDGE_BASE",
-                "knowledgeBaseConfiguration": {
-                    "knowledgeBaseId": kb_id,
-                    "modelArn": f"arn:aws:bedrock:{region}::foundation-model/{model_id}"
-                }
-            }
+        response = retrieve_and_generate(
+            full_input,
+            kb_id,
+            policy.model_id,
+            deadline=deadline,
+            region=region,
+            max_tokens=policy.max_tokens,
+            temperature=policy.temperature,
+            hedge=policy.hedge
         )
         logger.info("Received response from Bedrock Assignment KB")
         return response["output"]["text"]
 
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         logger.error(f"❌ Failed to retrieve answer: {e}")
         raise RuntimeError(f"Assignment Agent failed to get answer from Bedrock: {e}")
\ No newline at end of file
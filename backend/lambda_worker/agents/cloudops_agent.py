@@ -1,10 +1,12 @@
 import os
-import boto3
 import json
 import logging
+from agents.orchestrator import get_policy
+from utils.bedrock import retrieve_and_generate
+from utils.deadline import DeadlineExceeded
+from utils.structured_log import get_logger
 
 
-model_id = os.environ["MODEL_ID"]
 kb_id = os.environ.get("CLOUDOPS_KB_ID","A3SDSQCK4G")  # fallback
 region = os.environ.get("AWS_REGION", "ap-northeast-1")
 
@@ -13,10 +15,19 @@ region = os.environ.get("AWS_REGION", "ap-northeast-1")
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# Bedrock runtime client
-bedrock_runtime = boto3.client("bedrock-agent-runtime", region_name=region)
+slog = get_logger("cloudops_agent")
 
-def handle_cloudops_question(question: str, prompt: str = None) -> str:
+def build_cloudops_prompt(question: str, policy=None, prompt: str = None):
+    """
+    Renders the input a cloudops question is sent with (also used by dry runs).
+
+    Returns:
+        tuple: ("cloudops", the input text before knowledge base retrieval).
+    """
+    return "cloudops", (f"{prompt.strip()}\n\n{question}" if prompt else question)
+
+
+def handle_cloudops_question(question: str, prompt: str = None, deadline=None, policy=None) -> str:
     """
     Uses Amazon Bedrock RetrieveAndGenerate to answer cloud operations questions
     with knowledge base context and optional prompt prefix.
@@ -24,27 +35,32 @@ def handle_cloudops_question(question: str, prompt: str = None) -> str:
     Args:
         question (str): The user's cloudops question.
         prompt (str): An optional prompt prefix to guide the model.
+        deadline (Deadline, optional): Time budget for the Bedrock call.
+        policy (AgentPolicy, optional): Model and token limits. Defaults to the "cloudops" policy.
 
     Returns:
         str: The model-generated answer using KB context.
     """
-    logger.info(f"☁️ CloudOps Agent handling question: {question}")
+    slog.info("☁️ CloudOps Agent handling question", question=question, question_chars=len(question))
 
-    user_input = f"{prompt.strip()}\n\n{question}" if prompt else question
+    _, user_input = build_cloudops_prompt(question, prompt=prompt)
+    policy = policy or get_policy("cloudops")
 
     try:
-        response = bedrock_runtime.retrieve_and_generate(
-            input={"text": user_input},
-            retrieveAndGenerateConfiguration={
-                "type": "KNOWLEDGE_BASE",
-                "knowledgeBaseConfiguration": {
-                    "knowledgeBaseId": kb_id,
-                    "modelArn": f"arn:aws:bedrock:{bedrock_runtime.meta.region_name}::foundation-model/{model_id}"
-                }
-            }
+        response = retrieve_and_generate(
+            user_input,
+            kb_id,
+            policy.model_id,
+            deadline=deadline,
+            region=region,
+            max_tokens=policy.max_tokens,
+            temperature=policy.temperature,
+            hedge=policy.hedge
         )
         return response["output"]["text"]
 
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         logger.error(f"❌ CloudOps Agent Failed to retrieve answer: {e}")
         raise RuntimeError("CloudOps Agent encountered an error.") from e
\ No newline at end of file
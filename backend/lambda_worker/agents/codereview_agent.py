@@ -1,11 +1,14 @@
-import os
-import boto3
 import json
+from agents.orchestrator import get_policy
+from utils.bedrock import invoke_model
 
-def run_codereview_agent(question: str) -> str:
-    bedrock = boto3.client("bedrock-runtime")
-    model_id = os.environ.get("MODEL_ID", "anthropic.claude-3-5-sonnet-20240620")
+def build_codereview_prompt(question: str, policy=None):
+    """
+    Renders the prompt submitted code is reviewed with (also used by dry runs).
 
+    Returns:
+        tuple: ("codereview", the rendered prompt).
+    """
     # Updated prompt now includes request for hardened version of the code
     prompt = """You are a secure coding reviewer.
 
@@ -34,24 +37,24 @@ Please provide the following:
 """
 
     student_code = question.strip() if question else "[Code not provided]"
-    prompt_text = prompt.format(student_code=student_code)
+    return "codereview", prompt.format(student_code=student_code)
 
-    body = json.dumps({
-        "anthropic_version": "bedrock-2023-05-31",
+
+def run_codereview_agent(question: str, deadline=None, policy=None) -> str:
+    policy = policy or get_policy("codereview")
+    _, prompt_text = build_codereview_prompt(question, policy)
+
+    body = {
         "messages": [
             {
                 "role": "user",
                 "content": prompt_text
             }
         ],
-        "max_tokens": 2048
-    })
-
-    response = bedrock.invoke_model(
-        modelId=model_id,
-        body=body,
-        accept="application/json",
-        contentType="application/json"
-    )
+        "max_tokens": policy.max_tokens,
+        "temperature": policy.temperature
+    }
 
-    return response["body"].read().decode("utf-8").strip()
+    # The frontend parses the full Messages API response, so return it as a JSON string
+    response = invoke_model(policy.model_id, body, deadline=deadline, hedge=policy.hedge)
+    return json.dumps(response)
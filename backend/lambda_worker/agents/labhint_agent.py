@@ -1,10 +1,12 @@
 import json
-import boto3
-import os
-import traceback
 import re  # Needed for regex-based JSON extraction
+from agents.orchestrator import get_policy
+from utils.bedrock import invoke_model
+from utils.deadline import DeadlineExceeded
+from utils.microbatch import BatchParseError, split_answers, tag_questions
+from utils.structured_log import get_logger
 
-bedrock = boto3.client("bedrock-runtime")
+slog = get_logger("labhint_agent")
 
 # Few-shot examples to guide the model's behavior
 FEW_SHOT_HINTS = """
@@ -21,13 +23,27 @@ Example 2:
 }
 """
 
-def run_labhint_agent(task: str, labnotes: str = "", topic: str = "Secure Coding Lab", agent: str = "labhints") -> dict:
-    try:
-        # Construct the prompt as a single user message
-        messages = [
-            {
-                "role": "user",
-                "content": f"""You are a helpful assistant for secure coding lab students.
+def _hint_response(hint_json: dict, topic: str, agent: str) -> dict:
+    return {
+        "statusCode": 200,
+        "body": json.dumps({
+            "message": {
+                "answer": hint_json,  # ✅ Safe parsed dict
+                "topic": topic,
+                "agent": agent
+            }
+        })
+    }
+
+
+def build_labhint_prompt(task: str, policy=None, labnotes: str = ""):
+    """
+    Renders the prompt a lab task is sent with (also used by dry runs).
+
+    Returns:
+        tuple: ("labhint", the rendered prompt).
+    """
+    return "labhint", f"""You are a helpful assistant for secure coding lab students.
 
 Your job is to give clear, concise **hints** (not solutions) to help them complete lab tasks. Do not reveal any answer directly. Use the lab context and examples to craft your response.
 
@@ -44,28 +60,27 @@ Return format:
   "hint": "..."
 }}
 """
-            }
-        ]
 
-        # Invoke Bedrock model with Anthropic Claude 3.5
-        response = bedrock.invoke_model(
-            modelId=os.environ.get("MODEL_ID", "anthropic.claude-3-5-sonnet-20240620"),
-            body=json.dumps({
-                "messages": messages,
-                "max_tokens": 512,
-                "temperature": 0.4,
-                "anthropic_version": "bedrock-2023-05-31"
-            }),
-            accept="application/json",
-            contentType="application/json"
-        )
 
-        # Read the raw model response as a string
-        raw_body = response["body"].read().decode("utf-8")
-        print("📦 Raw Bedrock Output:", raw_body)
+def run_labhint_agent(task: str, labnotes: str = "", topic: str = "Secure Coding Lab", agent: str = "labhints", deadline=None, policy=None) -> dict:
+    policy = policy or get_policy("labhint")
+    try:
+        # Construct the prompt as a single user message
+        _, prompt = build_labhint_prompt(task, policy, labnotes)
+        messages = [{"role": "user", "content": prompt}]
 
-        # Parse top-level JSON returned by Bedrock
-        completion = json.loads(raw_body)
+        # Invoke Bedrock model with Anthropic Claude 3.5 (returns the parsed top-level JSON)
+        completion = invoke_model(
+            policy.model_id,
+            {
+                "messages": messages,
+                "max_tokens": policy.max_tokens,
+                "temperature": policy.temperature
+            },
+            deadline=deadline,
+            hedge=policy.hedge
+        )
+        slog.debug("📦 Raw Bedrock output", completion=completion)
 
         # Extract the content of the assistant's message
         # This usually includes natural language + structured data
@@ -83,25 +98,72 @@ Return format:
             # Attempt to parse the extracted JSON string
             hint_json = json.loads(json_str)
         except json.JSONDecodeError as je:
-            # Print raw text for debugging before raising the error
-            print("⚠️ Failed to parse model output:")
-            print(text)
+            # Log (a capped copy of) the raw text before raising the error
+            slog.warning("⚠️ Failed to parse model output", text=text)
             raise RuntimeError("Model returned malformed JSON.") from je
 
         # Return the parsed hint with topic/agent metadata
-        return {
-            "statusCode": 200,
-            "body": json.dumps({
-                "message": {
-                    "answer": hint_json,  # ✅ Safe parsed dict
-                    "topic": topic,
-                    "agent": agent
-                }
-            })
-        }
+        return _hint_response(hint_json, topic, agent)
 
+    except DeadlineExceeded:
+        # Out of time: let the worker put the record back on the queue
+        raise
     except Exception as e:
         # Catch-all exception block with stack trace
-        print("❌ Exception while generating hint:")
-        traceback.print_exc()
+        slog.exception("❌ Exception while generating hint")
         raise RuntimeError("❌ Error generating lab hint") from e
+
+
+def run_labhint_batch(tasks: list, topic: str = "Secure Coding Lab", agent: str = "labhints", deadline=None, policy=None) -> list:
+    """
+    Gives hints for several lab tasks with one Bedrock call (micro-batching).
+
+    The instructions and few-shot examples are sent once; the model answers each task
+    in its own <answer id="N"> block containing the usual {"hint": "..."} JSON.
+
+    Returns:
+        list[dict]: One response per task, shaped like run_labhint_agent's.
+
+    Raises:
+        BatchParseError: If any answer is missing or isn't valid JSON.
+    """
+    policy = policy or get_policy("labhint")
+    prompt = f"""You are a helpful assistant for secure coding lab students.
+
+Your job is to give clear, concise **hints** (not solutions) to help them complete lab tasks. Do not reveal any answer directly. Use the examples to craft your responses.
+
+{FEW_SHOT_HINTS}
+
+Now provide a helpful hint for each of these lab tasks, independently:
+
+{tag_questions(tasks)}
+
+Wrap each hint in <answer id="N">...</answer> tags with the id of its task, using this format inside the tags:
+{{
+  "hint": "..."
+}}
+"""
+
+    completion = invoke_model(
+        policy.model_id,
+        {
+            "messages": [{"role": "user", "content": prompt}],
+            "max_tokens": policy.max_tokens,
+            "temperature": policy.temperature
+        },
+        deadline=deadline,
+        hedge=policy.hedge
+    )
+
+    text = completion.get("content", [{}])[0].get("text", "")
+    responses = []
+    for answer in split_answers(text, len(tasks)):
+        match = re.search(r"\{.*\}", answer, re.DOTALL)
+        try:
+            hint_json = json.loads(match.group()) if match else None
+        except json.JSONDecodeError:
+            hint_json = None
+        if not isinstance(hint_json, dict):
+            raise BatchParseError("Model returned a hint that is not a JSON object")
+        responses.append(_hint_response(hint_json, topic, agent))
+    return responses
@@ -1,36 +1,542 @@
+import contextvars
+import importlib
 import logging
-from agents.owasp_agent import handle_owasp_question
-from agents.assignment_agent import handle_assignment_question
-from agents.cloudops_agent import handle_cloudops_question
-from agents.sc_labquiz_gen_agent import handle_sc_labquiz_gen  # ✅ New agent import
-from agents.labhint_agent import run_labhint_agent
-from agents.codereview_agent import run_codereview_agent
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import json
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from utils.bedrock import is_retryable, record_usage
+from utils.deadline import Deadline, DeadlineExceeded
+from utils.hedging import HedgePolicy
+from utils.degradation import NORMAL, degrade_policy
+from utils.shadow import SHADOW_TIMEOUT_SECONDS, candidate_policy, differs, measurement, shadow_runner
+from utils.quota import RAG_CONTEXT_TOKEN_ESTIMATE, estimate_tokens
+from utils.pricing import estimate_cost
+from utils import metrics
+from utils import tracing
+from utils import openmetrics
 
 
 # Setup logger
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-def route_question(question: str, topic: str) -> str:
+
+def _lazy_handler(module_name: str, handler_name: str):
+    """Returns a factory that imports the agent module and returns its handler."""
+    def factory():
+        module = importlib.import_module(module_name)
+        return getattr(module, handler_name)
+    return factory
+
+
+# Topic -> agent factory. Agent modules are only imported the first time their topic is seen,
+# so a cold start never pays for boto3 clients, prompt files or env vars of unused agents.
+AGENT_REGISTRY = {
+    "owasp": _lazy_handler("agents.owasp_agent", "handle_owasp_question"),
+    "assignment": _lazy_handler("agents.assignment_agent", "handle_assignment_question"),
+    "cloudops": _lazy_handler("agents.cloudops_agent", "handle_cloudops_question"),
+    "sc-labquiz-gen": _lazy_handler("agents.sc_labquiz_gen_agent", "handle_sc_labquiz_gen"),  # ✅ Lab quiz generation
+    "labhint": _lazy_handler("agents.labhint_agent", "run_labhint_agent"),
+    "codereview": _lazy_handler("agents.codereview_agent", "run_codereview_agent"),
+}
+
+# Topic -> multi-question handler, used by micro-batching (utils/microbatch.py).
+# Called as handler(questions, deadline=..., policy=...) and returns one answer per question.
+BATCH_REGISTRY = {
+    "owasp": _lazy_handler("agents.owasp_agent", "handle_owasp_batch"),
+    "labhint": _lazy_handler("agents.labhint_agent", "run_labhint_batch"),
+}
+
+# Topic -> prompt builder, used by dry runs. Called as builder(question, policy) and returns
+# (agent, rendered prompt): the agent that would actually answer and exactly what it would send.
+PROMPT_REGISTRY = {
+    "owasp": _lazy_handler("agents.owasp_agent", "build_owasp_prompt"),
+    "assignment": _lazy_handler("agents.assignment_agent", "build_assignment_prompt"),
+    "cloudops": _lazy_handler("agents.cloudops_agent", "build_cloudops_prompt"),
+    "sc-labquiz-gen": _lazy_handler("agents.sc_labquiz_gen_agent", "build_sc_labquiz_gen_prompt"),
+    "labhint": _lazy_handler("agents.labhint_agent", "build_labhint_prompt"),
+    "codereview": _lazy_handler("agents.codereview_agent", "build_codereview_prompt"),
+}
+
+# Topic -> hand-off check, called as check(question) and returning the topic that should answer it
+# (e.g. security questions sent to "assignment" are answered by "owasp" under its own policy)
+HANDOFF_REGISTRY = {
+    "assignment": _lazy_handler("agents.assignment_agent", "handoff_topic"),
+}
+
+# Agents whose prompt is sent through RetrieveAndGenerate, so knowledge base passages are added to it
+RETRIEVAL_AGENTS = {"assignment", "cloudops"}
+
+# Output tokens assumed for dry runs of policies without max_tokens (the service decides)
+DRY_RUN_OUTPUT_TOKENS = int(os.environ.get("DRY_RUN_OUTPUT_TOKENS", "1024"))
+
+# Rendered prompt size (estimated tokens, before any retrieved passages) above which a dry run
+# warns that the input is oversized, e.g. whole lab notes pasted into a labhint question
+DRY_RUN_MAX_PROMPT_TOKENS = int(os.environ.get("DRY_RUN_MAX_PROMPT_TOKENS", "2000"))
+
+# Default foundation model (Claude 3.5 Sonnet) unless a policy says otherwise
+DEFAULT_MODEL_ID = os.environ.get("MODEL_ID", "anthropic.claude-3-5-sonnet-20240620")
+
+# 🪁 Optional hedging for latency-sensitive topics: a backup request to HEDGE_MODEL_ID and/or
+# HEDGE_REGION once the primary is slower than its HEDGE_PERCENTILE latency
+HEDGING_ENABLED = os.environ.get("BEDROCK_HEDGING", "off").lower() == "on"
+INTERACTIVE_HEDGE = HedgePolicy(
+    model_id=os.environ.get("HEDGE_MODEL_ID"),
+    region=os.environ.get("HEDGE_REGION"),
+    percentile=float(os.environ.get("HEDGE_PERCENTILE", "95")),
+    min_delay_seconds=float(os.environ.get("HEDGE_MIN_DELAY_SECONDS", "2")),
+) if HEDGING_ENABLED else None
+
+
+@dataclass(frozen=True)
+class AgentPolicy:
+    """Execution limits the dispatcher enforces for one topic."""
+    timeout_seconds: float  # budget for one agent attempt
+    max_concurrency: int  # concurrent calls per topic in this process
+    max_retries: int  # extra attempts on throttling/transient errors
+    backoff_seconds: float  # base delay, doubled on every retry (with jitter)
+    model_id: str = DEFAULT_MODEL_ID
+    max_tokens: int = None  # None = leave it to the service (RetrieveAndGenerate)
+    temperature: float = None
+    hedge: HedgePolicy = None  # None = never send a backup request
+    prompt_variant: str = None  # None = the agent's default prompt file
+
+
+# Topic -> policy. Heavy topics get small concurrency caps so a burst of them
+# can't take every worker thread away from the fast interactive topics.
+AGENT_POLICIES = {
+    "owasp": AgentPolicy(timeout_seconds=20, max_concurrency=6, max_retries=2, backoff_seconds=0.5,
+                         max_tokens=1500, temperature=0.4, hedge=INTERACTIVE_HEDGE),
+    "labhint": AgentPolicy(timeout_seconds=15, max_concurrency=6, max_retries=2, backoff_seconds=0.5,
+                           max_tokens=512, temperature=0.4, hedge=INTERACTIVE_HEDGE),
+    "assignment": AgentPolicy(timeout_seconds=25, max_concurrency=4, max_retries=1, backoff_seconds=1),
+    "cloudops": AgentPolicy(timeout_seconds=25, max_concurrency=4, max_retries=1, backoff_seconds=1),
+    "sc-labquiz-gen": AgentPolicy(timeout_seconds=45, max_concurrency=2, max_retries=1, backoff_seconds=2,
+                                  max_tokens=2048, temperature=0.3),
+    "codereview": AgentPolicy(timeout_seconds=45, max_concurrency=2, max_retries=1, backoff_seconds=2,
+                              max_tokens=2048),
+}
+
+# Composite topic -> the topics it fans out to (run at the same time, answers merged)
+COMPOSITE_TOPICS = {
+    "assignment+owasp": ("assignment", "owasp"),
+}
+
+# Section headings used when merging branch answers
+TOPIC_TITLES = {
+    "assignment": "📘 Assignment",
+    "owasp": "🛡️ OWASP",
+}
+
+# Branches run on their own pool so they never wait behind the worker's record threads
+_fanout_executor = ThreadPoolExecutor(
+    max_workers=2 * int(os.environ.get("WORKER_CONCURRENCY", "10")),
+    thread_name_prefix="fanout"
+)
+
+# Token limit of a micro-batched call (policy max_tokens × questions, capped here)
+MAX_BATCH_TOKENS = int(os.environ.get("MICROBATCH_MAX_TOKENS", "4096"))
+
+# Per-topic concurrency slots, sized from the policy table
+_topic_slots = {topic: threading.BoundedSemaphore(policy.max_concurrency) for topic, policy in AGENT_POLICIES.items()}
+
+# Agents built so far in this container, and how long each one took to load (ms)
+_agents = {}
+_load_times_ms = {}
+_registry_lock = threading.Lock()
+
+
+def get_agent(topic: str):
+    """
+    Returns the handler for a topic, building it on first use.
+
+    Args:
+        topic (str): Normalized topic name.
+
+    Returns:
+        callable: The agent handler taking the question as first argument.
+
+    Raises:
+        ValueError: If the topic is not registered.
+    """
+    handler = _agents.get(topic)
+    if handler is not None:
+        return handler
+
+    factory = AGENT_REGISTRY.get(topic)
+    if factory is None:
+        raise ValueError(f"❌ Invalid topic received: '{topic}'")
+    return _load_agent(topic, factory)
+
+
+def get_batch_agent(topic: str):
+    """
+    Returns the multi-question handler for a topic, loading its module on first use.
+
+    Raises:
+        ValueError: If the topic has no multi-question handler.
+    """
+    factory = BATCH_REGISTRY.get(topic)
+    if factory is None:
+        raise ValueError(f"❌ Topic '{topic}' does not support batching")
+    return _load_agent(f"{topic}:batch", factory)
+
+
+def _load_agent(key: str, factory):
+    with _registry_lock:
+        # Another worker thread may have built it while we waited for the lock
+        if key not in _agents:
+            start = time.perf_counter()
+            _agents[key] = factory()
+            _load_times_ms[key] = round((time.perf_counter() - start) * 1000, 2)
+            logger.info(f"📦 Loaded agent for '{key}' in {_load_times_ms[key]} ms")
+        return _agents[key]
+
+
+def get_prompt_builder(topic: str):
+    """
+    Returns the prompt builder for a topic, loading its module on first use.
+
+    Raises:
+        ValueError: If the topic has no prompt builder.
+    """
+    factory = PROMPT_REGISTRY.get(topic)
+    if factory is None:
+        raise ValueError(f"❌ Invalid topic received: '{topic}'")
+    return _load_agent(f"{topic}:prompt", factory)
+
+
+def resolve_topic(question: str, topic: str) -> str:
+    """Returns the topic that actually answers the question, after any hand-off (HANDOFF_REGISTRY)."""
     topic = topic.strip().lower()
+    factory = HANDOFF_REGISTRY.get(topic)
+    if factory is None:
+        return topic
+    return _load_agent(f"{topic}:handoff", factory)(question)
 
-    try:
-        logger.info(f"🔁 Routing question for topic: '{topic}'")
-
-        if topic == "owasp":
-            return handle_owasp_question(question)
-        elif topic == "assignment":
-            return handle_assignment_question(question)
-        elif topic == "cloudops":
-            return handle_cloudops_question(question)
-        elif topic == "sc-labquiz-gen":  # ✅ Route for lab quiz generation
-            return handle_sc_labquiz_gen(question)
-        elif topic == "labhint":  # ✅ Route for lab quiz generation
-            return run_labhint_agent(question)
-        elif topic == "codereview":  # ✅ Route for lab quiz generation
-            return run_codereview_agent(question)
+
+def get_policy(topic: str) -> AgentPolicy:
+    """
+    Returns the execution policy for a topic.
+
+    Raises:
+        ValueError: If the topic has no policy.
+    """
+    policy = AGENT_POLICIES.get(topic)
+    if policy is None:
+        raise ValueError(f"❌ Invalid topic received: '{topic}'")
+    return policy
+
+
+def get_load_times() -> dict:
+    """Returns the measured load time (ms) of every agent built in this container."""
+    return dict(_load_times_ms)
+
+
+def measure_import_times() -> dict:
+    """
+    Measures the cold import time of each registered agent in a fresh interpreter.
+
+    Each agent is imported in its own subprocess so shared modules (boto3, other agents)
+    are not already cached, which is what a cold start actually pays. The timer starts
+    after the orchestrator (and what it imports) is loaded, since every topic pays that
+    the same.
+
+    Returns:
+        dict: topic -> import time in ms, or an error string if the import failed.
+    """
+    worker_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    report = {}
+    for topic in AGENT_REGISTRY:
+        code = (
+            "import time\n"
+            "from agents.orchestrator import AGENT_REGISTRY\n"
+            "start = time.perf_counter()\n"
+            f"AGENT_REGISTRY[{topic!r}]()\n"
+            "print(round((time.perf_counter() - start) * 1000, 2))\n"
+        )
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=worker_root)
+        if result.returncode == 0:
+            report[topic] = float(result.stdout.strip().splitlines()[-1])
         else:
-            raise ValueError(f"❌ Invalid topic received: '{topic}'")
+            last_line = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "unknown error"
+            report[topic] = f"error: {last_line}"
+    return report
+
+
+def _backoff_delay(policy: AgentPolicy, attempt: int) -> float:
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, policy.backoff_seconds * (2 ** attempt))
+
+
+def _call_with_retries(handler, question: str, topic: str, policy: AgentPolicy, deadline: Deadline):
+    """
+    Calls the agent, retrying throttling/transient errors while the deadline allows.
+
+    Every attempt gets its own deadline capped at the policy timeout.
+    """
+    attempt = 0
+    agent = handler.__module__.rsplit(".", 1)[-1]
+    while True:
+        try:
+            with tracing.span("agent", agent=agent, model=policy.model_id, attempt=attempt + 1):
+                return handler(question, deadline=deadline.child(policy.timeout_seconds), policy=policy)
+        except Exception as e:
+            if attempt >= policy.max_retries or not is_retryable(e):
+                raise
+            delay = _backoff_delay(policy, attempt)
+            if deadline.remaining() <= delay + 1:
+                raise
+            attempt += 1
+            openmetrics.RETRIES.inc(topic=topic, kind="agent")
+            logger.warning(f"🔄 Retrying topic '{topic}' (attempt {attempt + 1}) in {delay:.2f}s after: {e}")
+            time.sleep(delay)
+
+
+def _merge_answers(branches: list, answers: dict, errors: dict) -> str:
+    """Merges branch answers into one markdown answer, noting any branch that failed."""
+    sections = []
+    for branch in branches:
+        title = TOPIC_TITLES.get(branch, branch)
+        if branch in answers:
+            answer = answers[branch]
+            text = answer if isinstance(answer, str) else json.dumps(answer)
+            sections.append(f"## {title}\n\n{text}")
+        else:
+            sections.append(f"## {title}\n\n_This part of the answer is unavailable ({errors[branch]})._")
+    return "\n\n".join(sections)
+
+
+def _route_composite(question: str, topic: str, deadline: Deadline, level: int = NORMAL,
+                     request_id: str = None) -> str:
+    """
+    Runs every branch of a composite topic at the same time and merges the answers.
+
+    Each branch keeps its own policy and gets its own timeout, so a slow branch
+    only costs its part of the answer. Fails only if every branch fails.
+    """
+    branches = COMPOSITE_TOPICS[topic]
+    deadline = deadline or Deadline.after(max(get_policy(branch).timeout_seconds for branch in branches))
+
+    futures = {}
+    for branch in branches:
+        branch_deadline = deadline.child(get_policy(branch).timeout_seconds)
+        futures[branch] = (branch_deadline, _fanout_executor.submit(
+            contextvars.copy_context().run, route_question, question, branch, branch_deadline, level=level,
+            request_id=request_id))
+
+    answers, errors, first_error = {}, {}, None
+    for branch, (branch_deadline, future) in futures.items():
+        try:
+            # Small grace on top of the branch deadline for the agent to surface its own timeout
+            answers[branch] = future.result(timeout=branch_deadline.remaining() + 1)
+        except Exception as e:
+            reason = "timed out" if isinstance(e, (DeadlineExceeded, TimeoutError)) else "failed"
+            logger.warning(f"⚠️ Branch '{branch}' of '{topic}' {reason}: {e}")
+            errors[branch] = reason
+            first_error = first_error or e
+
+    if not answers:
+        raise first_error
+
+    return _merge_answers(list(branches), answers, errors)
+
+
+def _agent_started(handler):
+    """Tags the current request's metrics with the agent module about to run."""
+    request_metrics = metrics.current()
+    if request_metrics is not None:
+        request_metrics.agent_started(handler.__module__.rsplit(".", 1)[-1])
+
+
+def _shadow(handler, question: str, topic: str, request_id: str, policy: AgentPolicy, production: dict):
+    """Copies a request to the candidate configuration in the background (utils/shadow.py)."""
+    candidate = candidate_policy(topic, policy)
+    if not differs(policy, candidate):
+        return  # nothing in the candidate configuration applies to this topic
+
+    def run_candidate():
+        return handler(question, deadline=Deadline.after(SHADOW_TIMEOUT_SECONDS), policy=candidate)
+
+    if shadow_runner.submit(topic, request_id, production, candidate, run_candidate):
+        logger.info(f"🌓 Shadowing '{topic}' request {request_id} to {candidate.model_id}")
+
+
+def estimate_question(question: str, topic: str, policy: AgentPolicy = None, level: int = NORMAL) -> dict:
+    """
+    Works out what answering a question would send and cost, without calling the model.
+
+    The prompt is rendered by the agent's own builder, so its length is exact; tokens and
+    cost are estimates (about four characters per token, RAG_CONTEXT_TOKEN_ESTIMATE extra
+    for knowledge base passages, and max_tokens of output as the upper bound).
+
+    Args:
+        question (str): The user's question.
+        topic (str): Topic name from the message.
+        policy (AgentPolicy, optional): Override of the topic's policy.
+        level (int, optional): Backlog degradation level.
+
+    Returns:
+        dict: topic, agent, model_id, prompt_chars, estimated_input_tokens, max_tokens,
+        estimated_cost_usd and warnings. Composite topics add one entry per branch
+        under "branches", with the totals at the top level.
+    """
+    topic = topic.strip().lower()
+    if topic in COMPOSITE_TOPICS:
+        branches = [estimate_question(question, branch, level=level) for branch in COMPOSITE_TOPICS[topic]]
+        costs = [branch["estimated_cost_usd"] for branch in branches]
+        return {
+            "topic": topic,
+            "agent": "+".join(branch["agent"] for branch in branches),
+            "prompt_chars": sum(branch["prompt_chars"] for branch in branches),
+            "estimated_input_tokens": sum(branch["estimated_input_tokens"] for branch in branches),
+            "max_tokens": sum(branch["max_tokens"] for branch in branches),
+            "estimated_cost_usd": None if None in costs else round(sum(costs), 6),
+            "warnings": [warning for branch in branches for warning in branch["warnings"]],
+            "branches": branches,
+        }
+
+    policy = policy or get_policy(topic)
+    agent, prompt = get_prompt_builder(topic)(question, policy)
+    if agent != topic:
+        # Handed over to another agent, which answers under its own policy
+        policy = get_policy(agent)
+    policy = degrade_policy(agent, policy, level)
+
+    prompt_tokens = estimate_tokens(prompt)
+    input_tokens = prompt_tokens + (RAG_CONTEXT_TOKEN_ESTIMATE if agent in RETRIEVAL_AGENTS else 0)
+    max_tokens = policy.max_tokens or DRY_RUN_OUTPUT_TOKENS
+
+    warnings = []
+    if prompt_tokens > DRY_RUN_MAX_PROMPT_TOKENS:
+        warnings.append(f"Prompt of about {prompt_tokens} tokens is over the {DRY_RUN_MAX_PROMPT_TOKENS} token limit")
+    cost = estimate_cost(policy.model_id, input_tokens, max_tokens)
+    if cost is None:
+        warnings.append(f"No price known for model '{policy.model_id}'")
+
+    return {
+        "topic": topic,
+        "agent": agent,
+        "model_id": policy.model_id,
+        "prompt_chars": len(prompt),
+        "estimated_input_tokens": input_tokens,
+        "max_tokens": max_tokens,
+        "estimated_cost_usd": cost,
+        "warnings": warnings,
+    }
+
+
+def route_question(question: str, topic: str, deadline=None, policy: AgentPolicy = None, level: int = NORMAL,
+                   request_id: str = None, dry_run: bool = False):
+    """
+    Routes a question to its agent under the topic's execution policy.
+
+    Args:
+        question (str): The user's question.
+        topic (str): Topic name from the message.
+        deadline (Deadline, optional): Overall time budget. Defaults to the policy timeout.
+        policy (AgentPolicy, optional): Override of the topic's policy.
+        level (int, optional): Backlog degradation level (utils.degradation); from SHORT_TOKENS
+            on the policy gets a token cap and, for non-critical topics, the fast model.
+        request_id (str, optional): Identifies the request in shadow comparisons.
+        dry_run (bool, optional): Return estimate_question() instead of calling the agent.
+
+    Returns:
+        The agent's answer. A sampled copy may run against the shadow configuration
+        afterwards; its result is recorded but never returned.
+    """
+    topic = topic.strip().lower()
+    if dry_run:
+        return estimate_question(question, topic, policy, level)
+
+    try:
+        with tracing.span("route_question", topic=topic, level=level):
+            logger.info(f"🔁 Routing question for topic: '{topic}'")
+            if topic in COMPOSITE_TOPICS:
+                return _route_composite(question, topic, deadline, level, request_id)
+
+            # 🤝 Handed over to another agent: answered under that topic's policy, level and slots
+            target = resolve_topic(question, topic)
+            if target != topic:
+                logger.info(f"🤝 Handing '{topic}' question over to '{target}'")
+                return route_question(question, target, deadline=deadline, level=level, request_id=request_id)
+
+            handler = get_agent(topic)
+            policy = degrade_policy(topic, policy or get_policy(topic), level)
+            deadline = deadline or Deadline.after(policy.timeout_seconds)
+
+            # 🚦 Wait for a free slot for this topic, but never past the deadline
+            slot = _topic_slots[topic]
+            with tracing.span("topic_slot.wait", topic=topic):
+                acquired = slot.acquire(timeout=min(policy.timeout_seconds, deadline.remaining()))
+            if not acquired:
+                raise DeadlineExceeded(
+                    f"No free '{topic}' slot (limit {policy.max_concurrency}) within the time budget")
+            _agent_started(handler)
+            try:
+                with record_usage() as usage:
+                    start = time.perf_counter()
+                    try:
+                        answer = _call_with_retries(handler, question, topic, policy, deadline)
+                    finally:
+                        latency_ms = (time.perf_counter() - start) * 1000
+                        metrics.add("AgentMs", latency_ms)
+            finally:
+                slot.release()
+
+            # 🌓 Only full-quality answers are compared, so degraded traffic never feeds the shadow
+            if level == NORMAL and shadow_runner.should_shadow(topic):
+                _shadow(handler, question, topic, request_id, policy, measurement(policy, latency_ms, usage, answer))
+            return answer
     except Exception as e:
         logger.error(f"❌ Error handling topic '{topic}': {str(e)}")
         raise
+
+
+def route_batch(questions: list, topic: str, deadline=None, level: int = NORMAL) -> list:
+    """
+    Answers several questions of one topic with a single model call.
+
+    Takes one slot of the topic and follows its policy like route_question; the token
+    limit scales with the number of questions.
+
+    Args:
+        questions (list[str]): The questions.
+        topic (str): A topic in BATCH_REGISTRY.
+        deadline (Deadline, optional): Overall time budget. Defaults to the policy timeout.
+        level (int, optional): Backlog degradation level.
+
+    Returns:
+        list: One answer per question, in order.
+
+    Raises:
+        BatchParseError: If the response can't be split back into one answer per question.
+    """
+    topic = topic.strip().lower()
+    handler = get_batch_agent(topic)
+    policy = degrade_policy(topic, get_policy(topic), level)
+    if policy.max_tokens:
+        policy = replace(policy, max_tokens=min(policy.max_tokens * len(questions), MAX_BATCH_TOKENS))
+    deadline = deadline or Deadline.after(policy.timeout_seconds)
+
+    slot = _topic_slots[topic]
+    if not slot.acquire(timeout=min(policy.timeout_seconds, deadline.remaining())):
+        raise DeadlineExceeded(f"No free '{topic}' slot (limit {policy.max_concurrency}) within the time budget")
+    _agent_started(handler)
+    try:
+        with metrics.stage("AgentMs"):
+            return _call_with_retries(handler, questions, topic, policy, deadline)
+    finally:
+        slot.release()
+
+
+if __name__ == "__main__":
+    # Run from backend/lambda_worker: python -m agents.orchestrator
+    for topic, elapsed in measure_import_times().items():
+        print(f"{topic:<16} {elapsed}")
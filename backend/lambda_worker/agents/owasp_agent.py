@@ -1,18 +1,16 @@
-import boto3
 import os
-import json
 import logging
 import random
+from agents.orchestrator import get_policy
+from utils.bedrock import invoke_model
+from utils.microbatch import split_answers, tag_questions
+from utils.structured_log import get_logger
 
 # Setup logger
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# Initialize Bedrock runtime client
-bedrock = boto3.client("bedrock-runtime", region_name=os.environ.get("AWS_REGION", "ap-northeast-1"))
-
-# Foundation model ID for Claude 3.5 (Sonnet)
-MODEL_ID = os.environ.get("MODEL_ID", "anthropic.claude-3-5-sonnet-20240620")
+slog = get_logger("owasp_agent")
 
 # Load prompt template
 PROMPT_FILE = os.path.join(os.path.dirname(__file__), "prompts", "owasp_agent_prompt.txt")
@@ -20,6 +18,28 @@ PROMPT_FILE = os.path.join(os.path.dirname(__file__), "prompts", "owasp_agent_pr
 with open(PROMPT_FILE, "r", encoding="utf-8") as f:
     prompt_template = f.read()
 
+# Prompt variants (owasp_agent_prompt.<variant>.txt) loaded so far, for shadow/candidate policies
+_prompt_variants = {}
+
+
+def get_prompt_template(variant: str = None) -> str:
+    """
+    Returns the prompt template for a policy's prompt_variant.
+
+    Args:
+        variant (str, optional): Variant name; None is the default owasp_agent_prompt.txt.
+
+    Raises:
+        FileNotFoundError: If agents/prompts has no owasp_agent_prompt.<variant>.txt.
+    """
+    if not variant:
+        return prompt_template
+    if variant not in _prompt_variants:
+        path = os.path.join(os.path.dirname(__file__), "prompts", f"owasp_agent_prompt.{variant}.txt")
+        with open(path, "r", encoding="utf-8") as f:
+            _prompt_variants[variant] = f.read()
+    return _prompt_variants[variant]
+
 def get_random_difficulty(weighted=True):
     """Generate a random difficulty level (1-5)."""
     if weighted:
@@ -30,7 +50,21 @@ def get_random_difficulty(weighted=True):
         )[0]
     return random.randint(1, 5)
 
-def handle_owasp_question(question: str, difficulty: int = None) -> str:
+def build_owasp_prompt(question: str, policy=None, difficulty: int = None):
+    """
+    Renders the prompt an OWASP question is sent with (also used by dry runs).
+
+    Returns:
+        tuple: ("owasp", the rendered prompt).
+    """
+    policy = policy or get_policy("owasp")
+    prompt = get_prompt_template(policy.prompt_variant) \
+        .replace("{question}", question) \
+        .replace("{difficulty_level}", str(difficulty or get_random_difficulty()))
+    return "owasp", prompt
+
+
+def handle_owasp_question(question: str, difficulty: int = None, deadline=None, policy=None) -> str:
     """
     Sends the OWASP-related question to Claude 3.5 via Amazon Bedrock Messages API,
     using a structured instructional prompt template.
@@ -38,33 +72,81 @@ def handle_owasp_question(question: str, difficulty: int = None) -> str:
     Args:
         question (str): The OWASP-related question.
         difficulty (int, optional): Difficulty level (1-5). Randomized if not provided.
+        deadline (Deadline, optional): Time budget for the Bedrock call.
+        policy (AgentPolicy, optional): Model and token limits. Defaults to the "owasp" policy.
 
     Returns:
         str: The JSON-formatted answer returned by the model.
     """
-    logger.info(f"Handling OWASP question: {question}")
+    slog.info("Handling OWASP question", question=question, question_chars=len(question))
+    policy = policy or get_policy("owasp")
 
     difficulty_level = difficulty or get_random_difficulty()
     logger.info(f"Using difficulty level: {difficulty_level}")
 
-    full_prompt = prompt_template \
-        .replace("{question}", question) \
-        .replace("{difficulty_level}", str(difficulty_level))
+    _, full_prompt = build_owasp_prompt(question, policy, difficulty_level)
 
-    response = bedrock.invoke_model(
-        modelId=MODEL_ID,
-        body=json.dumps({
-            "anthropic_version": "bedrock-2023-05-31",
+    result = invoke_model(
+        policy.model_id,
+        {
             "messages": [
                 {"role": "user", "content": full_prompt}
             ],
-            "max_tokens": 1500,
-            "temperature": 0.4
-        }),
-        contentType="application/json",
-        accept="application/json"
+            "max_tokens": policy.max_tokens,
+            "temperature": policy.temperature
+        },
+        deadline=deadline,
+        hedge=policy.hedge
     )
 
-    result = json.loads(response['body'].read())
     logger.info("Received response from Claude 3.5")
-    return result['content'][0]['text']
\ No newline at end of file
+    return result['content'][0]['text']
+
+
+def handle_owasp_batch(questions: list, deadline=None, policy=None) -> list:
+    """
+    Answers several short OWASP questions with one Bedrock call (micro-batching).
+
+    The prompt template is sent once, with the questions tagged by id; the model answers
+    each in its own <answer id="N"> block.
+
+    Args:
+        questions (list[str]): The OWASP-related questions.
+        deadline (Deadline, optional): Time budget for the Bedrock call.
+        policy (AgentPolicy, optional): Model and token limits. Defaults to the "owasp" policy.
+
+    Returns:
+        list[str]: One answer per question, in order.
+
+    Raises:
+        BatchParseError: If the response doesn't contain an answer for every question.
+    """
+    logger.info(f"Handling a batch of {len(questions)} OWASP questions")
+    policy = policy or get_policy("owasp")
+
+    difficulties = [{"difficulty": get_random_difficulty()} for _ in questions]
+    batch_block = (
+        "each of the questions below independently, following every rule above for each answer "
+        "(including its own follow_up JSON). Use the difficulty level given on each question. "
+        "Wrap each complete answer in <answer id=\"N\">...</answer> tags with the id of its question, "
+        "and write nothing outside the tags.\n\n" + tag_questions(questions, difficulties)
+    )
+    full_prompt = get_prompt_template(policy.prompt_variant) \
+        .replace("the following question:", "") \
+        .replace("{question}", batch_block) \
+        .replace("{difficulty_level}", "given on each question")
+
+    result = invoke_model(
+        policy.model_id,
+        {
+            "messages": [
+                {"role": "user", "content": full_prompt}
+            ],
+            "max_tokens": policy.max_tokens,
+            "temperature": policy.temperature
+        },
+        deadline=deadline,
+        hedge=policy.hedge
+    )
+
+    return split_answers(result['content'][0]['text'], len(questions))
@@ -1,11 +1,12 @@
 import json
-import boto3
-import os
-import traceback
 import re
 import ast
+from agents.orchestrator import get_policy
+from utils.bedrock import invoke_model
+from utils.deadline import DeadlineExceeded
+from utils.structured_log import get_logger
 
-bedrock = boto3.client("bedrock-runtime")
+slog = get_logger("sc_labquiz_gen_agent")
 
 FEW_SHOT_EXAMPLES = """
 Example 1:
@@ -25,10 +26,14 @@ Example 2:
 }
 """
 
-def handle_sc_labquiz_gen(question: str, topic: str = "Secure Coding Lab", agent: str = "sc-labquiz-gen") -> dict:
-    try:
-        # Prompt with explicit JSON format and strict structure
-        prompt = f"""You are a secure coding lab assistant.
+def build_sc_labquiz_gen_prompt(question: str, policy=None):
+    """
+    Renders the prompt quiz questions are generated from (also used by dry runs).
+
+    Returns:
+        tuple: ("sc-labquiz-gen", the rendered prompt).
+    """
+    return "sc-labquiz-gen", f"""You are a secure coding lab assistant.
 
 Generate exactly 10 multiple-choice questions in **valid JSON format** based on the provided lab notes.
 
@@ -58,29 +63,33 @@ Lab notes:
 \"\"\"{question}\"\"\"
 """
 
+def handle_sc_labquiz_gen(question: str, topic: str = "Secure Coding Lab", agent: str = "sc-labquiz-gen", deadline=None, policy=None) -> dict:
+    policy = policy or get_policy("sc-labquiz-gen")
+    try:
+        # Prompt with explicit JSON format and strict structure
+        _, prompt = build_sc_labquiz_gen_prompt(question, policy)
+
         # Claude 3 Messages API call
-        response = bedrock.invoke_model(
-            modelId=os.environ.get("MODEL_ID", "anthropic.claude-3-5-sonnet-20240620"),
-            body=json.dumps({
-                "anthropic_version": "bedrock-2023-05-31",
+        completion = invoke_model(
+            policy.model_id,
+            {
                 "messages": [
                     {
                         "role": "user",
                         "content": prompt
                     }
                 ],
-                "max_tokens": 2048,
-                "temperature": 0.3
-            }),
-            accept="application/json",
-            contentType="application/json"
+                "max_tokens": policy.max_tokens,
+                "temperature": policy.temperature
+            },
+            deadline=deadline,
+            hedge=policy.hedge
         )
 
         # Parse the Claude response body
-        raw_body = response["body"].read().decode("utf-8")
-        print("📦 Raw Bedrock Output:", raw_body)
+        slog.debug("📦 Raw Bedrock output", completion=completion)
 
-        completion_text = json.loads(raw_body).get("content", [{}])[0].get("text", "{}")
+        completion_text = completion.get("content", [{}])[0].get("text", "{}")
 
         # Auto-remove markdown code block if present (e.g., ```json\n{...}\n```)
         if completion_text.startswith("```"):
@@ -101,13 +110,12 @@ Lab notes:
         try:
             questions_json = json.loads(json_str)
         except json.JSONDecodeError:
-            print("⚠️ JSON parsing failed. Trying ast.literal_eval as fallback...")
+            slog.warning("⚠️ JSON parsing failed. Trying ast.literal_eval as fallback...")
             try:
                 repaired = ast.literal_eval(json_str)
                 questions_json = json.loads(json.dumps(repaired))  # Normalize to proper JSON
             except Exception as fallback_error:
-                print("❌ Fallback also failed. Final raw response:")
-                print(completion_text)
+                slog.error("❌ Fallback also failed", response=completion_text, error=str(fallback_error))
                 raise RuntimeError("Model returned malformed JSON.")
 
         return {
@@ -120,7 +128,9 @@ Lab notes:
             })
         }
 
+    except DeadlineExceeded:
+        # Out of time: let the worker put the record back on the queue
+        raise
     except Exception as e:
-        print("❌ Exception while generating quiz:")
-        traceback.print_exc()
+        slog.exception("❌ Exception while generating quiz")
         raise RuntimeError("❌ Error generating SC Lab Quiz") from e
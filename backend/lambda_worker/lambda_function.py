@@ -1,56 +1,380 @@
 
 import os
 import json
-import boto3
+import math
+import time
 import logging
-from agents.orchestrator import route_question
-from utils.dynamodb import save_answer
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from agents.orchestrator import resolve_topic, route_batch, route_question
+from utils.dynamodb import save_answer, save_shadow_comparison
+from utils.idempotency import RequestCancelledError, claim_request, complete_request, release_request
+from utils.aws_clients import get_sqs_client, get_table
+from utils.bedrock import error_chain
+from utils.heartbeat import VisibilityHeartbeat, queue_url_from_arn
+from utils.deadline import Deadline, DeadlineExceeded
+from utils.region_pool import get_region_stats, region_pool
+from utils.hedging import get_hedge_stats
+from utils.throttling import CircuitOpenError
+from utils.retry_tier import RetryTier
+from utils.degradation import CACHED, NORMAL, DegradationController, answer_mode
+from utils.answer_cache import AnswerCache
+from utils.microbatch import plan_micro_batches
+from utils.shadow import shadow_runner
+from utils.structured_log import bind_request, get_logger
+from utils.profiling import profiled
+from utils import metrics
+from utils import tracing
+from utils import openmetrics
 
 # Set up logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# Per-record events (JSON, sampled and size-capped; see utils/structured_log.py)
+slog = get_logger("worker")
+
+# Number of SQS records processed at the same time (matches the SQS batch size)
+WORKER_CONCURRENCY = int(os.environ.get("WORKER_CONCURRENCY", "10"))
+
 # Initialize AWS clients
-dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table(os.environ['TABLE_NAME'])
+table = get_table(os.environ['TABLE_NAME'])
 
-def lambda_handler(event, context):
+# Idempotency records (one per request_id) guarding against duplicate SQS deliveries
+IDEMPOTENCY_TABLE_NAME = os.environ.get('IDEMPOTENCY_TABLE_NAME')
+idempotency_table = get_table(IDEMPOTENCY_TABLE_NAME) if IDEMPOTENCY_TABLE_NAME else None
+
+# Keeps slow records invisible on the queue while their agent is still running
+heartbeat = VisibilityHeartbeat(get_sqs_client())
+
+# Re-sends transient failures with a delay and dead-letters permanent ones (when configured)
+retry_tier = RetryTier(get_sqs_client())
+
+# Steps through cached answers, shorter token budgets and a faster model as the backlog grows
+degradation = DegradationController(get_sqs_client())
+
+# Recent full-quality answers, served again while the worker is degraded
+answer_cache = AnswerCache()
+
+# Shadow comparisons are stored on the answer item they were measured against
+shadow_runner.sink = lambda request_id, comparison: save_shadow_comparison(table, request_id, comparison)
+
+# Thread pool is created once per container and reused across warm invocations
+executor = ThreadPoolExecutor(max_workers=WORKER_CONCURRENCY, thread_name_prefix="agent")
+
+REQUIRED_KEYS = ['request_id', 'user_id', 'question', 'topic']
+
+# Minimum time (seconds) an agent call needs; with less left the record goes back to the queue
+MIN_AGENT_SECONDS = float(os.environ.get("MIN_AGENT_SECONDS", "5"))
+
+# Requests older than this are dropped unanswered: the client has stopped polling by then (seconds)
+MAX_REQUEST_AGE_SECONDS = float(os.environ.get("MAX_REQUEST_AGE_SECONDS", "300"))
+
+# Delay before a record released for lack of time becomes visible again (seconds)
+DEADLINE_RELEASE_DELAY_SECONDS = int(os.environ.get("DEADLINE_RELEASE_DELAY_SECONDS", "10"))
+
+
+def _release_claim(request_id, lease_token):
+    """Releases a claim after a failure without hiding the original error."""
     try:
-        for record in event['Records']:
-            logger.info("Raw SQS record body: %s", record['body'])
+        release_request(idempotency_table, request_id, lease_token)
+    except Exception as e:
+        logger.warning("⚠️ Could not release claim for request %s: %s", request_id, str(e))
 
-            message = json.loads(record['body'])
-            logger.info("Parsed message from SQS: %s", json.dumps(message, indent=2))
 
-            # ✅ Ensure required fields are present
-            required_keys = ['request_id', 'user_id', 'question', 'topic']
-            missing = [key for key in required_keys if key not in message]
-            if missing:
-                raise KeyError(f"Missing required fields in message: {', '.join(missing)}")
+def _delay_record(queue_url, receipt_handle, delay_seconds):
+    """Makes a record visible again after `delay_seconds` instead of the full visibility timeout."""
+    if not queue_url or not receipt_handle:
+        return
+    try:
+        get_sqs_client().change_message_visibility(
+            QueueUrl=queue_url,
+            ReceiptHandle=receipt_handle,
+            VisibilityTimeout=delay_seconds
+        )
+    except Exception as e:
+        logger.warning("⚠️ Could not release record back to the queue: %s", str(e))
 
-            request_id = message['request_id']
-            user_id = message['user_id']
-            question = message['question']
-            topic = message['topic']
-            timestamp = message.get('timestamp')
 
-            # 🧠 Call the appropriate agent
+def request_age(message, record):
+    """
+    Seconds since the request was submitted, or None if unknown.
+
+    Uses submitted_at (epoch seconds), then the ISO timestamp set by the submit Lambda,
+    then the SQS SentTimestamp of the record.
+    """
+    if message.get('submitted_at') is not None:
+        return time.time() - float(message['submitted_at'])
+    if message.get('timestamp'):
+        try:
+            submitted = datetime.fromisoformat(message['timestamp'])
+            if submitted.tzinfo is None:
+                submitted = submitted.replace(tzinfo=timezone.utc)
+            return time.time() - submitted.timestamp()
+        except ValueError:
+            pass
+    sent_at = record.get('attributes', {}).get('SentTimestamp')
+    return time.time() - int(sent_at) / 1000 if sent_at else None
+
+
+def queue_wait_ms(message, record):
+    """
+    Milliseconds from submission to now, or None if unknown.
+
+    Uses the ISO timestamp set by the submit Lambda (sub-second precision), then
+    falls back to request_age().
+    """
+    if message.get('timestamp'):
+        try:
+            submitted = datetime.fromisoformat(message['timestamp'])
+            if submitted.tzinfo is None:
+                submitted = submitted.replace(tzinfo=timezone.utc)
+            return (time.time() - submitted.timestamp()) * 1000
+        except ValueError:
+            pass
+    age = request_age(message, record)
+    return age * 1000 if age is not None else None
+
+
+def process_record(record, deadline, queue_url=None, micro_batch=None):
+    """
+    Handles a single SQS record: parses the message, calls the agent and saves the answer.
+
+    Failures are handed to the retry tier first. A record it re-sends or dead-letters
+    counts as handled, so it is deleted from its source queue.
+
+    Args:
+        record (dict): One entry of the SQS event's Records list.
+        deadline (Deadline): Time budget shared by the whole batch.
+        queue_url (str, optional): Source queue URL. Derived from the record's
+            eventSourceARN when not given (Lambda event source).
+        micro_batch (MicroBatch, optional): Group this record's question is answered with.
+
+    Raises:
+        Exception: Any failure the retry tier didn't take, so the caller can report
+        the record as a batch item failure.
+    """
+    if queue_url is None and record.get('eventSourceARN'):
+        queue_url = queue_url_from_arn(record['eventSourceARN'])
+
+    attributes = record.get('messageAttributes', {})
+    try:
+        # 🧵 Continues the trace started by the submit Lambda (traceparent message attribute)
+        with tracing.start_trace(
+            "worker.process_record",
+            traceparent=(attributes.get(tracing.TRACEPARENT_ATTRIBUTE) or {}).get('stringValue'),
+            message_id=record.get('messageId'),
+            retry_attempt=(attributes.get('retry_attempt') or {}).get('stringValue')
+        ):
+            _process_record(record, deadline, queue_url, micro_batch)
+    except Exception as e:
+        # 📊 Stage metrics of a record that got as far as its agent (see metrics.start_request)
+        metrics.emit(metrics.current(), failed=True)
+        _count_request("failed")
+        if retry_tier.handle_failure(record, e):
+            return
+        if isinstance(e, DeadlineExceeded):
+            logger.warning("⏱️ Time budget used up for message %s, releasing it with a %ds delay: %s",
+                           record.get('messageId'), DEADLINE_RELEASE_DELAY_SECONDS, str(e))
+            _delay_record(queue_url, record.get('receiptHandle'), DEADLINE_RELEASE_DELAY_SECONDS)
+        else:
+            # 🔴 Bedrock is failing fast (agents may wrap the error): retry once the circuit lets calls through
+            circuit_open = next((err for err in error_chain(e) if isinstance(err, CircuitOpenError)), None)
+            if circuit_open is not None:
+                logger.warning("🔴 Circuit open for message %s, releasing it with a %ds delay",
+                               record.get('messageId'), math.ceil(circuit_open.retry_after))
+                _delay_record(queue_url, record.get('receiptHandle'), math.ceil(circuit_open.retry_after))
+        raise
+    metrics.emit(metrics.current())
+    _count_request("success" if metrics.current() is not None else "skipped")
+
+
+def _count_request(outcome):
+    # Records that stop before their agent (duplicates, bad messages) have no metrics, hence no topic
+    request_metrics = metrics.current()
+    openmetrics.REQUESTS.inc(topic=request_metrics.topic if request_metrics else "none", outcome=outcome)
+
+
+def _answer(question, topic, deadline, level, micro_batch, request_id=None):
+    """Answers through the record's micro-batch when there is one, otherwise with its own call."""
+    if micro_batch is not None:
+        answer = micro_batch.answer(
+            question,
+            lambda questions, batch_deadline: route_batch(questions, topic, deadline=batch_deadline, level=level),
+            deadline
+        )
+        if answer is not None:
+            return answer
+    return route_question(question, topic, deadline=deadline, level=level, request_id=request_id)
+
+
+def _process_record(record, deadline, queue_url, micro_batch=None):
+    message = json.loads(record['body'])
+
+    # ✅ Ensure required fields are present
+    missing = [key for key in REQUIRED_KEYS if key not in message]
+    if missing:
+        raise KeyError(f"Missing required fields in message: {', '.join(missing)}")
+
+    # 🏷️ Every event from here on carries the request; "debug": true logs it in full
+    bind_request(message['request_id'], message['topic'], message.get('debug') is True)
+    slog.info("📥 Parsed message from SQS", message_id=record.get('messageId'), user_id=message['user_id'],
+              question=message['question'], question_chars=len(message['question']))
+    slog.debug("📥 Raw SQS record", body=record['body'], attributes=record.get('attributes'))
+    tracing.annotate(request_id=message['request_id'], topic=message['topic'])
+    if message.get('debug') is True:
+        tracing.keep_trace()
+
+    request_id = message['request_id']
+    user_id = message['user_id']
+    question = message['question']
+    topic = message['topic']
+    timestamp = message.get('timestamp')
+    lease_token = None
+
+    # ⌛ Nobody is waiting for an answer this old any more
+    age = request_age(message, record)
+    if age is not None and age > MAX_REQUEST_AGE_SECONDS:
+        logger.info("⌛ Request %s is %.0fs old (limit %.0fs), skipping it", request_id, age, MAX_REQUEST_AGE_SECONDS)
+        return
+
+    try:
+        # ⏱️ Not enough time left for an agent call: hand the record back instead
+        deadline.check(MIN_AGENT_SECONDS)
+
+        # 🔒 Claim the request so redeliveries don't invoke the model again
+        if idempotency_table is not None:
             try:
-                answer = route_question(question, topic)
-            except Exception as agent_error:
-                logger.error("❌ Error from agent (possibly Bedrock): %s", agent_error)
-                raise
+                lease_token = claim_request(idempotency_table, request_id)
+            except RequestCancelledError:
+                logger.info("🚫 Request %s was cancelled by the client, skipping it", request_id)
+                return
+            if lease_token is None:
+                logger.info("⏭️ Request %s already completed, skipping duplicate delivery", request_id)
+                return
 
-            # 💾 Save result to DynamoDB
-            save_answer(
-                table=table,
-                request_id=request_id,
-                user_id=user_id,
-                question=question,
-                answer=answer,
-                timestamp=timestamp
-            )
+        # 📊 Stage metrics from here on; emitted once the record succeeds or fails
+        wait_ms = queue_wait_ms(message, record)
+        metrics.start_request(topic, request_id, wait_ms)
+        if wait_ms is not None:
+            openmetrics.QUEUE_LAG.observe(max(0.0, wait_ms) / 1000, topic=topic)
+            picked_up_ns = time.time_ns()
+            tracing.record_span("sqs.queue_wait", picked_up_ns - int(max(0.0, wait_ms) * 1e6), picked_up_ns)
+
+        # 🐢 Backlog-aware degradation level for this record
+        level = degradation.observe(queue_url, record)
+        answer = answer_cache.get(topic, question) if level >= CACHED else None
+        cache_hit = answer is not None
+        if level >= CACHED:
+            openmetrics.CACHE_LOOKUPS.inc(topic=topic, result="hit" if cache_hit else "miss")
+        if cache_hit:
+            logger.info("🗃️ Serving cached answer for request %s (backlog level %d)", request_id, level)
+
+        # 💓 Heartbeat stops as soon as the record succeeds or fails
+        with heartbeat.track(queue_url, record.get('receiptHandle')):
+            # 🧠 Call the appropriate agent
+            if not cache_hit:
+                try:
+                    answer = _answer(question, topic, deadline, level, micro_batch, request_id)
+                except Exception as agent_error:
+                    logger.error("❌ Error from agent (possibly Bedrock): %s", agent_error)
+                    raise
+                # Only full-quality answers are worth serving again
+                if answer_mode(topic, level) == answer_mode(topic, NORMAL):
+                    answer_cache.put(topic, question, answer)
 
+            # 💾 Save result to DynamoDB
+            with metrics.stage("DynamoWriteMs"), tracing.span("dynamodb.save_answer"):
+                save_answer(
+                    table=table,
+                    request_id=request_id,
+                    user_id=user_id,
+                    question=question,
+                    answer=answer,
+                    timestamp=timestamp,
+                    metadata={
+                        # Tagged by the agent that answered, e.g. owasp for a handed-over assignment question
+                        "degradation_mode": answer_mode(resolve_topic(question, topic), level, cache_hit),
+                        "trace_id": tracing.current_trace_id()
+                    }
+                )
     except Exception as e:
-        logger.error("❌ Lambda handler error: %s", str(e))
+        if lease_token:
+            _release_claim(request_id, lease_token)
         raise
+
+    if lease_token:
+        complete_request(idempotency_table, request_id, lease_token)
+
+
+def dry_run(event):
+    """
+    Estimates routing, prompt size and cost of a question without calling the model.
+
+    Invoked directly (not through SQS) by the submit Lambda with
+    {"dry_run": true, "question": ..., "topic": ...}.
+
+    Returns:
+        dict: The orchestrator's estimate, or {"error": ...} for an unknown topic.
+    """
+    try:
+        estimate = route_question(event['question'], event['topic'], dry_run=True)
+    except (KeyError, ValueError) as e:
+        return {"error": str(e)}
+    logger.info("🧮 Dry run for topic '%s': %s", event['topic'], json.dumps(estimate))
+    return estimate
+
+
+@profiled
+def lambda_handler(event, context):
+    """
+    Processes an SQS batch concurrently and reports partial batch failures.
+
+    Every record runs on the shared thread pool. Only the records that failed are
+    returned in batchItemFailures, so SQS retries those and deletes the rest.
+    Events with "dry_run" set are answered with a cost estimate instead (see dry_run).
+    """
+    if event.get('dry_run'):
+        return dry_run(event)
+
+    records = event.get('Records', [])
+    logger.info("📥 Received batch of %d record(s)", len(records))
+
+    # ⏱️ One deadline for the whole batch, taken from the Lambda's remaining time
+    deadline = Deadline.from_lambda_context(context)
+
+    # 📦 Short questions of the same topic may share one model call
+    micro_batches = plan_micro_batches(records)
+
+    futures = [
+        # Each record runs in its own context copy, so its log binding ends with it
+        (record['messageId'], executor.submit(contextvars.copy_context().run, process_record, record, deadline, None,
+                                              micro_batches.get(record['messageId'])))
+        for record in records
+    ]
+
+    batch_item_failures = []
+    for message_id, future in futures:
+        try:
+            future.result()
+        except Exception as e:
+            logger.error("❌ Failed to process message %s: %s", message_id, str(e))
+            batch_item_failures.append({"itemIdentifier": message_id})
+
+    if batch_item_failures:
+        logger.warning("⚠️ %d of %d record(s) failed and will be retried", len(batch_item_failures), len(records))
+
+    # 🌓 The environment is frozen once the handler returns: let background shadow runs finish first
+    shadow_runner.drain(deadline.remaining())
+
+    # 🌏 Per-region health for dashboards (Logs Insights) when calls are spread across regions
+    if len(region_pool.regions) > 1:
+        logger.info("🌏 Bedrock region stats: %s", json.dumps(get_region_stats()))
+
+    # 🪁 Hedges sent so far in this container and which side won, so their extra cost shows up
+    hedge_stats = get_hedge_stats()
+    if hedge_stats["calls"]:
+        logger.info("🪁 Bedrock hedge stats: %s", json.dumps(hedge_stats))
+
+    return {"batchItemFailures": batch_item_failures}
@@ -0,0 +1,160 @@
+"""
+Long-running SQS poller, an alternative to the worker Lambda for sustained load.
+
+It long-polls RAGQueryQueue and runs each message through the same
+process_record path as lambda_handler (orchestrator.route_question +
+utils.dynamodb.save_answer). There are no cold starts and the connection
+pools stay warm. On SIGTERM/SIGINT it stops receiving and waits for the
+in-flight messages to finish.
+
+Run from backend/lambda_worker:
+
+    QUEUE_URL=... TABLE_NAME=... python poller.py
+
+Metrics are served in OpenMetrics format on http://<host>:POLLER_METRICS_PORT/metrics
+(utils/openmetrics.py) for Prometheus to scrape.
+
+For a local SQS/DynamoDB stand-in (ElasticMQ, DynamoDB Local, LocalStack),
+point boto3 at it with AWS_ENDPOINT_URL_SQS / AWS_ENDPOINT_URL_DYNAMODB.
+"""
+import os
+import signal
+import logging
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from lambda_function import process_record
+from utils.aws_clients import get_sqs_client
+from utils.deadline import Deadline
+from utils import openmetrics
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Number of messages processed at the same time
+POLLER_CONCURRENCY = int(os.environ.get("POLLER_CONCURRENCY", "10"))
+
+# SQS long-poll settings (10 messages and 20s are the ReceiveMessage maximums)
+MAX_MESSAGES_PER_RECEIVE = 10
+WAIT_TIME_SECONDS = int(os.environ.get("POLLER_WAIT_TIME_SECONDS", "20"))
+
+# Time budget for one message, the equivalent of the Lambda timeout
+RECORD_BUDGET_SECONDS = float(os.environ.get("POLLER_RECORD_BUDGET_SECONDS", "45"))
+
+# Port of the /metrics endpoint (0 = not served)
+METRICS_PORT = int(os.environ.get("POLLER_METRICS_PORT", "9464"))
+
+
+def to_lambda_record(message: dict) -> dict:
+    """
+    Converts a ReceiveMessage entry into the shape of an SQS Lambda event record.
+
+    Args:
+        message (dict): One entry of ReceiveMessage's Messages list.
+
+    Returns:
+        dict: A record with the keys process_record expects.
+    """
+    return {
+        "messageId": message["MessageId"],
+        "receiptHandle": message["ReceiptHandle"],
+        "body": message["Body"],
+        "attributes": message.get("Attributes", {}),
+        "messageAttributes": {
+            name: {
+                "stringValue": value.get("StringValue"),
+                "dataType": value.get("DataType"),
+            }
+            for name, value in message.get("MessageAttributes", {}).items()
+        },
+    }
+
+
+class SqsPoller:
+    """Receives messages while there are free slots and processes them on a thread pool."""
+
+    def __init__(self, sqs_client, queue_url: str, concurrency: int = POLLER_CONCURRENCY):
+        self._sqs = sqs_client
+        self._queue_url = queue_url
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="poller")
+        # One slot per concurrent message; only receive what can start right away, so
+        # nothing sits invisible on this worker waiting for a thread
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._concurrency = concurrency
+        self._stopping = threading.Event()
+
+    def stop(self, *_):
+        """Stops receiving new messages. In-flight messages are allowed to finish."""
+        if not self._stopping.is_set():
+            logger.info("🛑 Stop requested, draining in-flight messages")
+        self._stopping.set()
+
+    def run(self):
+        logger.info(f"🚀 Polling {self._queue_url} with concurrency {self._concurrency}")
+        while not self._stopping.is_set():
+            free = self._acquire_free_slots()
+            if not free:
+                continue
+
+            try:
+                response = self._sqs.receive_message(
+                    QueueUrl=self._queue_url,
+                    MaxNumberOfMessages=min(MAX_MESSAGES_PER_RECEIVE, free),
+                    WaitTimeSeconds=WAIT_TIME_SECONDS,
+                    AttributeNames=["All"],
+                    MessageAttributeNames=["All"],
+                )
+            except Exception as e:
+                logger.error(f"❌ ReceiveMessage failed: {e}")
+                self._release_slots(free)
+                self._stopping.wait(1)
+                continue
+
+            messages = response.get("Messages", [])
+            self._release_slots(free - len(messages))
+            for message in messages:
+                # Own context per message, so its log binding ends with it
+                self._executor.submit(contextvars.copy_context().run, self._handle, message)
+
+        self._executor.shutdown(wait=True)
+        logger.info("✅ Poller drained and stopped")
+
+    def _acquire_free_slots(self) -> int:
+        # Block for the first slot (so an idle pool doesn't spin), then take any others free
+        if not self._slots.acquire(timeout=1):
+            return 0
+        free = 1
+        while free < MAX_MESSAGES_PER_RECEIVE and self._slots.acquire(blocking=False):
+            free += 1
+        return free
+
+    def _release_slots(self, count: int):
+        for _ in range(count):
+            self._slots.release()
+
+    def _handle(self, message: dict):
+        record = to_lambda_record(message)
+        try:
+            process_record(record, Deadline.after(RECORD_BUDGET_SECONDS), queue_url=self._queue_url)
+            self._sqs.delete_message(QueueUrl=self._queue_url, ReceiptHandle=record["receiptHandle"])
+        except Exception as e:
+            # Left on the queue: it becomes visible again and is retried (or goes to the DLQ)
+            logger.error(f"❌ Failed to process message {record['messageId']}: {e}")
+        finally:
+            self._slots.release()
+
+
+def main():
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(threadName)s %(message)s")
+
+    if METRICS_PORT:
+        openmetrics.serve(METRICS_PORT)
+
+    poller = SqsPoller(get_sqs_client(), os.environ["QUEUE_URL"])
+    signal.signal(signal.SIGTERM, poller.stop)
+    signal.signal(signal.SIGINT, poller.stop)
+    poller.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Shared setup of the worker tests: everything runs against utils/fake_backend.py.
+
+The worker reads its settings when its modules are imported, so the environment is set
+here, before any test module imports them. Run from backend/lambda_worker:
+
+    python -m pytest -q tests
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.update({
+    "FAKE_BACKEND": "on",
+    "TABLE_NAME": "ResponseTable",
+    "IDEMPOTENCY_TABLE_NAME": "IdempotencyTable",
+    "KB_ID": "FAKEKB0000",
+    "METRICS_ENABLED": "off",
+    # Fast and deterministic fakes
+    "FAKE_SEED": "7",
+    "FAKE_BEDROCK_LATENCY_MS": "fixed:5",
+    "FAKE_RETRIEVAL_LATENCY_MS": "fixed:5",
+    "FAKE_MS_PER_OUTPUT_TOKEN": "0",
+    "FAKE_MS_PER_INPUT_TOKEN": "0",
+    "FAKE_SQS_LATENCY_MS": "fixed:0",
+    "FAKE_DYNAMODB_LATENCY_MS": "fixed:0",
+})
+
+from utils import fake_backend  # noqa: E402  (after the environment is set)
+
+
+@pytest.fixture(autouse=True)
+def fake_state():
+    """Empties the fake tables and queues and resets the call counters between tests."""
+    for fake_table in fake_backend._tables.values():
+        fake_table.items.clear()
+    for fake_queue in fake_backend._queues.values():
+        fake_queue.messages.clear()
+        fake_queue.dead_letters.clear()
+    fake_backend.stats.clear()
+    yield fake_backend
@@ -0,0 +1,96 @@
+"""Request cancellation and stale-request expiry in the worker (lambda_function, utils/idempotency.py)."""
+import json
+import time
+import uuid
+
+import pytest
+
+import lambda_function
+from utils.deadline import Deadline
+from utils.idempotency import STATUS_CANCELLED, claim_request, release_request
+
+
+def _record(request_id, **fields):
+    message = {"request_id": request_id, "user_id": "student", "question": "What is CSRF?", "topic": "owasp"}
+    message.update(fields)
+    return {
+        "messageId": str(uuid.uuid4()),
+        "receiptHandle": uuid.uuid4().hex,
+        "body": json.dumps(message),
+        "attributes": {},
+        "messageAttributes": {},
+    }
+
+
+def _cancel(request_id):
+    """Writes the marker the cancel endpoint (backend/lambda_cancel) writes."""
+    lambda_function.idempotency_table.update_item(
+        Key={"request_id": request_id},
+        UpdateExpression="SET #status = :cancelled, cancelled_at = :now",
+        ExpressionAttributeNames={"#status": "status"},
+        ExpressionAttributeValues={":cancelled": STATUS_CANCELLED, ":now": int(time.time())},
+    )
+
+
+def _model_calls(fake_state):
+    return fake_state.stats["bedrock-runtime.ok"] + fake_state.stats["bedrock-agent-runtime.ok"]
+
+
+def test_cancelled_request_is_skipped_before_the_model(fake_state):
+    _cancel("req-1")
+
+    lambda_function.process_record(_record("req-1"), Deadline.after(30))
+
+    assert _model_calls(fake_state) == 0
+    assert "req-1" not in fake_state.table("ResponseTable").items
+    assert lambda_function.idempotency_table.items["req-1"]["status"] == STATUS_CANCELLED
+
+
+def test_release_keeps_the_cancel_marker():
+    table = lambda_function.idempotency_table
+    token = claim_request(table, "req-2")
+    _cancel("req-2")  # while the request is being answered
+
+    release_request(table, "req-2", token)
+
+    assert table.items["req-2"]["status"] == STATUS_CANCELLED
+
+
+def test_request_cancelled_mid_answer_is_not_retried(fake_state, monkeypatch):
+    def cancelled_then_failed(question, topic, request_id=None, **kwargs):
+        _cancel(request_id)
+        raise TimeoutError("model call timed out")
+
+    monkeypatch.setattr(lambda_function, "route_question", cancelled_then_failed)
+    with pytest.raises(TimeoutError):
+        lambda_function.process_record(_record("req-3"), Deadline.after(30))
+    monkeypatch.undo()
+
+    # The redelivery finds the cancel marker instead of a free claim
+    lambda_function.process_record(_record("req-3"), Deadline.after(30))
+
+    assert _model_calls(fake_state) == 0
+    assert "req-3" not in fake_state.table("ResponseTable").items
+
+
+@pytest.mark.parametrize("fields, attributes", [
+    ({"submitted_at": int(time.time()) - 3600}, {}),
+    ({"timestamp": "2020-01-01T00:00:00"}, {}),
+    ({}, {"SentTimestamp": str(int((time.time() - 3600) * 1000))}),
+])
+def test_stale_request_is_dropped_unanswered(fake_state, fields, attributes):
+    record = _record("req-4", **fields)
+    record["attributes"] = attributes
+
+    lambda_function.process_record(record, Deadline.after(30))
+
+    assert _model_calls(fake_state) == 0
+    # Dropped before the claim: nothing left behind for a redelivery to trip over
+    assert "req-4" not in lambda_function.idempotency_table.items
+
+
+def test_fresh_request_is_answered(fake_state):
+    lambda_function.process_record(_record("req-5", submitted_at=int(time.time())), Deadline.after(30))
+
+    assert _model_calls(fake_state) == 1
+    assert "req-5" in fake_state.table("ResponseTable").items
@@ -0,0 +1,92 @@
+"""Idempotent execution per request_id (utils/idempotency.py and its use in lambda_function)."""
+import json
+import uuid
+
+import pytest
+
+import lambda_function
+from utils.deadline import Deadline
+from utils.idempotency import (STATUS_COMPLETED, RequestInProgressError, claim_request, complete_request,
+                               release_request)
+
+
+def _record(request_id, topic="owasp"):
+    return {
+        "messageId": str(uuid.uuid4()),
+        "receiptHandle": uuid.uuid4().hex,
+        "body": json.dumps({
+            "request_id": request_id,
+            "user_id": "student",
+            "question": "What is SQL injection?",
+            "topic": topic,
+        }),
+        "attributes": {},
+        "messageAttributes": {},
+    }
+
+
+def _model_calls(fake_state):
+    return fake_state.stats["bedrock-runtime.ok"] + fake_state.stats["bedrock-agent-runtime.ok"]
+
+
+def test_claim_is_exclusive_until_completed():
+    table = lambda_function.idempotency_table
+
+    token = claim_request(table, "req-1")
+    with pytest.raises(RequestInProgressError):
+        claim_request(table, "req-1")
+
+    complete_request(table, "req-1", token)
+    assert claim_request(table, "req-1") is None
+    assert table.items["req-1"]["status"] == STATUS_COMPLETED
+
+
+def test_expired_lease_is_taken_over():
+    table = lambda_function.idempotency_table
+
+    stale_token = claim_request(table, "req-2", lease_seconds=-1)
+    token = claim_request(table, "req-2")
+
+    assert token and token != stale_token
+    # The crashed worker's late completion must not finish the new claim
+    complete_request(table, "req-2", stale_token)
+    assert table.items["req-2"]["lease_token"] == token
+
+
+def test_released_claim_can_be_claimed_again():
+    table = lambda_function.idempotency_table
+
+    token = claim_request(table, "req-3")
+    release_request(table, "req-3", token)
+
+    assert claim_request(table, "req-3")
+
+
+def test_redelivered_record_invokes_the_model_once(fake_state):
+    record = _record("req-4")
+
+    lambda_function.process_record(record, Deadline.after(30))
+    lambda_function.process_record(record, Deadline.after(30))
+
+    assert _model_calls(fake_state) == 1
+    assert "req-4" in fake_state.table("ResponseTable").items
+
+
+def test_record_claimed_elsewhere_is_not_answered(fake_state):
+    claim_request(lambda_function.idempotency_table, "req-5")
+
+    with pytest.raises(RequestInProgressError):
+        lambda_function.process_record(_record("req-5"), Deadline.after(30))
+
+    assert _model_calls(fake_state) == 0
+
+
+def test_failed_record_releases_its_claim(fake_state, monkeypatch):
+    def failing_agent(*args, **kwargs):
+        raise ValueError("bad question")
+
+    monkeypatch.setattr(lambda_function, "route_question", failing_agent)
+    with pytest.raises(ValueError):
+        lambda_function.process_record(_record("req-6"), Deadline.after(30))
+
+    assert "req-6" not in lambda_function.idempotency_table.items
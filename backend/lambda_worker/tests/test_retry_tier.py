@@ -0,0 +1,132 @@
+"""Delayed retry tier for transient failures and dead-lettering of permanent ones (utils/retry_tier.py)."""
+import json
+import time
+import uuid
+
+import pytest
+from botocore.exceptions import ClientError
+
+import lambda_function
+from utils.deadline import Deadline
+from utils import fake_backend
+from utils.fake_backend import FakeSqs
+from utils.retry_tier import (ATTEMPT_ATTRIBUTE, ERROR_CLASS_ATTRIBUTE, MAX_RETRY_ATTEMPTS, RETRY_BASE_DELAY_SECONDS,
+                              RetryTier, error_class, is_transient)
+from utils.throttling import CircuitOpenError
+
+
+def _throttled():
+    return ClientError({"Error": {"Code": "ThrottlingException", "Message": "slow down"},
+                        "ResponseMetadata": {"HTTPStatusCode": 429}}, "InvokeModel")
+
+
+def _wrapped(error):
+    """The error as an agent raises it: a RuntimeError from the original one."""
+    try:
+        try:
+            raise error
+        except Exception as e:
+            raise RuntimeError(f"Agent failed: {e}") from e
+    except RuntimeError as wrapped:
+        return wrapped
+
+
+def _record(attempt=None, **attributes):
+    message_attributes = {name: {"stringValue": value, "dataType": "String"} for name, value in attributes.items()}
+    if attempt is not None:
+        message_attributes[ATTEMPT_ATTRIBUTE] = {"stringValue": str(attempt), "dataType": "Number"}
+    return {
+        "messageId": str(uuid.uuid4()),
+        "receiptHandle": uuid.uuid4().hex,
+        "body": json.dumps({"request_id": str(uuid.uuid4()), "user_id": "student",
+                            "question": "What is XSS?", "topic": "owasp"}),
+        "attributes": {},
+        "messageAttributes": message_attributes,
+    }
+
+
+@pytest.fixture
+def tier(fake_state):
+    sqs = FakeSqs("us-east-1")
+    retry_url = sqs.create_queue(QueueName="RAGRetryQueue")["QueueUrl"]
+    dead_letter_url = sqs.create_queue(QueueName="RAGWorkerDLQ")["QueueUrl"]
+    return RetryTier(sqs, retry_url, dead_letter_url)
+
+
+def _sent(queue_url):
+    return fake_backend.queue(queue_url).messages
+
+
+def _attribute(message, name):
+    return message.attributes[name]["StringValue"]
+
+
+@pytest.mark.parametrize("error, name", [
+    (_throttled(), "ThrottlingException"),
+    (_wrapped(_throttled()), "ThrottlingException"),
+    (_wrapped(CircuitOpenError(("model", "us-east-1"), 5)), "CircuitOpenError"),
+])
+def test_transient_errors_are_found_through_agent_wrapping(error, name):
+    assert is_transient(error)
+    assert error_class(error) == name
+
+
+@pytest.mark.parametrize("error", [KeyError("topic"), ValueError("Invalid topic 'x'"), _wrapped(ValueError("bad"))])
+def test_permanent_errors(error):
+    assert not is_transient(error)
+
+
+def test_transient_failure_is_resent_with_a_delay_and_attempt(tier):
+    record = _record(traceparent="00-abc-def-01")
+
+    assert tier.handle_failure(record, _wrapped(_throttled()))
+
+    [message] = _sent(tier.retry_queue_url)
+    assert message.body == record["body"]
+    # Delayed by the first retry's backoff (with jitter), not visible right away
+    assert message.visible_at - time.monotonic() > RETRY_BASE_DELAY_SECONDS * 0.8 - 1
+    assert _attribute(message, ATTEMPT_ATTRIBUTE) == "1"
+    assert _attribute(message, ERROR_CLASS_ATTRIBUTE) == "ThrottlingException"
+    assert _attribute(message, "traceparent") == "00-abc-def-01"
+    assert not _sent(tier.dead_letter_queue_url)
+
+
+def test_retry_counts_up_from_the_carried_attempt(tier):
+    assert tier.handle_failure(_record(attempt=2), _throttled())
+
+    [message] = _sent(tier.retry_queue_url)
+    assert _attribute(message, ATTEMPT_ATTRIBUTE) == "3"
+
+
+def test_permanent_failure_is_dead_lettered_with_its_class(tier):
+    assert tier.handle_failure(_record(), KeyError("question"))
+
+    [message] = _sent(tier.dead_letter_queue_url)
+    assert _attribute(message, ERROR_CLASS_ATTRIBUTE) == "KeyError"
+    assert not _sent(tier.retry_queue_url)
+
+
+def test_out_of_attempts_is_dead_lettered(tier):
+    assert tier.handle_failure(_record(attempt=MAX_RETRY_ATTEMPTS), _throttled())
+
+    [message] = _sent(tier.dead_letter_queue_url)
+    assert _attribute(message, ATTEMPT_ATTRIBUTE) == str(MAX_RETRY_ATTEMPTS)
+    assert not _sent(tier.retry_queue_url)
+
+
+def test_disabled_tier_leaves_the_record_to_sqs():
+    assert not RetryTier(FakeSqs("us-east-1"), None, None).handle_failure(_record(), _throttled())
+
+
+def test_worker_hands_an_agent_failure_to_the_tier(tier, monkeypatch):
+    def open_circuit(*args, **kwargs):
+        raise _wrapped(CircuitOpenError(("model", "us-east-1"), 5))
+
+    monkeypatch.setattr(lambda_function, "retry_tier", tier)
+    monkeypatch.setattr(lambda_function, "route_question", open_circuit)
+
+    # Routed: the record counts as handled and is deleted from the source queue
+    lambda_function.process_record(_record(), Deadline.after(30))
+
+    [message] = _sent(tier.retry_queue_url)
+    assert _attribute(message, ERROR_CLASS_ATTRIBUTE) == "CircuitOpenError"
@@ -0,0 +1,131 @@
+"""AIMD limiter and circuit breaker around model calls (utils/throttling.py, utils/bedrock.classify_error)."""
+import uuid
+
+import pytest
+from botocore.exceptions import ClientError, ReadTimeoutError
+
+from utils.bedrock import classify_error, invoke_model
+from utils.deadline import Deadline, DeadlineExceeded
+from utils.throttling import (AIMD_INITIAL_LIMIT, CIRCUIT_FAILURE_THRESHOLD, FAILED, NOT_SENT, THROTTLED,
+                              AimdLimiter, CircuitBreaker, CircuitOpenError, ModelCallGuard, call_guard)
+
+
+def _client_error(code, status):
+    return ClientError({"Error": {"Code": code, "Message": code}, "ResponseMetadata": {"HTTPStatusCode": status}},
+                       "InvokeModel")
+
+
+def _raise(error):
+    def fn():
+        raise error
+    return fn
+
+
+@pytest.mark.parametrize("error, outcome", [
+    (_client_error("ThrottlingException", 429), THROTTLED),
+    (_client_error("ServiceUnavailableException", 503), THROTTLED),  # out of capacity, like a throttle
+    (_client_error("InternalServerException", 500), FAILED),
+    (ReadTimeoutError(endpoint_url="https://bedrock-runtime.us-east-1.amazonaws.com"), FAILED),
+    (_client_error("ValidationException", 400), None),
+    (DeadlineExceeded("no time left"), NOT_SENT),
+])
+def test_classify_error(error, outcome):
+    assert classify_error(error) == outcome
+
+
+def test_timeout_reported_as_deadline_counts_as_failure():
+    try:
+        try:
+            raise ReadTimeoutError(endpoint_url="https://bedrock-runtime.us-east-1.amazonaws.com")
+        except ReadTimeoutError as e:
+            raise DeadlineExceeded("model call timed out") from e
+    except DeadlineExceeded as error:
+        assert classify_error(error) == FAILED
+
+
+def test_concurrent_throttles_halve_the_limit_once():
+    limiter = AimdLimiter(initial=8, minimum=1, maximum=16)
+    started = [limiter.acquire() for _ in range(4)]
+
+    for started_at in started:
+        limiter.release(started_at, succeeded=False, throttled=True)
+
+    assert limiter.limit == 4
+
+
+def test_successes_grow_the_limit():
+    limiter = AimdLimiter(initial=2, minimum=1, maximum=16)
+
+    for _ in range(4):
+        limiter.release(limiter.acquire())
+
+    assert limiter.limit > 3
+
+
+def test_circuit_opens_after_repeated_failures_and_fails_fast():
+    guard = ModelCallGuard()
+    key = ("model", "us-east-1")
+    for _ in range(CIRCUIT_FAILURE_THRESHOLD):
+        with pytest.raises(ClientError):
+            guard.call(key, _raise(_client_error("ThrottlingException", 429)), classify=classify_error)
+
+    calls = []
+    with pytest.raises(CircuitOpenError) as raised:
+        guard.call(key, lambda: calls.append(1), classify=classify_error)
+
+    assert not calls
+    assert raised.value.retry_after >= 1
+    assert guard.stats()["model@us-east-1"]["circuit"] == CircuitBreaker.OPEN
+
+
+def _half_open_breaker():
+    breaker = CircuitBreaker("key", failure_threshold=1, open_seconds=0)
+    breaker.record(failed=True)
+    breaker.before_call()  # open_seconds passed: this call is the probe
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    return breaker
+
+
+def test_probe_outcome_closes_or_reopens_the_circuit():
+    breaker = _half_open_breaker()
+    breaker.record(failed=False)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    breaker = _half_open_breaker()
+    breaker.record(failed=True)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_unsent_probe_keeps_the_circuit_half_open():
+    guard = ModelCallGuard()
+    key = ("model", "us-east-1")
+    limiter, breaker = guard._get(key)
+    breaker.failure_threshold, breaker.open_seconds = 1, 0
+    with pytest.raises(ClientError):
+        guard.call(key, _raise(_client_error("InternalServerException", 500)), classify=classify_error)
+
+    with pytest.raises(DeadlineExceeded):
+        guard.call(key, _raise(DeadlineExceeded("no time left")), classify=classify_error)
+
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert limiter.in_flight == 0
+    # The probe slot is free again for the next call
+    assert guard.call(key, lambda: "ok", classify=classify_error) == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_throttled_fake_bedrock_lowers_the_limit_then_opens_the_circuit(fake_state, monkeypatch):
+    monkeypatch.setattr(fake_state, "FAKE_THROTTLE_RATE", 1.0)
+    model_id = f"fake-model-{uuid.uuid4().hex[:8]}"
+    body = {"max_tokens": 50, "messages": [{"role": "user", "content": "What is SQL injection?"}]}
+
+    for _ in range(CIRCUIT_FAILURE_THRESHOLD):
+        with pytest.raises(ClientError):
+            invoke_model(model_id, body, deadline=Deadline.after(10), region="us-east-1")
+    with pytest.raises(CircuitOpenError):
+        invoke_model(model_id, body, deadline=Deadline.after(10), region="us-east-1")
+
+    stats = call_guard.stats()[f"{model_id}@us-east-1"]
+    assert stats["limit"] < AIMD_INITIAL_LIMIT
+    assert stats["circuit"] == CircuitBreaker.OPEN
+    assert fake_state.stats["bedrock-runtime.throttled"] == CIRCUIT_FAILURE_THRESHOLD
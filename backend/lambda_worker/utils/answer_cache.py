@@ -0,0 +1,45 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+# Answers kept per worker process, and for how long (seconds)
+ANSWER_CACHE_SIZE = int(os.environ.get("ANSWER_CACHE_SIZE", "500"))
+ANSWER_CACHE_TTL_SECONDS = float(os.environ.get("ANSWER_CACHE_TTL_SECONDS", "3600"))
+
+
+def _key(topic: str, question: str):
+    # Same question with different casing or spacing is the same question
+    return topic.strip().lower(), " ".join(question.lower().split())
+
+
+class AnswerCache:
+    """LRU cache of recent full-quality answers, keyed by topic and normalised question."""
+
+    def __init__(self, max_entries: int = ANSWER_CACHE_SIZE, ttl_seconds: float = ANSWER_CACHE_TTL_SECONDS):
+        self._entries = OrderedDict()
+        self._max_entries = max_entries
+        self._ttl = ttl_seconds
+        self._lock = threading.Lock()
+
+    def get(self, topic: str, question: str):
+        """Returns the cached answer, or None if there is none or it has expired."""
+        key = _key(topic, question)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            answer, stored_at = entry
+            if time.monotonic() - stored_at > self._ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return answer
+
+    def put(self, topic: str, question: str, answer):
+        key = _key(topic, question)
+        with self._lock:
+            self._entries[key] = (answer, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
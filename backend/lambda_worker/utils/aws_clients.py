@@ -0,0 +1,122 @@
+import os
+import math
+import threading
+import boto3
+from botocore.config import Config
+
+# Default region for every client handed out by this module
+REGION = os.environ.get("AWS_REGION", "ap-northeast-1")
+
+# One pooled connection per concurrent agent call, so worker threads never queue on the pool
+MAX_POOL_CONNECTIONS = int(os.environ.get("BEDROCK_MAX_POOL_CONNECTIONS", os.environ.get("WORKER_CONCURRENCY", "10")))
+
+# Timeouts (seconds) and retry behaviour for Bedrock calls
+CONNECT_TIMEOUT = float(os.environ.get("BEDROCK_CONNECT_TIMEOUT", "3"))
+READ_TIMEOUT = float(os.environ.get("BEDROCK_READ_TIMEOUT", "45"))
+RETRY_MODE = os.environ.get("BEDROCK_RETRY_MODE", "standard")
+MAX_ATTEMPTS = int(os.environ.get("BEDROCK_MAX_ATTEMPTS", "3"))
+
+# Read timeouts (seconds) available to deadline-bound calls, one client (and connection pool) each.
+# They include the policy timeouts of agents.orchestrator, so a fresh attempt gets its full budget.
+READ_TIMEOUT_BUCKETS = (2, 5, 10, 15, 20, 25, 30, 45)
+
+# "on" hands out the in-process stand-ins of utils/fake_backend.py instead of AWS clients (local runs)
+FAKE_BACKEND = os.environ.get("FAKE_BACKEND", "off").lower() == "on"
+
+# Process-wide clients, keyed by (service, region, read timeout)
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def bedrock_config(read_timeout: float = None) -> Config:
+    """
+    Builds the botocore Config shared by all Bedrock clients.
+
+    Clients bound to a deadline (read_timeout given) make a single attempt, since a
+    botocore retry after a read timeout would not fit in the remaining budget.
+    """
+    return Config(
+        max_pool_connections=MAX_POOL_CONNECTIONS,
+        tcp_keepalive=True,
+        connect_timeout=CONNECT_TIMEOUT,
+        read_timeout=read_timeout or READ_TIMEOUT,
+        retries={"mode": RETRY_MODE, "total_max_attempts": 1 if read_timeout else MAX_ATTEMPTS},
+    )
+
+
+def read_timeout_bucket(seconds: float):
+    """
+    Returns the largest read timeout bucket that fits in `seconds`, or None if none fits.
+
+    `seconds` is rounded up to the whole second first: a 45s budget always has a little less
+    than 45s left by the time the call starts, and should still get the 45s bucket. The
+    overshoot (under a second) is covered by the deadline's safety margin.
+    """
+    fitting = [bucket for bucket in READ_TIMEOUT_BUCKETS if bucket <= math.ceil(seconds)]
+    return fitting[-1] if fitting else None
+
+
+def sqs_config() -> Config:
+    """Builds the botocore Config for the SQS client (visibility heartbeats, re-enqueues)."""
+    return Config(
+        max_pool_connections=MAX_POOL_CONNECTIONS,
+        tcp_keepalive=True,
+        retries={"mode": "standard"},
+    )
+
+
+def get_client(service_name: str, region: str = None, config: Config = None, read_timeout: float = None):
+    """
+    Returns the process-wide client for a service, creating it on first use.
+
+    boto3 clients are thread-safe once created, but creating them is not, so
+    creation happens under a lock and the client is reused by every agent thread.
+
+    Args:
+        service_name (str): boto3 service name, e.g. "bedrock-runtime".
+        region (str, optional): Region override. Defaults to AWS_REGION.
+        config (Config, optional): Config used when the client is first created.
+            Defaults to bedrock_config(read_timeout).
+        read_timeout (float, optional): Read timeout bucket for deadline-bound calls.
+
+    Returns:
+        botocore.client.BaseClient: The shared client.
+    """
+    key = (service_name, region or REGION, read_timeout)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            if FAKE_BACKEND:
+                from utils import fake_backend  # only local runs load it
+                client = fake_backend.client(service_name, key[1], read_timeout or READ_TIMEOUT)
+            else:
+                client = boto3.client(service_name, region_name=key[1], config=config or bedrock_config(read_timeout))
+            _clients[key] = client
+        return client
+
+
+def get_bedrock_runtime(region: str = None, read_timeout: float = None):
+    """Returns the shared bedrock-runtime client (invoke_model)."""
+    return get_client("bedrock-runtime", region, read_timeout=read_timeout)
+
+
+def get_bedrock_agent_runtime(region: str = None, read_timeout: float = None):
+    """Returns the shared bedrock-agent-runtime client (retrieve_and_generate)."""
+    return get_client("bedrock-agent-runtime", region, read_timeout=read_timeout)
+
+
+def get_sqs_client(region: str = None):
+    """Returns the shared SQS client."""
+    return get_client("sqs", region, config=sqs_config())
+
+
+def get_table(name: str):
+    """Returns a DynamoDB Table resource (the fake backend's table with FAKE_BACKEND=on)."""
+    if FAKE_BACKEND:
+        from utils import fake_backend
+        return fake_backend.table(name)
+    return boto3.resource("dynamodb").Table(name)
@@ -0,0 +1,389 @@
+import json
+import time
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from botocore.exceptions import ClientError, ConnectTimeoutError, HTTPClientError, ReadTimeoutError
+from botocore.exceptions import ConnectionError as BotoConnectionError
+from utils.aws_clients import REGION, get_bedrock_agent_runtime, get_bedrock_runtime, read_timeout_bucket
+from utils.deadline import DeadlineExceeded
+from utils.hedging import hedged_call
+from utils.region_pool import region_pool
+from utils.quota import RAG_CONTEXT_TOKEN_ESTIMATE, charge, estimate_tokens, get_bucket, refund, settle
+from utils.throttling import FAILED, NOT_SENT, THROTTLED, CircuitOpenError, call_guard
+from utils import metrics
+from utils import tracing
+from utils import openmetrics
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+ANTHROPIC_VERSION = "bedrock-2023-05-31"
+
+# Bedrock error codes worth retrying: throttling and transient service-side failures
+RETRYABLE_ERROR_CODES = {
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ServiceUnavailableException",
+    "InternalServerException",
+    "ModelTimeoutException",
+    "ModelNotReadyException",
+}
+
+# Error codes that mean a region is out of capacity; the region pool fails over on these
+THROTTLING_ERROR_CODES = {
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ServiceUnavailableException",
+}
+
+
+def error_chain(error: BaseException):
+    """Yields the error and every error it was raised from (agents wrap Bedrock errors)."""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        yield error
+        error = error.__cause__ or error.__context__
+
+
+def error_code(error: BaseException):
+    """Returns the first botocore error code in the chain, or None."""
+    for err in error_chain(error):
+        if isinstance(err, ClientError):
+            return err.response.get("Error", {}).get("Code")
+    return None
+
+
+def is_retryable(error: BaseException) -> bool:
+    """True if the error (or the Bedrock error it wraps) is throttling or transient."""
+    for err in error_chain(error):
+        if isinstance(err, (DeadlineExceeded, BotoConnectionError, HTTPClientError)):
+            return True
+        if isinstance(err, ClientError):
+            return err.response.get("Error", {}).get("Code") in RETRYABLE_ERROR_CODES
+    return False
+
+
+# Usage of the Bedrock calls made under record_usage() in the current context
+_usage = contextvars.ContextVar("bedrock_usage", default=None)
+_usage_lock = threading.Lock()
+
+
+@contextmanager
+def record_usage():
+    """
+    Collects the Bedrock usage of every call made inside the block, hedges included.
+
+    Yields:
+        dict: calls, input_tokens and output_tokens, filled in as the calls finish.
+        RetrieveAndGenerate reports no usage, so its tokens are estimates.
+    """
+    usage = {"calls": 0, "input_tokens": 0, "output_tokens": 0}
+    token = _usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _usage.reset(token)
+
+
+def _add_usage(model_id: str, input_tokens: int, output_tokens: int):
+    # Per-request stage metrics (EMF) get the same numbers
+    request_metrics = metrics.current()
+    if request_metrics is not None:
+        request_metrics.model_called(model_id, input_tokens, output_tokens)
+
+    usage = _usage.get()
+    if usage is None:
+        return
+    with _usage_lock:
+        usage["calls"] += 1
+        usage["input_tokens"] += input_tokens or 0
+        usage["output_tokens"] += output_tokens or 0
+
+
+def _model_call_started():
+    request_metrics = metrics.current()
+    if request_metrics is not None:
+        request_metrics.model_call_started()
+
+
+def _read_timeout(deadline):
+    """Picks the read timeout for a call from the time remaining on its deadline."""
+    if deadline is None:
+        return None
+    timeout = read_timeout_bucket(deadline.remaining())
+    if timeout is None:
+        raise DeadlineExceeded(f"Only {deadline.remaining():.1f}s left, not enough for a Bedrock call")
+    return timeout
+
+
+def classify_error(error: BaseException):
+    """
+    Maps a model call error to the call guard's THROTTLED / FAILED, or None if the service is healthy.
+
+    Only what the service did counts: throttling, 5xx responses, timeouts and connection
+    failures. A DeadlineExceeded raised here before sending (budget used up locally) says
+    nothing about the model: it is NOT_SENT, so it neither opens the circuit for the other
+    agents sharing it nor passes a half-open probe.
+    """
+    if isinstance(error, DeadlineExceeded) and error.__cause__ is None:
+        return NOT_SENT
+    code = error_code(error)
+    if code in THROTTLING_ERROR_CODES:
+        return THROTTLED
+    for err in error_chain(error):
+        if isinstance(err, ClientError):
+            status = err.response.get("ResponseMetadata", {}).get("HTTPStatusCode") or 0
+            return FAILED if code in RETRYABLE_ERROR_CODES or status >= 500 else None
+        # Read/connect timeouts are HTTPClientError / ConnectionError subclasses
+        if isinstance(err, (BotoConnectionError, HTTPClientError)):
+            return FAILED
+    return None
+
+
+def _record_region_outcome(region: str, start: float, error: BaseException = None):
+    region_pool.record(
+        region,
+        time.monotonic() - start,
+        error=error is not None,
+        throttled=error is not None and error_code(error) in THROTTLING_ERROR_CODES
+    )
+
+
+def _usage_tokens(result: dict):
+    """Input + output tokens reported in an InvokeModel response, or None."""
+    usage = result.get("usage") if isinstance(result, dict) else None
+    if not usage:
+        return None
+    return usage.get("input_tokens", 0) + usage.get("output_tokens", 0)
+
+
+def _invoke_model_in_region(model_id: str, request_body: str, deadline, region: str) -> dict:
+    def send():
+        # Timeout picked after waiting for the limiter, from the time actually left
+        client = get_bedrock_runtime(region, read_timeout=_read_timeout(deadline))
+        metrics.add("LimiterWaitMs", (time.perf_counter() - queued_at) * 1000)
+        with tracing.span("bedrock.invoke_model", model=model_id, region=region):
+            start = time.monotonic()
+            try:
+                response = client.invoke_model(
+                    modelId=model_id,
+                    body=request_body,
+                    contentType="application/json",
+                    accept="application/json"
+                )
+                result = json.loads(response["body"].read())
+            except (ReadTimeoutError, ConnectTimeoutError) as e:
+                _record_region_outcome(region, start, e)
+                if deadline is not None:
+                    raise DeadlineExceeded(f"Bedrock InvokeModel timed out: {e}") from e
+                raise
+            except Exception as e:
+                _record_region_outcome(region, start, e)
+                raise
+
+            _record_region_outcome(region, start)
+            elapsed = time.monotonic() - start
+            metrics.add("BedrockMs", elapsed * 1000)
+            openmetrics.BEDROCK_LATENCY.observe(elapsed, operation="invoke_model", model=model_id,
+                                                 region=region or REGION)
+            usage = result.get("usage") or {}
+            tracing.annotate(input_tokens=usage.get("input_tokens"), output_tokens=usage.get("output_tokens"))
+            return result
+
+    # Prompt built; what follows until the request goes out is waiting on the budget and limiter
+    _model_call_started()
+
+    # 🪙 Shared RPM/TPM budget: estimated input up front, actual usage once known
+    bucket = get_bucket(model_id, region)
+    estimated = estimate_tokens(request_body)
+    _read_timeout(deadline)  # no time left for the call: fail before charging the budget
+    with metrics.stage("QuotaWaitMs"):
+        charge(bucket, estimated, deadline)
+    queued_at = time.perf_counter()
+
+    try:
+        result = call_guard.call((model_id, region), send, deadline=deadline, classify=classify_error)
+    except Exception:
+        # Rejected by the circuit, throttled or failed: the call doesn't use up the shared budget
+        refund(bucket, estimated)
+        raise
+    settle(bucket, estimated, _usage_tokens(result))
+    usage = result.get("usage") or {}
+    _add_usage(model_id, usage.get("input_tokens", estimated), usage.get("output_tokens", 0))
+    return result
+
+
+def _invoke_model_once(model_id: str, request_body: str, deadline, region: str, target: str = None) -> dict:
+    # Pinned region: no load spreading
+    if region is not None:
+        return _invoke_model_in_region(model_id, request_body, deadline, region)
+
+    target = target or region_pool.choose()
+    try:
+        return _invoke_model_in_region(model_id, request_body, deadline, target)
+    except (ClientError, CircuitOpenError) as e:
+        if isinstance(e, ClientError) and error_code(e) not in THROTTLING_ERROR_CODES:
+            raise
+        # 🌏 Region throttled (or its circuit is open): fail over once to the best other region, if any
+        fallback = region_pool.choose(exclude={target})
+        if fallback is None:
+            raise
+        logger.warning(f"🌏 {target} unavailable ({e}), failing over to {fallback}")
+        return _invoke_model_in_region(model_id, request_body, deadline, fallback)
+
+
+def invoke_model(model_id: str, body: dict, deadline=None, region: str = None, hedge=None) -> dict:
+    """
+    Calls bedrock-runtime InvokeModel with a timeout taken from the deadline.
+
+    Args:
+        model_id (str): Bedrock model ID.
+        body (dict): Request body; anthropic_version is added if missing and
+            None values (e.g. an unset temperature) are dropped.
+        deadline (Deadline, optional): Budget for this call.
+        region (str, optional): Region override. When None the region pool picks one
+            (BEDROCK_REGIONS) and fails over once if it throttles.
+        hedge (HedgePolicy, optional): Send a backup request (secondary model/region)
+            if this call is slower than the hedge delay. First response wins.
+
+    Returns:
+        dict: The parsed JSON response body.
+
+    Raises:
+        DeadlineExceeded: If the budget is used up before or during the call.
+        CircuitOpenError: If the model's circuit is open (fails fast without calling it).
+    """
+    body = {key: value for key, value in body.items() if value is not None}
+    body.setdefault("anthropic_version", ANTHROPIC_VERSION)
+    request_body = json.dumps(body)
+
+    if hedge is None:
+        return _invoke_model_once(model_id, request_body, deadline, region)
+
+    # The primary's region is picked up front so its latency is tracked under the region it goes to
+    target = region or region_pool.choose()
+    return hedged_call(
+        (model_id, target),
+        lambda: _invoke_model_once(model_id, request_body, deadline, region, target),
+        lambda: _invoke_model_once(hedge.model_id or model_id, request_body, deadline, hedge.region or region),
+        hedge,
+        deadline
+    )
+
+
+def retrieve_and_generate(input_text: str, kb_id: str, model_id: str, deadline=None, region: str = None,
+                          max_tokens: int = None, temperature: float = None, hedge=None) -> dict:
+    """
+    Calls bedrock-agent-runtime RetrieveAndGenerate against a knowledge base.
+
+    Args:
+        input_text (str): The full input text (prompt + question).
+        kb_id (str): Knowledge base ID.
+        model_id (str): Foundation model used for generation.
+        deadline (Deadline, optional): Budget for this call.
+        region (str, optional): Region of the knowledge base. Not load-spread, since
+            knowledge bases are regional, but its outcomes are recorded in the region stats.
+        max_tokens (int, optional): Generation token limit. Service default when None.
+        temperature (float, optional): Generation temperature. Service default when None.
+        hedge (HedgePolicy, optional): Send a backup request with the secondary model if this
+            call is slower than the hedge delay. The knowledge base is regional, so the
+            backup stays in the same region.
+
+    Returns:
+        dict: The RetrieveAndGenerate response.
+
+    Raises:
+        DeadlineExceeded: If the budget is used up before or during the call.
+        CircuitOpenError: If the model's circuit is open (fails fast without calling it).
+    """
+    region = region or REGION
+    if hedge is None:
+        return _retrieve_and_generate_once(input_text, kb_id, model_id, deadline, region, max_tokens, temperature)
+
+    return hedged_call(
+        (model_id, region),
+        lambda: _retrieve_and_generate_once(input_text, kb_id, model_id, deadline, region, max_tokens, temperature),
+        lambda: _retrieve_and_generate_once(input_text, kb_id, hedge.model_id or model_id, deadline, region,
+                                            max_tokens, temperature),
+        hedge,
+        deadline
+    )
+
+
+def _retrieve_and_generate_once(input_text, kb_id, model_id, deadline, region, max_tokens, temperature) -> dict:
+    # RetrieveAndGenerate reports no usage: the retrieved passages are estimated, the output measured
+    _model_call_started()
+    bucket = get_bucket(model_id, region)
+    estimated = estimate_tokens(input_text) + RAG_CONTEXT_TOKEN_ESTIMATE
+    _read_timeout(deadline)
+    with metrics.stage("QuotaWaitMs"):
+        charge(bucket, estimated, deadline)
+    queued_at = time.perf_counter()
+
+    try:
+        response = call_guard.call(
+            (model_id, region),
+            lambda: _send_retrieve_and_generate(input_text, kb_id, model_id, deadline, region, max_tokens,
+                                                temperature, queued_at),
+            deadline=deadline,
+            classify=classify_error
+        )
+    except Exception:
+        refund(bucket, estimated)
+        raise
+    output_tokens = estimate_tokens(response.get("output", {}).get("text", ""))
+    settle(bucket, estimated, estimated + output_tokens)
+    _add_usage(model_id, estimated, output_tokens)
+    return response
+
+
+def _send_retrieve_and_generate(input_text, kb_id, model_id, deadline, region, max_tokens, temperature,
+                                queued_at) -> dict:
+    client = get_bedrock_agent_runtime(region, read_timeout=_read_timeout(deadline))
+    metrics.add("LimiterWaitMs", (time.perf_counter() - queued_at) * 1000)
+
+    kb_config = {
+        "knowledgeBaseId": kb_id,
+        "modelArn": model_arn(model_id, region)
+    }
+    inference_config = {}
+    if max_tokens is not None:
+        inference_config["maxTokens"] = max_tokens
+    if temperature is not None:
+        inference_config["temperature"] = temperature
+    if inference_config:
+        kb_config["generationConfiguration"] = {"inferenceConfig": {"textInferenceConfig": inference_config}}
+
+    with tracing.span("bedrock.retrieve_and_generate", model=model_id, region=region, kb_id=kb_id):
+        start = time.monotonic()
+        try:
+            response = client.retrieve_and_generate(
+                input={"text": input_text},
+                retrieveAndGenerateConfiguration={
+                    "type": "KNOWLEDGE_BASE",
+                    "knowledgeBaseConfiguration": kb_config
+                }
+            )
+        except (ReadTimeoutError, ConnectTimeoutError) as e:
+            _record_region_outcome(region, start, e)
+            if deadline is not None:
+                raise DeadlineExceeded(f"Bedrock RetrieveAndGenerate timed out: {e}") from e
+            raise
+        except Exception as e:
+            _record_region_outcome(region, start, e)
+            raise
+
+        _record_region_outcome(region, start)
+        elapsed = time.monotonic() - start
+        metrics.add("RetrieveAndGenerateMs", elapsed * 1000)
+        openmetrics.BEDROCK_LATENCY.observe(elapsed, operation="retrieve_and_generate", model=model_id,
+                                             region=region or REGION)
+        return response
+
+
+def model_arn(model_id: str, region: str) -> str:
+    """Builds the foundation-model ARN RetrieveAndGenerate expects."""
+    return f"arn:aws:bedrock:{region}::foundation-model/{model_id}"
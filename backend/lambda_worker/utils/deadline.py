@@ -0,0 +1,62 @@
+import os
+import time
+
+# Time kept back from the Lambda budget for saving the answer and releasing the record (seconds)
+SAFETY_MARGIN_SECONDS = float(os.environ.get("DEADLINE_SAFETY_MARGIN_SECONDS", "3"))
+
+# Budget used when there is no Lambda context (local runs, long-running poller)
+DEFAULT_BUDGET_SECONDS = float(os.environ.get("DEFAULT_BUDGET_SECONDS", "45"))
+
+
+class DeadlineExceeded(Exception):
+    """Raised when there is not enough time left to start or finish a call."""
+
+
+class Deadline:
+    """
+    A point in time by which a record's work must be finished.
+
+    Created once per invocation in lambda_handler and passed down through
+    route_question into every agent, so each Bedrock call can size its
+    timeout from the time actually remaining.
+    """
+
+    def __init__(self, expires_at: float):
+        self.expires_at = expires_at  # time.monotonic() value
+
+    @classmethod
+    def after(cls, seconds: float) -> "Deadline":
+        """Returns a deadline `seconds` from now."""
+        return cls(time.monotonic() + seconds)
+
+    @classmethod
+    def from_lambda_context(cls, context, safety_margin: float = SAFETY_MARGIN_SECONDS) -> "Deadline":
+        """
+        Builds a deadline from the Lambda context, minus a safety margin.
+
+        Falls back to DEFAULT_BUDGET_SECONDS when there is no context (local runs).
+        """
+        if context is None or not hasattr(context, "get_remaining_time_in_millis"):
+            return cls.after(DEFAULT_BUDGET_SECONDS)
+        return cls.after(context.get_remaining_time_in_millis() / 1000 - safety_margin)
+
+    def remaining(self) -> float:
+        """Seconds left before the deadline (never negative)."""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def check(self, needed: float = 0.0):
+        """
+        Raises DeadlineExceeded unless at least `needed` seconds remain.
+
+        Args:
+            needed (float): Minimum time the next step needs.
+        """
+        if self.remaining() <= needed:
+            raise DeadlineExceeded(f"Only {self.remaining():.1f}s left, {needed:.1f}s needed")
+
+    def child(self, seconds: float) -> "Deadline":
+        """Returns a deadline that ends after `seconds` or at this deadline, whichever is first."""
+        return Deadline(min(self.expires_at, time.monotonic() + seconds))
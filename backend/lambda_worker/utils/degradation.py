@@ -0,0 +1,140 @@
+import os
+import time
+import logging
+import threading
+from dataclasses import replace
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Degradation levels, each one adding to the previous
+NORMAL = 0  # full policy
+CACHED = 1  # serve cached answers to repeated questions
+SHORT_TOKENS = 2  # ... and cap max_tokens
+FAST_MODEL = 3  # ... and switch non-critical topics to the fast model
+
+MODE_NAMES = {NORMAL: "normal", CACHED: "cached", SHORT_TOKENS: "short_tokens", FAST_MODEL: "fast_model"}
+
+
+def _levels(name: str, default: str):
+    return [float(v) for v in os.environ.get(name, default).split(",")]
+
+
+# Queue depth (visible messages) and message age (seconds) at which each level starts
+DEPTH_THRESHOLDS = _levels("DEGRADE_DEPTH_THRESHOLDS", "50,150,400")
+AGE_THRESHOLDS = _levels("DEGRADE_AGE_THRESHOLDS", "60,180,420")
+
+# How often the queue depth is read, and how long pressure must stay lower before stepping down
+DEPTH_REFRESH_SECONDS = float(os.environ.get("DEGRADE_DEPTH_REFRESH_SECONDS", "15"))
+STEP_DOWN_SECONDS = float(os.environ.get("DEGRADE_STEP_DOWN_SECONDS", "60"))
+
+# Token cap from SHORT_TOKENS on
+DEGRADED_MAX_TOKENS = int(os.environ.get("DEGRADED_MAX_TOKENS", "512"))
+
+# Model used for non-critical topics from FAST_MODEL on
+FAST_MODEL_ID = os.environ.get("FAST_MODEL_ID", "anthropic.claude-3-haiku-20240307-v1:0")
+
+# Topics whose answers may come from the fast model under heavy backlog
+NON_CRITICAL_TOPICS = set(os.environ.get("DEGRADE_NON_CRITICAL_TOPICS", "owasp,labhint,cloudops").split(","))
+
+
+def _level_for(value: float, thresholds) -> int:
+    return sum(1 for threshold in thresholds if value >= threshold)
+
+
+def degrade_policy(topic: str, policy, level: int):
+    """
+    Returns the policy to use for a topic at a degradation level.
+
+    Args:
+        topic (str): The (non-composite) topic.
+        policy (AgentPolicy): The topic's normal policy.
+        level (int): Current degradation level.
+
+    Returns:
+        AgentPolicy: The policy itself below SHORT_TOKENS, otherwise a copy with a token cap,
+        no hedging, and (at FAST_MODEL, non-critical topics only) the fast model.
+    """
+    if level < SHORT_TOKENS:
+        return policy
+    changes = {"max_tokens": min(policy.max_tokens or DEGRADED_MAX_TOKENS, DEGRADED_MAX_TOKENS), "hedge": None}
+    if level >= FAST_MODEL and topic in NON_CRITICAL_TOPICS:
+        changes["model_id"] = FAST_MODEL_ID
+    return replace(policy, **changes)
+
+
+def answer_mode(topic: str, level: int, cache_hit: bool = False) -> str:
+    """Name of the mode that produced an answer, stored with it (composite topics join with '+')."""
+    if cache_hit:
+        return MODE_NAMES[CACHED]
+    if level >= FAST_MODEL and any(t in NON_CRITICAL_TOPICS for t in topic.strip().lower().split("+")):
+        return MODE_NAMES[FAST_MODEL]
+    if level >= SHORT_TOKENS:
+        return MODE_NAMES[SHORT_TOKENS]
+    return MODE_NAMES[NORMAL]
+
+
+class DegradationController:
+    """
+    Picks the degradation level from the backlog of the source queue.
+
+    Pressure is the worse of two signals: the queue depth (ApproximateNumberOfMessages,
+    read at most every DEPTH_REFRESH_SECONDS) and the age of the records being processed
+    (from their SentTimestamp). The level rises at once and falls one step at a time,
+    once the pressure has stayed lower for STEP_DOWN_SECONDS.
+    """
+
+    def __init__(self, sqs_client):
+        self._sqs = sqs_client
+        self.level = NORMAL
+        self._changed_at = time.monotonic()
+        self._depth = {}  # queue_url -> (depth, read_at)
+        self._lock = threading.Lock()
+
+    def _queue_depth(self, queue_url: str) -> int:
+        depth, read_at = self._depth.get(queue_url, (0, None))
+        if read_at is not None and time.monotonic() - read_at < DEPTH_REFRESH_SECONDS:
+            return depth
+        # Claimed before the call so concurrent records don't all read it
+        self._depth[queue_url] = (depth, time.monotonic())
+        try:
+            attributes = self._sqs.get_queue_attributes(
+                QueueUrl=queue_url, AttributeNames=["ApproximateNumberOfMessages"]
+            )["Attributes"]
+            depth = int(attributes.get("ApproximateNumberOfMessages", 0))
+        except Exception as e:
+            logger.warning(f"⚠️ Could not read queue depth, keeping the last value: {e}")
+        self._depth[queue_url] = (depth, time.monotonic())
+        return depth
+
+    def observe(self, queue_url: str, record: dict) -> int:
+        """
+        Updates the level from the queue and a record about to be processed.
+
+        Args:
+            queue_url (str): Source queue of the record (None skips the depth signal).
+            record (dict): The SQS record; records re-sent by the retry tier don't count
+                towards the age signal, since their age includes the retry delay.
+
+        Returns:
+            int: The degradation level to process the record at.
+        """
+        depth = self._queue_depth(queue_url) if queue_url else 0
+
+        age = 0.0
+        sent_at = record.get("attributes", {}).get("SentTimestamp")
+        if sent_at and "retry_attempt" not in record.get("messageAttributes", {}):
+            age = max(0.0, time.time() - int(sent_at) / 1000)
+
+        target = max(_level_for(depth, DEPTH_THRESHOLDS), _level_for(age, AGE_THRESHOLDS))
+        with self._lock:
+            now = time.monotonic()
+            if target > self.level:
+                self.level, self._changed_at = target, now
+                logger.warning(f"🐢 Backlog (depth {depth}, age {age:.0f}s): degrading to {MODE_NAMES[target]}")
+            elif target == self.level:
+                self._changed_at = now
+            elif now - self._changed_at >= STEP_DOWN_SECONDS:
+                self.level, self._changed_at = self.level - 1, now
+                logger.info(f"🐇 Backlog easing: stepping back to {MODE_NAMES[self.level]}")
+            return self.level
@@ -1,4 +1,7 @@
-def save_answer(table, request_id, user_id, question, answer, timestamp=None):
+import time
+
+
+def save_answer(table, request_id, user_id, question, answer, timestamp=None, metadata=None):
     """
     Saves the answer and metadata to DynamoDB.
 
@@ -9,6 +12,8 @@ def save_answer(table, request_id, user_id, question, answer, timestamp=None):
         question (str): The user's question.
         answer (str): The answer returned by the model.
         timestamp (str, optional): Timestamp of the request.
+        metadata (dict, optional): Extra attributes stored with the answer (e.g. degradation_mode,
+            trace_id); None values are left out.
     """
     item = {
         "request_id": request_id,
@@ -20,4 +25,39 @@ def save_answer(table, request_id, user_id, question, answer, timestamp=None):
     if timestamp:
         item["timestamp"] = timestamp
 
+    if metadata:
+        item.update({key: value for key, value in metadata.items() if value is not None})
+
     table.put_item(Item=item)
+
+
+def save_shadow_comparison(table, request_id, comparison, attempts=3, retry_delay_seconds=1.0):
+    """
+    Stores a shadow comparison on an answer item that already exists.
+
+    The shadow run may finish before the production answer is written, so a missing
+    item is retried a few times before the comparison is given up.
+
+    Args:
+        table (boto3 DynamoDB.Table): The table holding the answers.
+        request_id (str): Unique ID of the question/request.
+        comparison (dict): Production and shadow measurements (numbers must be ints).
+        attempts (int, optional): Writes tried while the answer item is missing.
+        retry_delay_seconds (float, optional): Wait between those writes.
+
+    Returns:
+        bool: Whether the comparison was stored.
+    """
+    for attempt in range(attempts):
+        try:
+            table.update_item(
+                Key={"request_id": request_id},
+                UpdateExpression="SET shadow = :shadow",
+                ConditionExpression="attribute_exists(request_id)",
+                ExpressionAttributeValues={":shadow": comparison}
+            )
+            return True
+        except table.meta.client.exceptions.ConditionalCheckFailedException:
+            if attempt + 1 < attempts:
+                time.sleep(retry_delay_seconds)
+    return False
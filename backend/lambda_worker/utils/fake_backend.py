@@ -0,0 +1,754 @@
+"""
+In-process stand-ins for Bedrock, SQS and DynamoDB with configurable latency and faults.
+
+With FAKE_BACKEND=on, utils.aws_clients hands these out instead of boto3 clients, so the
+agents, the worker (save_answer, idempotency, heartbeat, retry tier, degradation) and the
+poller run unchanged on a laptop, without AWS. Use it to tune concurrency, deadlines and
+retry settings against throttling storms and slow models:
+
+    FAKE_BACKEND=on FAKE_THROTTLE_STORM=60:15 python -m utils.fake_backend --messages 300
+
+Bedrock answers are canned in the format each agent expects (OWASP text, quiz JSON, hint
+JSON, code review, <answer id="N"> batches, knowledge base text), chosen from the prompt.
+A call takes a base latency plus a time per input and output token, and output is cut at
+max_tokens like the real model. Latencies are distributions written as "kind:params" in ms:
+"fixed:500", "uniform:200:800", "normal:500:100", "lognormal:<median>:<sigma>",
+"exponential:<mean>".
+
+State (queues, tables) lives in this process only.
+"""
+import io
+import os
+import re
+import json
+import math
+import time
+import uuid
+import random
+import logging
+import threading
+from collections import Counter
+from botocore.exceptions import ClientError, ReadTimeoutError
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Bedrock timing: base latency (time to first token), then per-token generation/prefill time (ms)
+FAKE_BEDROCK_LATENCY_MS = os.environ.get("FAKE_BEDROCK_LATENCY_MS", "lognormal:400:0.5")
+FAKE_MS_PER_OUTPUT_TOKEN = float(os.environ.get("FAKE_MS_PER_OUTPUT_TOKEN", "15"))
+FAKE_MS_PER_INPUT_TOKEN = float(os.environ.get("FAKE_MS_PER_INPUT_TOKEN", "0.1"))
+
+# Extra latency of RetrieveAndGenerate for the knowledge base retrieval (ms)
+FAKE_RETRIEVAL_LATENCY_MS = os.environ.get("FAKE_RETRIEVAL_LATENCY_MS", "lognormal:300:0.3")
+
+# Length of canned free-text answers (tokens); JSON answers have their natural size
+FAKE_TEXT_TOKENS = os.environ.get("FAKE_TEXT_TOKENS", "uniform:200:600")
+
+# Bedrock faults, as a share of calls: throttling, 5xx errors, hangs until the read timeout,
+# and answers that aren't in the requested format
+FAKE_THROTTLE_RATE = float(os.environ.get("FAKE_THROTTLE_RATE", "0"))
+FAKE_ERROR_RATE = float(os.environ.get("FAKE_ERROR_RATE", "0"))
+FAKE_TIMEOUT_RATE = float(os.environ.get("FAKE_TIMEOUT_RATE", "0"))
+FAKE_MALFORMED_RATE = float(os.environ.get("FAKE_MALFORMED_RATE", "0"))
+
+# Recurring throttling storm, "period:duration[:rate]" in seconds from process start
+# (e.g. "60:15" throttles every call for 15s each minute); unset = no storms
+FAKE_THROTTLE_STORM = os.environ.get("FAKE_THROTTLE_STORM", "")
+
+# Regions the throttling applies to (unset = all), to exercise the region pool's failover
+FAKE_THROTTLE_REGIONS = set(filter(None, os.environ.get("FAKE_THROTTLE_REGIONS", "").split(",")))
+
+# SQS and DynamoDB timing (ms) and DynamoDB throughput errors (share of calls)
+FAKE_SQS_LATENCY_MS = os.environ.get("FAKE_SQS_LATENCY_MS", "uniform:2:10")
+FAKE_DYNAMODB_LATENCY_MS = os.environ.get("FAKE_DYNAMODB_LATENCY_MS", "uniform:3:12")
+FAKE_DYNAMODB_ERROR_RATE = float(os.environ.get("FAKE_DYNAMODB_ERROR_RATE", "0"))
+
+# Queue behaviour: visibility timeout (seconds) and receives before a message is dead-lettered
+FAKE_SQS_VISIBILITY_TIMEOUT = int(os.environ.get("FAKE_SQS_VISIBILITY_TIMEOUT", "30"))
+FAKE_SQS_MAX_RECEIVE_COUNT = int(os.environ.get("FAKE_SQS_MAX_RECEIVE_COUNT", "5"))
+
+# Seed for reproducible runs (unset = random)
+FAKE_SEED = os.environ.get("FAKE_SEED")
+
+_rng = random.Random(FAKE_SEED)
+_started_at = time.monotonic()
+
+# Faults injected and calls served, by "<service>.<what>"
+stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _count(name: str):
+    with _stats_lock:
+        stats[name] += 1
+
+
+def parse_distribution(spec: str):
+    """
+    Reads a latency distribution ("fixed:500", "uniform:a:b", "normal:mean:sd",
+    "lognormal:median:sigma", "exponential:mean" or a plain number).
+
+    Returns:
+        callable: rng -> sample (never negative).
+    """
+    kind, _, params = spec.strip().partition(":")
+    try:
+        if not params:
+            value = float(kind)
+            return lambda rng: value
+        args = [float(param) for param in params.split(":")]
+        if kind == "fixed":
+            return lambda rng: args[0]
+        if kind == "uniform":
+            return lambda rng: rng.uniform(args[0], args[1])
+        if kind == "normal":
+            return lambda rng: max(0.0, rng.gauss(args[0], args[1]))
+        if kind == "lognormal":
+            return lambda rng: rng.lognormvariate(math.log(args[0]), args[1])
+        if kind == "exponential":
+            return lambda rng: rng.expovariate(1 / args[0])
+    except (ValueError, IndexError):
+        pass
+    raise ValueError(f"Unknown distribution '{spec}'")
+
+
+def _sleep_ms(distribution):
+    time.sleep(distribution(_rng) / 1000)
+
+
+def _client_error(code: str, message: str, operation: str, status: int = 400) -> ClientError:
+    return ClientError(
+        {"Error": {"Code": code, "Message": message}, "ResponseMetadata": {"HTTPStatusCode": status}},
+        operation
+    )
+
+
+def in_storm(now: float = None) -> bool:
+    """Whether a FAKE_THROTTLE_STORM is raging at `now` (monotonic seconds)."""
+    if not FAKE_THROTTLE_STORM:
+        return False
+    period, duration = (float(part) for part in FAKE_THROTTLE_STORM.split(":")[:2])
+    return ((now if now is not None else time.monotonic()) - _started_at) % period < duration
+
+
+def _storm_rate() -> float:
+    parts = FAKE_THROTTLE_STORM.split(":")
+    return float(parts[2]) if len(parts) > 2 else 1.0
+
+
+# --- Canned answers --------------------------------------------------------------------
+
+_FILLER = (
+    "Validate every input on the server side, encode output for the context it is used in, "
+    "and keep secrets out of source code. Prefer well-reviewed libraries over hand-written "
+    "security controls, and log security-relevant events without logging sensitive data. "
+)
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, math.ceil(len(text) / 4))
+
+
+def _padded(text: str) -> str:
+    target_chars = int(parse_distribution(FAKE_TEXT_TOKENS)(_rng)) * 4
+    while len(text) < target_chars:
+        text += "\n\n" + _FILLER
+    return text
+
+
+def _owasp_text() -> str:
+    return _padded(
+        "**A03: Injection**\n\nInjection happens when untrusted data is sent to an interpreter as part "
+        "of a command or query. Use parameterised queries and validate input against an allow-list."
+    )
+
+
+def _hint_json() -> str:
+    return ("Here is a hint for the task:\n"
+            '{\n  "hint": "Look at how user input reaches the query. What would make it a value instead of code?"\n}')
+
+
+def _quiz_json() -> str:
+    questions = [
+        {
+            "question": f"Which practice best prevents injection in scenario {number}?",
+            "choices": ["Parameterised queries", "Client-side validation", "Obfuscation", "Longer passwords"],
+            "answer": "Parameterised queries",
+            "explanation": "Parameters keep user input as data, so it is never executed as part of the query.",
+        }
+        for number in range(1, 11)
+    ]
+    return json.dumps({"questions": questions}, indent=2)
+
+
+def _codereview_text() -> str:
+    return _padded(
+        "### Summary\nThe code reads a user id from the request and builds a SQL query from it.\n\n"
+        "### Potential vulnerabilities\n- A03 Injection: the query is built by string concatenation.\n"
+        "- A09: failed lookups are not logged.\n\n"
+        "### Recommendations\n- Use a parameterised query.\n- Log failures without the raw input."
+    )
+
+
+def _rag_text() -> str:
+    return _padded("According to the course material, the assignment asks you to threat-model the lab "
+                   "application first and then fix the two highest-risk findings.")
+
+
+def canned_answer(prompt: str) -> str:
+    """The answer an agent expects for this prompt: batch blocks, quiz JSON, hint JSON, review or OWASP text."""
+    batch_ids = re.findall(r'<question id="(\d+)"', prompt)
+    if batch_ids and "<answer id=" in prompt:
+        single = _hint_json if '"hint"' in prompt else _owasp_text
+        return "\n\n".join(f'<answer id="{answer_id}">\n{single()}\n</answer>' for answer_id in batch_ids)
+    if '"questions"' in prompt:
+        return _quiz_json()
+    if '"hint"' in prompt:
+        return _hint_json()
+    if "secure coding reviewer" in prompt:
+        return _codereview_text()
+    return _owasp_text()
+
+
+def _truncate_to(text: str, max_tokens) -> tuple:
+    """Cuts the text at max_tokens like the model would; returns (text, output tokens, stop reason)."""
+    tokens = _estimate_tokens(text)
+    if max_tokens and tokens > max_tokens:
+        return text[:max_tokens * 4], max_tokens, "max_tokens"
+    return text, tokens, "end_turn"
+
+
+# --- Bedrock ---------------------------------------------------------------------------
+
+class _FakeBedrock:
+    """Shared fault and timing model of both Bedrock runtimes."""
+
+    def __init__(self, service: str, region: str, read_timeout: float):
+        self.service = service
+        self.region = region
+        self.read_timeout = read_timeout
+        self._latency = parse_distribution(FAKE_BEDROCK_LATENCY_MS)
+
+    def _throttle_rate(self) -> float:
+        if FAKE_THROTTLE_REGIONS and self.region not in FAKE_THROTTLE_REGIONS:
+            return 0.0
+        return max(FAKE_THROTTLE_RATE, _storm_rate() if in_storm() else 0.0)
+
+    def _inject_faults(self, operation: str):
+        roll = _rng.random()
+        throttle = self._throttle_rate()
+        if roll < throttle:
+            _count(f"{self.service}.throttled")
+            time.sleep(0.02)
+            raise _client_error("ThrottlingException", "Too many requests, please wait before trying again.",
+                                operation, 429)
+        if roll < throttle + FAKE_ERROR_RATE:
+            _count(f"{self.service}.error")
+            time.sleep(0.05)
+            code = _rng.choice(["ServiceUnavailableException", "InternalServerException", "ModelTimeoutException"])
+            raise _client_error(code, "Injected service error", operation, 503)
+        if roll < throttle + FAKE_ERROR_RATE + FAKE_TIMEOUT_RATE:
+            self._hang()
+
+    def _hang(self):
+        _count(f"{self.service}.timeout")
+        time.sleep(self.read_timeout)
+        raise ReadTimeoutError(endpoint_url=f"https://{self.service}.{self.region}.amazonaws.com")
+
+    def _respond_after(self, seconds: float):
+        # A response slower than the client's read timeout is a read timeout
+        if seconds > self.read_timeout:
+            self._hang()
+        time.sleep(seconds)
+
+    def _generation_seconds(self, input_tokens: int, output_tokens: int) -> float:
+        return (self._latency(_rng) + input_tokens * FAKE_MS_PER_INPUT_TOKEN
+                + output_tokens * FAKE_MS_PER_OUTPUT_TOKEN) / 1000
+
+    def _answer(self, prompt: str) -> str:
+        if FAKE_MALFORMED_RATE and _rng.random() < FAKE_MALFORMED_RATE:
+            _count(f"{self.service}.malformed")
+            return "I'm sorry, I can't produce that in the requested format."
+        return canned_answer(prompt)
+
+
+class FakeBedrockRuntime(_FakeBedrock):
+    """bedrock-runtime: invoke_model with the Anthropic Messages API."""
+
+    def __init__(self, region: str, read_timeout: float):
+        super().__init__("bedrock-runtime", region, read_timeout)
+
+    def invoke_model(self, modelId: str, body, contentType: str = None, accept: str = None, **kwargs) -> dict:
+        self._inject_faults("InvokeModel")
+        request = json.loads(body)
+        prompt = "\n".join(
+            message["content"] if isinstance(message["content"], str)
+            else "".join(part.get("text", "") for part in message["content"])
+            for message in request.get("messages", [])
+        )
+        text, output_tokens, stop_reason = _truncate_to(self._answer(prompt), request.get("max_tokens"))
+        input_tokens = _estimate_tokens(prompt)
+        self._respond_after(self._generation_seconds(input_tokens, output_tokens))
+        _count(f"{self.service}.ok")
+
+        payload = {
+            "id": f"msg_fake_{uuid.uuid4().hex[:12]}",
+            "type": "message",
+            "role": "assistant",
+            "model": modelId,
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": stop_reason,
+            "usage": {"input_tokens": input_tokens, "output_tokens": output_tokens},
+        }
+        return {"body": io.BytesIO(json.dumps(payload).encode("utf-8")), "contentType": "application/json"}
+
+
+class FakeBedrockAgentRuntime(_FakeBedrock):
+    """bedrock-agent-runtime: retrieve_and_generate against a knowledge base."""
+
+    def __init__(self, region: str, read_timeout: float):
+        super().__init__("bedrock-agent-runtime", region, read_timeout)
+        self._retrieval = parse_distribution(FAKE_RETRIEVAL_LATENCY_MS)
+
+    def retrieve_and_generate(self, input: dict, retrieveAndGenerateConfiguration: dict, **kwargs) -> dict:
+        self._inject_faults("RetrieveAndGenerate")
+        kb_config = retrieveAndGenerateConfiguration.get("knowledgeBaseConfiguration", {})
+        inference = (kb_config.get("generationConfiguration", {}).get("inferenceConfig", {})
+                     .get("textInferenceConfig", {}))
+        answer = _rag_text() if _rng.random() >= FAKE_MALFORMED_RATE else self._answer("")
+        text, output_tokens, _ = _truncate_to(answer, inference.get("maxTokens"))
+        input_tokens = _estimate_tokens(input.get("text", "")) + 1500  # retrieved passages
+        self._respond_after(self._retrieval(_rng) / 1000 + self._generation_seconds(input_tokens, output_tokens))
+        _count(f"{self.service}.ok")
+        return {
+            "output": {"text": text},
+            "citations": [],
+            "sessionId": str(uuid.uuid4()),
+        }
+
+
+# --- SQS -------------------------------------------------------------------------------
+
+class _Message:
+    __slots__ = ("message_id", "body", "attributes", "sent_at", "visible_at", "receipt_handle", "receive_count")
+
+    def __init__(self, body: str, attributes: dict, delay_seconds: int):
+        self.message_id = str(uuid.uuid4())
+        self.body = body
+        self.attributes = attributes or {}
+        self.sent_at = time.time()
+        self.visible_at = time.monotonic() + delay_seconds
+        self.receipt_handle = None
+        self.receive_count = 0
+
+
+class _Queue:
+    def __init__(self, url: str):
+        self.url = url
+        self.messages = []
+        self.dead_letters = []
+        self.condition = threading.Condition()
+
+
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+def queue(url: str) -> _Queue:
+    """The fake queue at a URL, created on first use."""
+    with _queues_lock:
+        if url not in _queues:
+            _queues[url] = _Queue(url)
+        return _queues[url]
+
+
+class FakeSqs:
+    """The SQS calls the worker and poller make, on in-memory queues."""
+
+    def __init__(self, region: str):
+        self.region = region
+        self._latency = parse_distribution(FAKE_SQS_LATENCY_MS)
+
+    def get_queue_url(self, QueueName: str, **kwargs) -> dict:
+        return {"QueueUrl": f"https://sqs.{self.region}.amazonaws.com/000000000000/{QueueName}"}
+
+    def create_queue(self, QueueName: str, **kwargs) -> dict:
+        response = self.get_queue_url(QueueName)
+        queue(response["QueueUrl"])
+        return response
+
+    def send_message(self, QueueUrl: str, MessageBody: str, DelaySeconds: int = 0, MessageAttributes: dict = None,
+                     **kwargs) -> dict:
+        _sleep_ms(self._latency)
+        target = queue(QueueUrl)
+        message = _Message(MessageBody, MessageAttributes, DelaySeconds)
+        with target.condition:
+            target.messages.append(message)
+            target.condition.notify_all()
+        return {"MessageId": message.message_id}
+
+    def receive_message(self, QueueUrl: str, MaxNumberOfMessages: int = 1, WaitTimeSeconds: int = 0,
+                        VisibilityTimeout: int = None, **kwargs) -> dict:
+        _sleep_ms(self._latency)
+        source = queue(QueueUrl)
+        give_up_at = time.monotonic() + WaitTimeSeconds
+        with source.condition:
+            while True:
+                received = self._take_visible(source, MaxNumberOfMessages, VisibilityTimeout)
+                remaining = give_up_at - time.monotonic()
+                if received or remaining <= 0:
+                    break
+                # Wake up for new messages, and at least every second for delays/visibility expiring
+                source.condition.wait(min(remaining, 1.0))
+        return {"Messages": received} if received else {}
+
+    def _take_visible(self, source: _Queue, limit: int, visibility_timeout) -> list:
+        now = time.monotonic()
+        received = []
+        for message in list(source.messages):
+            if len(received) >= limit:
+                break
+            if message.visible_at > now:
+                continue
+            if message.receive_count >= FAKE_SQS_MAX_RECEIVE_COUNT:
+                # Redrive policy: out of receives, off to the dead-letter list
+                source.messages.remove(message)
+                source.dead_letters.append(message)
+                continue
+            message.receive_count += 1
+            message.receipt_handle = uuid.uuid4().hex
+            message.visible_at = now + (visibility_timeout if visibility_timeout is not None
+                                        else FAKE_SQS_VISIBILITY_TIMEOUT)
+            received.append({
+                "MessageId": message.message_id,
+                "ReceiptHandle": message.receipt_handle,
+                "Body": message.body,
+                "Attributes": {
+                    "SentTimestamp": str(int(message.sent_at * 1000)),
+                    "ApproximateReceiveCount": str(message.receive_count),
+                },
+                "MessageAttributes": {
+                    name: {"StringValue": value.get("StringValue"), "DataType": value.get("DataType", "String")}
+                    for name, value in message.attributes.items()
+                },
+            })
+        return received
+
+    def _find(self, source: _Queue, receipt_handle: str) -> _Message:
+        for message in source.messages:
+            if message.receipt_handle == receipt_handle:
+                return message
+        raise _client_error("ReceiptHandleIsInvalid", "The receipt handle is not valid", "ChangeMessageVisibility")
+
+    def delete_message(self, QueueUrl: str, ReceiptHandle: str, **kwargs) -> dict:
+        _sleep_ms(self._latency)
+        source = queue(QueueUrl)
+        with source.condition:
+            source.messages = [message for message in source.messages if message.receipt_handle != ReceiptHandle]
+        return {}
+
+    def change_message_visibility(self, QueueUrl: str, ReceiptHandle: str, VisibilityTimeout: int, **kwargs) -> dict:
+        _sleep_ms(self._latency)
+        source = queue(QueueUrl)
+        with source.condition:
+            self._find(source, ReceiptHandle).visible_at = time.monotonic() + VisibilityTimeout
+            source.condition.notify_all()
+        return {}
+
+    def get_queue_attributes(self, QueueUrl: str, AttributeNames: list = None, **kwargs) -> dict:
+        _sleep_ms(self._latency)
+        source = queue(QueueUrl)
+        now = time.monotonic()
+        with source.condition:
+            visible = sum(1 for message in source.messages if message.visible_at <= now)
+            in_flight = sum(1 for message in source.messages if message.visible_at > now and message.receive_count)
+            delayed = len(source.messages) - visible - in_flight
+        return {"Attributes": {
+            "ApproximateNumberOfMessages": str(visible),
+            "ApproximateNumberOfMessagesNotVisible": str(in_flight),
+            "ApproximateNumberOfMessagesDelayed": str(delayed),
+        }}
+
+
+# --- DynamoDB --------------------------------------------------------------------------
+
+class _ConditionalCheckFailedException(ClientError):
+    def __init__(self, operation: str):
+        super().__init__({"Error": {"Code": "ConditionalCheckFailedException", "Message": "The conditional request failed"},
+                          "ResponseMetadata": {"HTTPStatusCode": 400}}, operation)
+
+
+class _Exceptions:
+    ConditionalCheckFailedException = _ConditionalCheckFailedException
+
+
+class _Meta:
+    class client:
+        exceptions = _Exceptions
+
+
+_TOKEN = re.compile(r"\s*(<>|<=|>=|=|<|>|\(|\)|,|[#:]?[A-Za-z_][A-Za-z0-9_.]*)")
+
+
+class _Expression:
+    """
+    Evaluates the small subset of DynamoDB expressions the worker uses: attribute_exists,
+    attribute_not_exists, comparisons, AND/OR/NOT and parentheses; SET path = :value, ADD path :number
+    and REMOVE.
+    """
+
+    def __init__(self, names: dict = None, values: dict = None):
+        self.names = names or {}
+        self.values = values or {}
+
+    def _tokens(self, expression: str) -> list:
+        tokens, position = [], 0
+        expression = expression.strip()
+        while position < len(expression):
+            match = _TOKEN.match(expression, position)
+            if not match:
+                raise NotImplementedError(f"Expression not supported by the fake backend: {expression}")
+            tokens.append(match.group(1))
+            position = match.end()
+        return tokens
+
+    def _path(self, token: str) -> str:
+        return self.names.get(token, token) if token.startswith("#") else token
+
+    def _operand(self, token: str, item: dict):
+        return self.values[token] if token.startswith(":") else item.get(self._path(token))
+
+    def condition(self, expression: str, item: dict) -> bool:
+        tokens = self._tokens(expression)
+        result, position = self._or(tokens, 0, item)
+        if position != len(tokens):
+            raise NotImplementedError(f"Expression not supported by the fake backend: {expression}")
+        return result
+
+    def _or(self, tokens, position, item):
+        result, position = self._and(tokens, position, item)
+        while position < len(tokens) and tokens[position].upper() == "OR":
+            right, position = self._and(tokens, position + 1, item)
+            result = result or right
+        return result, position
+
+    def _and(self, tokens, position, item):
+        result, position = self._factor(tokens, position, item)
+        while position < len(tokens) and tokens[position].upper() == "AND":
+            right, position = self._factor(tokens, position + 1, item)
+            result = result and right
+        return result, position
+
+    def _factor(self, tokens, position, item):
+        token = tokens[position]
+        if token.upper() == "NOT":
+            result, position = self._factor(tokens, position + 1, item)
+            return not result, position
+        if token == "(":
+            result, position = self._or(tokens, position + 1, item)
+            return result, position + 1  # ")"
+        if token in ("attribute_exists", "attribute_not_exists"):
+            present = self._path(tokens[position + 2]) in item
+            return present if token == "attribute_exists" else not present, position + 4
+        left, operator, right = tokens[position:position + 3]
+        a, b = self._operand(left, item), self._operand(right, item)
+        if operator in ("=", "<>"):
+            return (a == b) == (operator == "="), position + 3
+        if a is None or b is None:
+            return False, position + 3
+        return {"<": a < b, "<=": a <= b, ">": a > b, ">=": a >= b}[operator], position + 3
+
+    def update(self, expression: str, item: dict):
+        clauses = re.findall(r"\b(SET|REMOVE|ADD)\b(.*?)(?=\bSET\b|\bREMOVE\b|\bADD\b|$)", expression, re.I | re.S)
+        for clause, body in clauses:
+            for part in filter(None, (part.strip() for part in body.split(","))):
+                if clause.upper() == "REMOVE":
+                    item.pop(self._path(part), None)
+                    continue
+                if clause.upper() == "ADD":
+                    path, value = part.split()
+                    item[self._path(path)] = item.get(self._path(path), 0) + self.values[value]
+                    continue
+                path, _, value = (side.strip() for side in part.partition("="))
+                if not value.startswith(":"):
+                    raise NotImplementedError(f"Update not supported by the fake backend: {part}")
+                item[self._path(path)] = self.values[value]
+
+
+class FakeTable:
+    """
+    The DynamoDB Table calls the worker makes (put/get/update/delete item), in memory.
+
+    Tables have a single key attribute: `key` for put_item, whichever attribute `Key` names otherwise
+    (e.g. bucket_id for the quota table).
+    """
+
+    meta = _Meta
+
+    def __init__(self, name: str, key: str = "request_id"):
+        self.name = name
+        self.key = key
+        self.items = {}
+        self._lock = threading.Lock()
+        self._latency = parse_distribution(FAKE_DYNAMODB_LATENCY_MS)
+
+    def _call(self, operation: str):
+        _sleep_ms(self._latency)
+        if FAKE_DYNAMODB_ERROR_RATE and _rng.random() < FAKE_DYNAMODB_ERROR_RATE:
+            _count("dynamodb.throttled")
+            raise _client_error("ProvisionedThroughputExceededException", "Injected throughput error", operation)
+
+    def _key_of(self, Key: dict):
+        return Key[self.key] if self.key in Key else next(iter(Key.values()))
+
+    def _check(self, operation: str, existing: dict, condition: str, names: dict, values: dict):
+        if condition and not _Expression(names, values).condition(condition, existing or {}):
+            raise _ConditionalCheckFailedException(operation)
+
+    def put_item(self, Item: dict, ConditionExpression: str = None, ExpressionAttributeNames: dict = None,
+                 ExpressionAttributeValues: dict = None, **kwargs) -> dict:
+        self._call("PutItem")
+        with self._lock:
+            key = Item[self.key]
+            self._check("PutItem", self.items.get(key), ConditionExpression, ExpressionAttributeNames,
+                        ExpressionAttributeValues)
+            self.items[key] = dict(Item)
+        return {}
+
+    def get_item(self, Key: dict, **kwargs) -> dict:
+        self._call("GetItem")
+        with self._lock:
+            item = self.items.get(self._key_of(Key))
+        return {"Item": dict(item)} if item is not None else {}
+
+    def update_item(self, Key: dict, UpdateExpression: str, ConditionExpression: str = None,
+                    ExpressionAttributeNames: dict = None, ExpressionAttributeValues: dict = None, **kwargs) -> dict:
+        self._call("UpdateItem")
+        with self._lock:
+            key = self._key_of(Key)
+            existing = self.items.get(key)
+            self._check("UpdateItem", existing, ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues)
+            item = dict(existing or Key)
+            _Expression(ExpressionAttributeNames, ExpressionAttributeValues).update(UpdateExpression, item)
+            self.items[key] = item
+        return {}
+
+    def delete_item(self, Key: dict, ConditionExpression: str = None, ExpressionAttributeNames: dict = None,
+                    ExpressionAttributeValues: dict = None, **kwargs) -> dict:
+        self._call("DeleteItem")
+        with self._lock:
+            key = self._key_of(Key)
+            self._check("DeleteItem", self.items.get(key), ConditionExpression, ExpressionAttributeNames,
+                        ExpressionAttributeValues)
+            self.items.pop(key, None)
+        return {}
+
+
+_tables = {}
+_tables_lock = threading.Lock()
+
+
+def table(name: str) -> FakeTable:
+    """The fake table with this name, created on first use."""
+    with _tables_lock:
+        if name not in _tables:
+            _tables[name] = FakeTable(name)
+        return _tables[name]
+
+
+def client(service_name: str, region: str, read_timeout: float):
+    """
+    A fake client for a boto3 service name (see utils.aws_clients.get_client).
+
+    Raises:
+        NotImplementedError: For services the fake backend doesn't cover.
+    """
+    if service_name == "bedrock-runtime":
+        return FakeBedrockRuntime(region, read_timeout)
+    if service_name == "bedrock-agent-runtime":
+        return FakeBedrockAgentRuntime(region, read_timeout)
+    if service_name == "sqs":
+        return FakeSqs(region)
+    raise NotImplementedError(f"No fake for service '{service_name}'")
+
+
+# --- Benchmark ---------------------------------------------------------------------------
+
+BENCHMARK_QUESTIONS = {
+    "owasp": "What is SQL injection and how do I prevent it?",
+    "labhint": "Task 3: make the login form resistant to brute force.",
+    "sc-labquiz-gen": "Lab notes: input validation, output encoding and parameterised queries.",
+    "codereview": "query = \"SELECT * FROM users WHERE id = \" + request.args['id']",
+    "assignment": "What does part 2 of the assignment ask for?",
+    "cloudops": "How do I rotate the access keys used by the lab's EC2 instance?",
+}
+
+
+def run_benchmark(messages: int, topics: list, timeout: float) -> dict:
+    """
+    Queues `messages` questions on the fake queue, runs the poller until they are drained
+    (answered or dead-lettered) or `timeout` passes, and reports what happened.
+
+    Must run with FAKE_BACKEND=on, in the process that owns the fake queue and tables.
+    """
+    from datetime import datetime
+    from utils.aws_clients import FAKE_BACKEND, get_sqs_client
+
+    if not FAKE_BACKEND:
+        raise SystemExit("Set FAKE_BACKEND=on: the benchmark only runs against the fake backend")
+
+    sqs = get_sqs_client()
+    queue_url = os.environ.setdefault("QUEUE_URL", sqs.get_queue_url(QueueName="RAGQueryQueue")["QueueUrl"])
+    os.environ.setdefault("TABLE_NAME", "ResponseTable")
+    os.environ.setdefault("KB_ID", "FAKEKB0000")
+    os.environ.setdefault("POLLER_WAIT_TIME_SECONDS", "1")
+    from poller import SqsPoller  # reads the settings above on import
+
+    for number in range(messages):
+        topic = topics[number % len(topics)]
+        sqs.send_message(QueueUrl=queue_url, MessageBody=json.dumps({
+            "request_id": f"bench-{uuid.uuid4()}",
+            "user_id": "benchmark",
+            # Numbered so every question misses the answer cache
+            "question": f"{BENCHMARK_QUESTIONS.get(topic, 'What is broken access control?')} (#{number})",
+            "topic": topic,
+            "timestamp": datetime.utcnow().isoformat(),
+            "submitted_at": int(time.time()),
+        }))
+
+    poller = SqsPoller(sqs, queue_url)
+    runner = threading.Thread(target=poller.run, name="poller", daemon=True)
+    start = time.monotonic()
+    runner.start()
+    source = queue(queue_url)
+    while source.messages and time.monotonic() - start < timeout:
+        time.sleep(0.5)
+    elapsed = time.monotonic() - start
+    poller.stop()
+    runner.join()
+
+    answered = len(table(os.environ["TABLE_NAME"]).items)
+    return {
+        "messages": messages,
+        "answered": answered,
+        "dead_lettered": len(source.dead_letters),
+        "left_on_queue": len(source.messages),
+        "elapsed_seconds": round(elapsed, 1),
+        "answers_per_second": round(answered / elapsed, 2) if elapsed else None,
+        "backend": dict(sorted(stats.items())),
+    }
+
+
+if __name__ == "__main__":
+    # Run from backend/lambda_worker: FAKE_BACKEND=on python -m utils.fake_backend --messages 200
+    import argparse
+    from utils import fake_backend  # the copy utils.aws_clients uses, not this __main__ one
+
+    parser = argparse.ArgumentParser(description="Drain a fake queue through the poller against the fake backend.")
+    parser.add_argument("--messages", type=int, default=100)
+    parser.add_argument("--topics", default="owasp,labhint,assignment,codereview")
+    parser.add_argument("--timeout", type=float, default=600)
+    args = parser.parse_args()
+
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(threadName)s %(message)s")
+    print(json.dumps(fake_backend.run_benchmark(args.messages, args.topics.split(","), args.timeout), indent=2))
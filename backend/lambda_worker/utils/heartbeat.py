@@ -0,0 +1,112 @@
+import os
+import logging
+import threading
+from contextlib import contextmanager
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# How often in-flight messages are extended, and by how much each time (seconds).
+# The interval must stay well below the queue's visibility timeout.
+HEARTBEAT_INTERVAL_SECONDS = float(os.environ.get("HEARTBEAT_INTERVAL_SECONDS", "15"))
+VISIBILITY_EXTENSION_SECONDS = int(os.environ.get("VISIBILITY_EXTENSION_SECONDS", "45"))
+
+
+def queue_url_from_arn(queue_arn: str) -> str:
+    """
+    Builds the queue URL from an SQS record's eventSourceARN.
+
+    Args:
+        queue_arn (str): e.g. "arn:aws:sqs:ap-northeast-1:123456789012:RAGQueryQueue".
+
+    Returns:
+        str: e.g. "https://sqs.ap-northeast-1.amazonaws.com/123456789012/RAGQueryQueue".
+    """
+    _, partition, _, region, account_id, queue_name = queue_arn.split(":", 5)
+    domain = "amazonaws.com.cn" if partition == "aws-cn" else "amazonaws.com"
+    return f"https://sqs.{region}.{domain}/{account_id}/{queue_name}"
+
+
+class VisibilityHeartbeat:
+    """
+    Keeps in-flight SQS messages invisible while their agent call is still running.
+
+    One background thread serves every tracked message. Each beat calls
+    ChangeMessageVisibility, so a slow agent never lets its message reappear
+    on the queue and get picked up by a second worker.
+    """
+
+    def __init__(self, sqs_client, interval: float = HEARTBEAT_INTERVAL_SECONDS,
+                 extension: int = VISIBILITY_EXTENSION_SECONDS):
+        self._sqs = sqs_client
+        self._interval = interval
+        self._extension = extension
+        self._in_flight = {}  # receipt handle -> queue URL
+        self._extending = {}  # receipt handle -> Event set once its running extension is done
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @contextmanager
+    def track(self, queue_url: str, receipt_handle: str):
+        """Extends the message's visibility for as long as the with-block runs."""
+        if not queue_url or not receipt_handle:
+            yield
+            return
+
+        with self._lock:
+            self._in_flight[receipt_handle] = queue_url
+            self._ensure_running()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_flight.pop(receipt_handle, None)
+                extending = self._extending.get(receipt_handle)
+            # Once track() has let go of a message, the caller may set its visibility itself
+            # (e.g. a short retry delay), so wait out an extension that is already on its way
+            if extending is not None:
+                extending.wait()
+
+    def _ensure_running(self):
+        # Called with the lock held
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="visibility-heartbeat", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        stop = threading.Event()
+        while not stop.wait(self._interval):
+            with self._lock:
+                in_flight = list(self._in_flight.items())
+                if not in_flight:
+                    # Nothing left to extend; the next track() starts a new thread
+                    self._thread = None
+                    return
+
+            for receipt_handle, queue_url in in_flight:
+                # Skipped if track() let go of it meanwhile; otherwise marked so its exit waits
+                with self._lock:
+                    if receipt_handle not in self._in_flight:
+                        continue
+                    done = self._extending[receipt_handle] = threading.Event()
+                try:
+                    self._extend(queue_url, receipt_handle)
+                finally:
+                    with self._lock:
+                        self._extending.pop(receipt_handle, None)
+                    done.set()
+
+    def _extend(self, queue_url: str, receipt_handle: str):
+        try:
+            self._sqs.change_message_visibility(
+                QueueUrl=queue_url,
+                ReceiptHandle=receipt_handle,
+                VisibilityTimeout=self._extension,
+            )
+            logger.info(f"💓 Extended visibility by {self._extension}s for in-flight message")
+        except ClientError as e:
+            # The receipt handle is no longer valid (message deleted or already redelivered)
+            logger.warning(f"⚠️ Visibility heartbeat failed, no longer tracking message: {e}")
+            with self._lock:
+                self._in_flight.pop(receipt_handle, None)
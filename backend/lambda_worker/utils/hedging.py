@@ -0,0 +1,148 @@
+import os
+import time
+import logging
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from utils import openmetrics
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Recent latencies kept per (model, region) to compute the hedge percentile
+LATENCY_WINDOW = int(os.environ.get("HEDGE_LATENCY_WINDOW", "200"))
+
+# Below this many samples the policy's fixed delay is used instead of the percentile
+MIN_SAMPLES = int(os.environ.get("HEDGE_MIN_SAMPLES", "20"))
+
+
+@dataclass(frozen=True)
+class HedgePolicy:
+    """When and where to send a backup request for a slow Bedrock call."""
+    model_id: str = None  # backup model; None = same model as the primary
+    region: str = None  # backup region; None = same region as the primary
+    percentile: float = 95  # hedge once the primary is slower than this latency percentile
+    min_delay_seconds: float = 2.0  # floor for the hedge delay (and fixed delay while warming up)
+
+
+class LatencyTracker:
+    """Sliding window of call latencies for one (model, region)."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct: float):
+        """Returns the pct-th percentile latency, or None while there are too few samples."""
+        with self._lock:
+            if len(self._samples) < MIN_SAMPLES:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+
+_trackers = {}
+_trackers_lock = threading.Lock()
+
+# Counters so the extra cost of hedging is visible (logged per batch and served as rag_hedges)
+_stats = {"calls": 0, "hedges_sent": 0, "primary_wins": 0, "backup_wins": 0}
+_EVENTS = {"calls": "call", "hedges_sent": "hedge_sent", "primary_wins": "primary_win", "backup_wins": "backup_win"}
+_stats_lock = threading.Lock()
+
+# Primary and backup calls run here while the caller waits on them
+_hedge_executor = ThreadPoolExecutor(
+    max_workers=2 * int(os.environ.get("WORKER_CONCURRENCY", "10")),
+    thread_name_prefix="hedge"
+)
+
+
+def get_tracker(key) -> LatencyTracker:
+    tracker = _trackers.get(key)
+    if tracker is None:
+        with _trackers_lock:
+            tracker = _trackers.setdefault(key, LatencyTracker())
+    return tracker
+
+
+def _count(name: str):
+    with _stats_lock:
+        _stats[name] += 1
+    openmetrics.HEDGES.inc(event=_EVENTS[name])
+
+
+def get_hedge_stats() -> dict:
+    """Returns a snapshot of the hedging counters for this process."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def hedge_delay(key, hedge: HedgePolicy) -> float:
+    """Seconds to wait for the primary before sending the backup."""
+    observed = get_tracker(key).percentile(hedge.percentile)
+    return max(hedge.min_delay_seconds, observed or 0.0)
+
+
+def _submit(fn):
+    # Each call runs in a copy of the caller's context so context-local state follows it
+    return _hedge_executor.submit(contextvars.copy_context().run, fn)
+
+
+def hedged_call(key, primary, backup, hedge: HedgePolicy, deadline=None):
+    """
+    Runs `primary`; if it is slower than the hedge delay, also runs `backup`.
+
+    The first successful result wins. The loser is cancelled if it hasn't started,
+    otherwise its result is ignored. If one call fails, the other is still awaited.
+
+    Args:
+        key: Latency tracker key of the primary, e.g. (model_id, region).
+        primary (callable): The normal call.
+        backup (callable): The backup call (secondary model or region).
+        hedge (HedgePolicy): Hedge settings.
+        deadline (Deadline, optional): No backup is sent if it couldn't finish in time.
+
+    Returns:
+        The winning call's result.
+    """
+    _count("calls")
+    delay = hedge_delay(key, hedge)
+    tracker = get_tracker(key)
+
+    start = time.monotonic()
+    primary_future = _submit(primary)
+
+    def record_latency(future):
+        # Recorded even when the primary loses, so the tail stays visible
+        if not future.cancelled() and future.exception() is None:
+            tracker.record(time.monotonic() - start)
+
+    primary_future.add_done_callback(record_latency)
+
+    done, _ = wait([primary_future], timeout=delay)
+    if done or (deadline is not None and deadline.remaining() < hedge.min_delay_seconds):
+        return primary_future.result()
+
+    _count("hedges_sent")
+    logger.info(f"🪁 Primary call for {key} slower than {delay:.2f}s, sending hedge request")
+    backup_future = _submit(backup)
+
+    pending = {primary_future, backup_future}
+    first_error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                _count("primary_wins" if future is primary_future else "backup_wins")
+                for loser in pending:
+                    loser.cancel()
+                return future.result()
+            first_error = first_error or future.exception()
+
+    raise first_error
@@ -0,0 +1,129 @@
+import os
+import time
+import uuid
+import logging
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+STATUS_IN_PROGRESS = "IN_PROGRESS"
+STATUS_COMPLETED = "COMPLETED"
+STATUS_CANCELLED = "CANCELLED"  # written by the cancel endpoint (backend/lambda_cancel)
+
+# How long a claim is held before another worker may take it over. Must be longer than the
+# worker Lambda timeout, otherwise a request that is still running can be claimed twice.
+LEASE_SECONDS = int(os.environ.get("IDEMPOTENCY_LEASE_SECONDS", "60"))
+
+# Idempotency records are removed by the table's TTL after this many seconds
+RECORD_TTL_SECONDS = int(os.environ.get("IDEMPOTENCY_TTL_SECONDS", str(24 * 3600)))
+
+
+class RequestInProgressError(Exception):
+    """Raised when another worker holds a live lease on the same request_id."""
+
+
+class RequestCancelledError(Exception):
+    """Raised when the request was cancelled by the client before it was claimed."""
+
+
+def _is_conditional_failure(error: ClientError) -> bool:
+    return error.response.get("Error", {}).get("Code") == "ConditionalCheckFailedException"
+
+
+def claim_request(table, request_id: str, lease_seconds: int = LEASE_SECONDS):
+    """
+    Claims a request before any model call is made.
+
+    The claim is a conditional write that only succeeds if the request has never been
+    seen, or if a previous claim is still IN_PROGRESS but its lease has expired (the
+    worker that held it crashed or timed out).
+
+    Args:
+        table (boto3 DynamoDB.Table): The idempotency table.
+        request_id (str): Unique ID of the question/request.
+        lease_seconds (int, optional): How long the claim stays valid.
+
+    Returns:
+        str | None: A lease token to pass to complete_request/release_request,
+        or None if the request was already completed and must be skipped.
+
+    Raises:
+        RequestInProgressError: If another worker holds a live lease.
+        RequestCancelledError: If the client cancelled the request.
+    """
+    now = int(time.time())
+    lease_token = str(uuid.uuid4())
+
+    try:
+        table.put_item(
+            Item={
+                "request_id": request_id,
+                "status": STATUS_IN_PROGRESS,
+                "lease_token": lease_token,
+                "lease_expires_at": now + lease_seconds,
+                "expires_at": now + RECORD_TTL_SECONDS,
+            },
+            ConditionExpression="attribute_not_exists(request_id) OR (#status = :in_progress AND lease_expires_at < :now)",
+            ExpressionAttributeNames={"#status": "status"},
+            ExpressionAttributeValues={":in_progress": STATUS_IN_PROGRESS, ":now": now},
+        )
+        return lease_token
+    except ClientError as e:
+        if not _is_conditional_failure(e):
+            raise
+
+    existing = table.get_item(Key={"request_id": request_id}, ConsistentRead=True).get("Item", {})
+    if existing.get("status") == STATUS_COMPLETED:
+        return None
+    if existing.get("status") == STATUS_CANCELLED:
+        raise RequestCancelledError(f"Request {request_id} was cancelled by the client")
+
+    raise RequestInProgressError(f"Request {request_id} is already being processed by another worker")
+
+
+def complete_request(table, request_id: str, lease_token: str):
+    """
+    Marks a claimed request as completed so redeliveries are skipped.
+
+    Args:
+        table (boto3 DynamoDB.Table): The idempotency table.
+        request_id (str): Unique ID of the question/request.
+        lease_token (str): Token returned by claim_request.
+    """
+    try:
+        table.update_item(
+            Key={"request_id": request_id},
+            UpdateExpression="SET #status = :completed, completed_at = :now REMOVE lease_expires_at",
+            ConditionExpression="lease_token = :token",
+            ExpressionAttributeNames={"#status": "status"},
+            ExpressionAttributeValues={":completed": STATUS_COMPLETED, ":now": int(time.time()), ":token": lease_token},
+        )
+    except ClientError as e:
+        if not _is_conditional_failure(e):
+            raise
+        logger.warning(f"⚠️ Lease for request {request_id} was taken over before completion")
+
+
+def release_request(table, request_id: str, lease_token: str):
+    """
+    Drops a claim after a failure so the next delivery can claim the request again.
+
+    A request cancelled while it was being answered keeps its lease token; its cancel
+    marker stays, so the next delivery is skipped instead of calling the model again.
+
+    Args:
+        table (boto3 DynamoDB.Table): The idempotency table.
+        request_id (str): Unique ID of the question/request.
+        lease_token (str): Token returned by claim_request.
+    """
+    try:
+        table.delete_item(
+            Key={"request_id": request_id},
+            ConditionExpression="lease_token = :token AND #status = :in_progress",
+            ExpressionAttributeNames={"#status": "status"},
+            ExpressionAttributeValues={":token": lease_token, ":in_progress": STATUS_IN_PROGRESS},
+        )
+    except ClientError as e:
+        if not _is_conditional_failure(e):
+            raise
@@ -0,0 +1,226 @@
+"""
+Per-request stage metrics in CloudWatch Embedded Metric Format (EMF).
+
+Every processed record emits one JSON line on stdout; CloudWatch turns it into metrics
+in METRICS_NAMESPACE with the dimensions topic, agent and model (plus a topic-only
+roll-up). The same lines can be aggregated offline, e.g. from a benchmark's log file:
+
+    python -m utils.metrics worker.log
+"""
+import os
+import sys
+import json
+import math
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# CloudWatch namespace of the worker's metrics ("off" in METRICS_ENABLED stops emitting)
+METRICS_NAMESPACE = os.environ.get("METRICS_NAMESPACE", "RAGWorker")
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "on").lower() == "on"
+
+DIMENSIONS = ["topic", "agent", "model"]
+
+# Metric name -> CloudWatch unit
+UNITS = {
+    "QueueWaitMs": "Milliseconds",  # submit Lambda timestamp -> worker picks the record up
+    "PromptBuildMs": "Milliseconds",  # agent called -> first model call (prompt rendering, agent logic)
+    "QuotaWaitMs": "Milliseconds",  # waiting for the shared RPM/TPM budget (utils/quota.py)
+    "LimiterWaitMs": "Milliseconds",  # waiting for the circuit/AIMD limiter and client setup (utils/throttling.py)
+    "BedrockMs": "Milliseconds",  # InvokeModel round trips
+    "RetrieveAndGenerateMs": "Milliseconds",  # knowledge base retrieval + generation round trips
+    "AgentMs": "Milliseconds",  # whole agent call, retries included (composite branches add up)
+    "DynamoWriteMs": "Milliseconds",  # save_answer
+    "TotalMs": "Milliseconds",  # whole record
+    "ModelCalls": "Count",
+    "InputTokens": "Count",
+    "OutputTokens": "Count",
+    "Failed": "Count",
+}
+
+# Metrics of the record being processed in the current context
+_current = contextvars.ContextVar("request_metrics", default=None)
+
+
+class RequestMetrics:
+    """Stage timings, token counts and dimensions of one request, summed across threads."""
+
+    def __init__(self, topic: str, request_id: str = None):
+        self.topic = topic
+        self.request_id = request_id
+        self.agents = []
+        self.models = []
+        self.values = {}
+        self.started_at = time.perf_counter()
+        self._agent_started_at = None
+        self._lock = threading.Lock()
+
+    def add(self, name: str, value: float):
+        with self._lock:
+            self.values[name] = self.values.get(name, 0) + value
+
+    def agent_started(self, agent: str):
+        with self._lock:
+            if agent not in self.agents:
+                self.agents.append(agent)
+            if self._agent_started_at is None:
+                self._agent_started_at = time.perf_counter()
+
+    def model_called(self, model_id: str, input_tokens: int, output_tokens: int):
+        with self._lock:
+            if model_id not in self.models:
+                self.models.append(model_id)
+            self.values["ModelCalls"] = self.values.get("ModelCalls", 0) + 1
+            self.values["InputTokens"] = self.values.get("InputTokens", 0) + (input_tokens or 0)
+            self.values["OutputTokens"] = self.values.get("OutputTokens", 0) + (output_tokens or 0)
+
+    def model_call_started(self):
+        """Closes the prompt build stage at the first model call, before it waits on the budget or limiter."""
+        with self._lock:
+            if self._agent_started_at is not None and "PromptBuildMs" not in self.values:
+                self.values["PromptBuildMs"] = (time.perf_counter() - self._agent_started_at) * 1000
+
+    def to_emf(self, failed: bool = False) -> dict:
+        values = dict(self.values)
+        values["TotalMs"] = (time.perf_counter() - self.started_at) * 1000
+        values["Failed"] = 1 if failed else 0
+        names = [name for name in UNITS if name in values]
+        document = {
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [{
+                    "Namespace": METRICS_NAMESPACE,
+                    "Dimensions": [DIMENSIONS, ["topic"]],
+                    "Metrics": [{"Name": name, "Unit": UNITS[name]} for name in names],
+                }],
+            },
+            "topic": self.topic,
+            "agent": "+".join(sorted(self.agents)) or "none",
+            "model": "+".join(sorted(self.models)) or "none",
+        }
+        if self.request_id:
+            document["request_id"] = self.request_id  # searchable in the logs, not a dimension
+        document.update({name: round(values[name], 2) for name in names})
+        return document
+
+
+def start_request(topic: str, request_id: str = None, queue_wait_ms: float = None) -> RequestMetrics:
+    """
+    Starts collecting metrics for the record processed in the current context.
+
+    Each record runs in its own context copy (see lambda_handler), so the collector
+    ends with the record. Hedges and fan-out branches copy the context and add to it.
+    """
+    metrics = RequestMetrics(topic, request_id)
+    if queue_wait_ms is not None:
+        metrics.add("QueueWaitMs", max(0.0, queue_wait_ms))
+    _current.set(metrics)
+    return metrics
+
+
+def stop_request():
+    """Stops collecting in the current context (for work that isn't part of the request, e.g. shadow runs)."""
+    _current.set(None)
+
+
+def current():
+    """The current record's RequestMetrics, or None outside a record."""
+    return _current.get()
+
+
+def add(name: str, value: float):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.add(name, value)
+
+
+@contextmanager
+def stage(name: str):
+    """Adds the time spent in the block to a stage metric of the current record."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add(name, (time.perf_counter() - start) * 1000)
+
+
+def emit(metrics: RequestMetrics, failed: bool = False):
+    """Writes a record's metrics as one EMF line on stdout (where CloudWatch extracts it)."""
+    if not METRICS_ENABLED or metrics is None:
+        return
+    sys.stdout.write(json.dumps(metrics.to_emf(failed)) + "\n")
+    sys.stdout.flush()
+
+
+def parse_emf(lines):
+    """
+    Reads EMF documents back from log lines.
+
+    Lines may carry a prefix (timestamps, request IDs) before the JSON; lines that
+    aren't EMF are skipped.
+
+    Yields:
+        dict: Each document, without its "_aws" metadata.
+    """
+    for line in lines:
+        start = line.find('{"_aws"')
+        if start < 0:
+            continue
+        try:
+            document = json.loads(line[start:])
+        except ValueError:
+            continue
+        document.pop("_aws", None)
+        yield document
+
+
+def _percentile(values, percentile: float):
+    # Nearest-rank percentile
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(percentile / 100 * len(ordered)) - 1)]
+
+
+def summarize(documents, by=("topic", "agent", "model")) -> dict:
+    """
+    Aggregates EMF documents per dimension values.
+
+    Args:
+        documents (iterable[dict]): Output of parse_emf().
+        by (tuple, optional): Dimensions to group by.
+
+    Returns:
+        dict: group (tuple of dimension values) -> metric -> count, mean, p50, p95, max and sum.
+    """
+    groups = {}
+    for document in documents:
+        key = tuple(document.get(dimension, "none") for dimension in by)
+        for name in UNITS:
+            if name in document:
+                groups.setdefault(key, {}).setdefault(name, []).append(document[name])
+
+    return {
+        key: {
+            name: {
+                "count": len(values),
+                "mean": round(sum(values) / len(values), 2),
+                "p50": _percentile(values, 50),
+                "p95": _percentile(values, 95),
+                "max": max(values),
+                "sum": round(sum(values), 2),
+            }
+            for name, values in metrics.items()
+        }
+        for key, metrics in groups.items()
+    }
+
+
+if __name__ == "__main__":
+    # Run from backend/lambda_worker: python -m utils.metrics [log file ...] (stdin if none)
+    import fileinput
+
+    for group, metrics in sorted(summarize(parse_emf(fileinput.input())).items()):
+        print(" / ".join(group))
+        for name, stats in metrics.items():
+            print(f"  {name:<22} n={stats['count']:<5} mean={stats['mean']:<10} p50={stats['p50']:<10} "
+                  f"p95={stats['p95']:<10} max={stats['max']:<10} sum={stats['sum']}")
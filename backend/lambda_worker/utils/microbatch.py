@@ -0,0 +1,164 @@
+import os
+import re
+import json
+import logging
+import threading
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Off by default: packing questions changes the prompt the model sees
+MICROBATCH_ENABLED = os.environ.get("MICROBATCH_ENABLED", "off").lower() == "on"
+
+# Topics whose agents can answer several questions in one call (see agents.orchestrator.BATCH_REGISTRY)
+MICROBATCH_TOPICS = set(os.environ.get("MICROBATCH_TOPICS", "owasp,labhint").split(","))
+
+# Most questions per call, and the longest question that may be packed (characters)
+MICROBATCH_MAX_SIZE = int(os.environ.get("MICROBATCH_MAX_SIZE", "4"))
+MICROBATCH_MAX_QUESTION_CHARS = int(os.environ.get("MICROBATCH_MAX_QUESTION_CHARS", "400"))
+
+# How long the first member waits for the others to reach the model call (seconds)
+MICROBATCH_WINDOW_SECONDS = float(os.environ.get("MICROBATCH_WINDOW_SECONDS", "0.25"))
+
+_ANSWER_PATTERN = re.compile(r'<answer id="(\d+)">(.*?)</answer>', re.DOTALL)
+
+
+class BatchParseError(Exception):
+    """Raised when a multi-answer response can't be split back into one answer per question."""
+
+
+def tag_questions(questions, attributes=None) -> str:
+    """
+    Formats questions as <question id="N"> blocks for a multi-answer prompt.
+
+    Args:
+        questions (list[str]): The questions, numbered from 1 in order.
+        attributes (list[dict], optional): Extra tag attributes per question.
+    """
+    blocks = []
+    for index, question in enumerate(questions, start=1):
+        extra = "".join(f' {k}="{v}"' for k, v in (attributes[index - 1] if attributes else {}).items())
+        blocks.append(f'<question id="{index}"{extra}>\n{question}\n</question>')
+    return "\n\n".join(blocks)
+
+
+def split_answers(text: str, count: int) -> list:
+    """
+    Splits a multi-answer response into one answer per question.
+
+    Args:
+        text (str): Model output with one <answer id="N">...</answer> block per question.
+        count (int): Number of questions asked.
+
+    Returns:
+        list[str]: Answers in question order.
+
+    Raises:
+        BatchParseError: If any answer is missing or empty.
+    """
+    answers = {}
+    for answer_id, body in _ANSWER_PATTERN.findall(text):
+        answers.setdefault(int(answer_id), body.strip())
+    missing = [i for i in range(1, count + 1) if not answers.get(i)]
+    if missing:
+        raise BatchParseError(f"Missing answers for question(s) {missing} in a batch of {count}")
+    return [answers[i] for i in range(1, count + 1)]
+
+
+class MicroBatch:
+    """
+    Questions of one topic from the same SQS batch, answered with a single model call.
+
+    Each member record still runs process_record on its own thread (claim, cache, heartbeat,
+    save). When it reaches the model call it joins the batch. The first member to join
+    waits up to MICROBATCH_WINDOW_SECONDS for the others; members that never arrive
+    (duplicates, cancelled, cached) simply aren't part of the call. Late arrivals and
+    members of a failed batch get None and make their own call instead.
+    """
+
+    def __init__(self, topic: str, expected: int):
+        self.topic = topic
+        self.expected = expected
+        self._questions = []
+        self._closed = False
+        self._answers = None
+        self._lock = threading.Lock()
+        self._full = threading.Event()
+        self._done = threading.Event()
+
+    def answer(self, question: str, call_batch, deadline):
+        """
+        Joins the batch and returns this question's answer.
+
+        Args:
+            question (str): The member's question.
+            call_batch (callable): call_batch(questions, deadline) -> list of answers.
+            deadline (Deadline): Bounds the wait for the batch.
+
+        Returns:
+            The answer, or None if the caller should fall back to an individual call.
+        """
+        with self._lock:
+            if self._closed:
+                return None
+            index = len(self._questions)
+            self._questions.append(question)
+            leader = index == 0
+            if len(self._questions) == self.expected:
+                self._full.set()
+
+        if not leader:
+            self._done.wait(timeout=deadline.remaining())
+            answers = self._answers
+            return answers[index] if answers else None
+
+        self._full.wait(timeout=MICROBATCH_WINDOW_SECONDS)
+        with self._lock:
+            self._closed = True
+            questions = list(self._questions)
+
+        try:
+            if len(questions) > 1:
+                self._answers = call_batch(questions, deadline)
+                logger.info(f"📦 Answered {len(questions)} '{self.topic}' questions with one model call")
+        except Exception as e:
+            logger.warning(f"⚠️ Micro-batch of {len(questions)} '{self.topic}' questions failed, "
+                           f"falling back to individual calls: {e}")
+        finally:
+            self._done.set()
+        return self._answers[0] if self._answers else None
+
+
+def plan_micro_batches(records) -> dict:
+    """
+    Groups the short questions of batchable topics in an SQS batch.
+
+    Args:
+        records (list[dict]): The SQS event's Records.
+
+    Returns:
+        dict: messageId -> MicroBatch, for records that are part of a group of two or more.
+    """
+    if not MICROBATCH_ENABLED:
+        return {}
+
+    groups = {}
+    for record in records:
+        try:
+            message = json.loads(record['body'])
+            topic = str(message.get('topic', '')).strip().lower()
+            question = message.get('question') or ''
+        except (ValueError, AttributeError, KeyError):
+            continue
+        if topic in MICROBATCH_TOPICS and len(question) <= MICROBATCH_MAX_QUESTION_CHARS:
+            groups.setdefault(topic, []).append(record['messageId'])
+
+    plan = {}
+    for topic, message_ids in groups.items():
+        for start in range(0, len(message_ids), MICROBATCH_MAX_SIZE):
+            chunk = message_ids[start:start + MICROBATCH_MAX_SIZE]
+            if len(chunk) < 2:
+                continue
+            batch = MicroBatch(topic, len(chunk))
+            plan.update({message_id: batch for message_id in chunk})
+    return plan
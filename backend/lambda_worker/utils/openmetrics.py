@@ -0,0 +1,229 @@
+"""
+In-process metrics registry served in OpenMetrics text format, for long-running deployments.
+
+The poller (or any long-lived process importing the worker code) calls serve() and
+Prometheus scrapes http://<host>:<port>/metrics. In Lambda nothing is served; the
+counters are just updated in memory and the EMF lines of utils/metrics.py remain the
+source of CloudWatch metrics.
+
+Recording is lock-free on the hot path: each thread updates its own cell of a metric
+and a scrape adds the cells up. A lock is only taken the first time a thread records
+to a metric.
+"""
+import abc
+import bisect
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+# Histogram buckets (seconds)
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+QUEUE_LAG_BUCKETS = (0.5, 1, 5, 10, 30, 60, 120, 300, 900)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value) -> str:
+    if isinstance(value, float):
+        return "+Inf" if value == float("inf") else repr(value)
+    return str(value)
+
+
+class _Metric(abc.ABC):
+    """Per-thread cells keyed by label values; see the module docstring."""
+
+    type = None
+
+    def __init__(self, name: str, help: str, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._local = threading.local()
+        self._cells = []
+        self._cells_lock = threading.Lock()
+
+    def _cell(self) -> dict:
+        try:
+            return self._local.cell
+        except AttributeError:
+            cell = self._local.cell = {}
+            with self._cells_lock:
+                self._cells.append(cell)
+            return cell
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+
+    def _snapshots(self):
+        with self._cells_lock:
+            cells = list(self._cells)
+        # dict.copy() is atomic under the GIL, so a cell being written to copies cleanly
+        return [cell.copy() for cell in cells]
+
+    @abc.abstractmethod
+    def samples(self) -> list:
+        """Returns the sample lines of the metric in OpenMetrics text format."""
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        cell = self._cell()
+        key = self._key(labels)
+        cell[key] = cell.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        key = self._key(labels)
+        return sum(cell.get(key, 0) for cell in self._snapshots())
+
+    def samples(self) -> list:
+        totals = {}
+        for cell in self._snapshots():
+            for key, value in cell.items():
+                totals[key] = totals.get(key, 0) + value
+        return [f"{self.name}_total{_format_labels(self.labels, key)} {_format_value(value)}"
+                for key, value in sorted(totals.items())]
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        cell = self._cell()
+        key = self._key(labels)
+        state = cell.get(key)
+        if state is None:
+            # Per-bucket counts (the last one is +Inf) and sum
+            state = cell[key] = [[0] * (len(self.buckets) + 1), 0.0]
+        state[0][bisect.bisect_left(self.buckets, value)] += 1
+        state[1] += value
+
+    def samples(self) -> list:
+        totals = {}
+        for cell in self._snapshots():
+            for key, (counts, total) in cell.items():
+                merged = totals.setdefault(key, [[0] * (len(self.buckets) + 1), 0.0])
+                for index, bucket_count in enumerate(list(counts)):
+                    merged[0][index] += bucket_count
+                merged[1] += total
+
+        lines = []
+        for key, (counts, total) in sorted(totals.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = 'le="' + _format_value(float(bound)) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(float(total))}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric '{name}' is already registered as a {metric.type}")
+            return metric
+
+    def counter(self, name: str, help: str, labels=()) -> Counter:
+        """Registers (or returns the already registered) counter; name without the _total suffix."""
+        return self._register(Counter, name, help, labels)
+
+    def histogram(self, name: str, help: str, labels=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, help, labels, buckets=buckets)
+
+    def exposition(self) -> str:
+        """Every metric in OpenMetrics text format, ending with # EOF."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.append(f"# HELP {metric.name} {_escape(metric.help)}")
+            lines.extend(metric.samples())
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Worker metrics, recorded where the work happens
+REQUESTS = REGISTRY.counter(
+    "rag_requests", "SQS records processed, by topic and outcome (success, failed, skipped)", ("topic", "outcome"))
+BEDROCK_LATENCY = REGISTRY.histogram(
+    "rag_bedrock_latency_seconds", "Successful Bedrock round trips", ("operation", "model", "region"))
+RETRIES = REGISTRY.counter(
+    "rag_retries", "Agent calls retried in process (agent) and records re-sent or dead-lettered by the "
+    "retry tier (requeue, dead_letter)", ("topic", "kind"))
+CACHE_LOOKUPS = REGISTRY.counter(
+    "rag_answer_cache_lookups", "Answer cache lookups under backlog degradation, by result (hit, miss)",
+    ("topic", "result"))
+HEDGES = REGISTRY.counter(
+    "rag_hedges", "Hedged Bedrock calls, by event (call, hedge_sent, primary_win, backup_win)", ("event",))
+QUEUE_LAG = REGISTRY.histogram(
+    "rag_queue_lag_seconds", "Submission to pickup by the worker", ("topic",), buckets=QUEUE_LAG_BUCKETS)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.registry.exposition().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # one line per scrape is noise
+
+
+def serve(port: int, host: str = "0.0.0.0", registry: Registry = REGISTRY) -> ThreadingHTTPServer:
+    """
+    Serves /metrics from a daemon thread.
+
+    Args:
+        port (int): Port to listen on (0 picks a free one; see server.server_address).
+        host (str, optional): Interface to bind.
+        registry (Registry, optional): Metrics to serve.
+
+    Returns:
+        ThreadingHTTPServer: The running server; call shutdown() to stop it.
+    """
+    handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logger.info(f"📈 Serving OpenMetrics on http://{host}:{server.server_address[1]}/metrics")
+    return server
@@ -0,0 +1,31 @@
+import os
+import json
+
+# On-demand Bedrock price per 1,000 tokens (USD): model_id -> (input, output).
+# Override or extend with MODEL_PRICES='{"model-id": [input, output], ...}'.
+MODEL_PRICES = {
+    "anthropic.claude-3-5-sonnet-20240620": (0.003, 0.015),
+    "anthropic.claude-3-5-sonnet-20240620-v1:0": (0.003, 0.015),
+    "anthropic.claude-3-sonnet-20240229-v1:0": (0.003, 0.015),
+    "anthropic.claude-3-haiku-20240307-v1:0": (0.00025, 0.00125),
+}
+MODEL_PRICES.update({model_id: tuple(prices) for model_id, prices in json.loads(os.environ.get("MODEL_PRICES", "{}")).items()})
+
+
+def estimate_cost(model_id: str, input_tokens: int, output_tokens: int):
+    """
+    Approximate price of one call.
+
+    Args:
+        model_id (str): Bedrock model ID.
+        input_tokens (int): Input tokens.
+        output_tokens (int): Output tokens.
+
+    Returns:
+        float: Cost in USD (rounded to 6 places), or None if the model has no known price.
+    """
+    prices = MODEL_PRICES.get(model_id)
+    if prices is None:
+        return None
+    input_price, output_price = prices
+    return round((input_tokens * input_price + output_tokens * output_price) / 1000, 6)
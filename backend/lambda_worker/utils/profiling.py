@@ -0,0 +1,223 @@
+import os
+import sys
+import json
+import time
+import random
+import logging
+import functools
+import threading
+import tracemalloc
+from collections import Counter
+from datetime import datetime, timezone
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Share of invocations profiled (0 = only those that ask for it with a "profile" flag)
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+
+# How often every thread's stack is sampled (ms; at least 5)
+PROFILE_INTERVAL_MS = max(5.0, float(os.environ.get("PROFILE_INTERVAL_MS", "10")))
+
+# Where profiles go: a local directory or s3://bucket/prefix
+PROFILE_OUTPUT = os.environ.get("PROFILE_OUTPUT", "/tmp/profiles")
+
+# Allocation sites listed in a profile, and frames kept per allocation traceback
+PROFILE_TOP_ALLOCATIONS = int(os.environ.get("PROFILE_TOP_ALLOCATIONS", "15"))
+PROFILE_TRACEMALLOC_FRAMES = int(os.environ.get("PROFILE_TRACEMALLOC_FRAMES", "1"))
+
+# Stacks deeper than this are cut at the root end
+_MAX_STACK_DEPTH = 64
+
+# Only one profile runs at a time in a process; concurrent invocations are not profiled
+_profile_lock = threading.Lock()
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def _collapse(frame) -> str:
+    names = []
+    while frame is not None and len(names) < _MAX_STACK_DEPTH:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def _is_idle(stack: str) -> bool:
+    # Pool threads waiting for work, which would otherwise dominate every profile
+    return "thread.py:_worker;queue.py:get" in stack or stack.endswith("thread.py:_worker")
+
+
+class StackSampler:
+    """
+    Wall-clock sampling profiler: records every thread's stack at a fixed interval.
+
+    Stacks are counted in collapsed form ("file:func;file:func;... count"), ready for
+    flamegraph tools. Idle pool threads are left out; threads blocked on I/O or locks
+    are kept, since that is where wall time goes in this code.
+    """
+
+    def __init__(self, interval_ms: float = PROFILE_INTERVAL_MS):
+        self.interval = interval_ms / 1000
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = _collapse(frame)
+                if not _is_idle(stack):
+                    self.stacks[stack] += 1
+            self.samples += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+
+def top_allocations(snapshot, limit: int = PROFILE_TOP_ALLOCATIONS) -> list:
+    """Largest allocation sites still alive in a tracemalloc snapshot."""
+    stats = snapshot.filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    ]).statistics("traceback" if PROFILE_TRACEMALLOC_FRAMES > 1 else "lineno")
+    return [
+        {
+            "site": " <- ".join(f"{os.path.basename(frame.filename)}:{frame.lineno}" for frame in stat.traceback),
+            "size_kb": round(stat.size / 1024, 1),
+            "count": stat.count,
+        }
+        for stat in stats[:limit]
+    ]
+
+
+def write_profile(name: str, collapsed: str, summary: dict, output: str = PROFILE_OUTPUT) -> str:
+    """
+    Writes a profile as <name>.collapsed (stacks) and <name>.json (summary and allocations).
+
+    Args:
+        name (str): File name stem, unique per profile.
+        collapsed (str): Collapsed stacks.
+        summary (dict): Timing, sample count and top allocations.
+        output (str, optional): Local directory or s3://bucket/prefix.
+
+    Returns:
+        str: Location of the .collapsed file.
+    """
+    body = json.dumps(summary, indent=1)
+    if output.startswith("s3://"):
+        import boto3  # only profiled invocations pay for the client
+
+        bucket, _, prefix = output[len("s3://"):].partition("/")
+        key = f"{prefix.rstrip('/')}/{name}" if prefix else name
+        s3 = boto3.client("s3")
+        s3.put_object(Bucket=bucket, Key=f"{key}.collapsed", Body=collapsed.encode("utf-8"))
+        s3.put_object(Bucket=bucket, Key=f"{key}.json", Body=body.encode("utf-8"), ContentType="application/json")
+        return f"s3://{bucket}/{key}.collapsed"
+
+    path = os.path.join(output, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.collapsed", "w", encoding="utf-8") as f:
+        f.write(collapsed)
+    with open(f"{path}.json", "w", encoding="utf-8") as f:
+        f.write(body)
+    return f"{path}.collapsed"
+
+
+def requested(event) -> bool:
+    """
+    Whether an invocation asks to be profiled.
+
+    Direct invocations use {"profile": true}, API Gateway requests ?profile=1 or an
+    X-Profile: 1 header, and SQS batches a message with "profile": true in its body.
+    """
+    if not isinstance(event, dict):
+        return False
+    if event.get("profile") is True:
+        return True
+    query = event.get("queryStringParameters") or {}
+    headers = {key.lower(): value for key, value in (event.get("headers") or {}).items()}
+    if query.get("profile") == "1" or headers.get("x-profile") == "1":
+        return True
+    for record in event.get("Records") or []:
+        body = record.get("body") or ""
+        # Cheap substring test first: most bodies never mention it
+        if '"profile"' in body:
+            try:
+                if json.loads(body).get("profile") is True:
+                    return True
+            except (ValueError, AttributeError):
+                pass
+    return False
+
+
+def profiled(handler):
+    """
+    Decorates a Lambda handler so sampled or flagged invocations are profiled.
+
+    A profiled invocation runs under StackSampler and tracemalloc, then writes its
+    collapsed stacks and top allocation sites with write_profile(). Everything else
+    pays one random() call. Profiling never changes the handler's result: failures
+    to write the profile are only logged.
+    """
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        sampled = PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+        if not (sampled or requested(event)) or not _profile_lock.acquire(blocking=False):
+            return handler(event, context)
+
+        try:
+            started_tracing = not tracemalloc.is_tracing()
+            if started_tracing:
+                tracemalloc.start(PROFILE_TRACEMALLOC_FRAMES)
+            sampler = StackSampler()
+            start = time.perf_counter()
+            sampler.start()
+            try:
+                return handler(event, context)
+            finally:
+                duration_ms = round((time.perf_counter() - start) * 1000, 1)
+                sampler.stop()
+                snapshot = tracemalloc.take_snapshot()
+                _, peak = tracemalloc.get_traced_memory()
+                if started_tracing:
+                    tracemalloc.stop()
+                _save(handler, context, duration_ms, sampler, snapshot, peak)
+        finally:
+            _profile_lock.release()
+
+    return wrapper
+
+
+def _save(handler, context, duration_ms, sampler, snapshot, peak):
+    try:
+        function = getattr(context, "function_name", None) or handler.__module__
+        request_id = getattr(context, "aws_request_id", None) or f"{os.getpid()}-{int(time.time() * 1000)}"
+        name = f"{function}/{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}-{request_id}"
+        summary = {
+            "function": function,
+            "request_id": request_id,
+            "duration_ms": duration_ms,
+            "interval_ms": sampler.interval * 1000,
+            "samples": sampler.samples,
+            "peak_traced_kb": round(peak / 1024, 1),
+            "top_allocations": top_allocations(snapshot),
+        }
+        location = write_profile(name, sampler.collapsed(), summary)
+        logger.info(f"🔬 Profile of {function} ({duration_ms} ms, {sampler.samples} samples) written to {location}")
+    except Exception as e:
+        logger.warning(f"⚠️ Could not write profile: {e}")
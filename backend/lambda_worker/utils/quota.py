@@ -0,0 +1,263 @@
+import os
+import abc
+import time
+import random
+import logging
+import threading
+from decimal import Decimal
+from botocore.exceptions import ClientError
+from utils.aws_clients import get_table
+from utils.deadline import DeadlineExceeded
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Account quotas for one model in one region, shared by every worker. 0 = not limited.
+QUOTA_RPM = float(os.environ.get("QUOTA_RPM", "0"))
+QUOTA_TPM = float(os.environ.get("QUOTA_TPM", "0"))
+
+# DynamoDB table holding one bucket item per (model, region). Unset = in-process stand-in
+QUOTA_TABLE_NAME = os.environ.get("QUOTA_TABLE_NAME")
+
+# Tokens assumed for the passages a knowledge base adds to a RetrieveAndGenerate prompt
+RAG_CONTEXT_TOKEN_ESTIMATE = int(os.environ.get("RAG_CONTEXT_TOKEN_ESTIMATE", "2000"))
+
+# Bucket item attributes, aliased since some are DynamoDB reserved words
+NAMES = {"#requests": "requests", "#tokens": "tokens", "#updated_at": "updated_at", "#version": "version"}
+
+# Longest single sleep while waiting for the budget to refill (seconds)
+MAX_WAIT_STEP_SECONDS = 2.0
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for Claude (about four characters per token)."""
+    return max(1, len(text) // 4)
+
+
+class TokenBucket(abc.ABC):
+    """
+    Requests-per-minute and tokens-per-minute buckets, refilled continuously.
+
+    Each bucket holds at most one minute of quota. A call takes one request and its
+    estimated input tokens up front (acquire), then settles the difference once the
+    actual usage is known (adjust), or gives both back if it failed or was never sent.
+    Tokens may go negative after an adjust; that debt is paid back by the refill before
+    the next call gets through.
+    """
+
+    def __init__(self, bucket_id: str, rpm: float = QUOTA_RPM, tpm: float = QUOTA_TPM):
+        self.bucket_id = bucket_id
+        self.rpm = rpm
+        self.tpm = tpm
+
+    def _refill(self, requests: float, tokens: float, elapsed: float):
+        if self.rpm:
+            requests = min(self.rpm, requests + self.rpm * elapsed / 60)
+        if self.tpm:
+            tokens = min(self.tpm, tokens + self.tpm * elapsed / 60)
+        return requests, tokens
+
+    def _wait_for(self, requests: float, tokens: float, need_tokens: float) -> float:
+        """Seconds until both buckets can cover the call (0 = now)."""
+        wait = 0.0
+        if self.rpm and requests < 1:
+            wait = max(wait, (1 - requests) * 60 / self.rpm)
+        if self.tpm and tokens < need_tokens:
+            wait = max(wait, (need_tokens - tokens) * 60 / self.tpm)
+        return wait
+
+    @abc.abstractmethod
+    def _try_take(self, tokens: float) -> float:
+        """Takes one request and `tokens` if available. Returns seconds to wait, 0 when taken."""
+
+    @abc.abstractmethod
+    def adjust(self, tokens_delta: float, requests_delta: float = 0):
+        """Charges (positive) or refunds (negative) tokens and requests once the actual usage is known."""
+
+    def acquire(self, tokens: float, deadline=None):
+        """
+        Waits until the shared budget covers one more request of `tokens` tokens, then takes it.
+
+        Args:
+            tokens (float): Estimated input tokens of the call.
+            deadline (Deadline, optional): Bounds the wait.
+
+        Raises:
+            DeadlineExceeded: If the budget won't refill before the deadline.
+        """
+        # A call bigger than a whole minute of quota only ever waits for a full bucket
+        tokens = min(tokens, self.tpm) if self.tpm else tokens
+        while True:
+            wait = self._try_take(tokens)
+            if not wait:
+                return
+            if deadline is not None and deadline.remaining() <= wait:
+                raise DeadlineExceeded(f"Bedrock quota for {self.bucket_id} won't refill in time ({wait:.1f}s)")
+            # Jitter so workers waiting on the same bucket don't retry in lockstep
+            time.sleep(min(wait, MAX_WAIT_STEP_SECONDS) * random.uniform(1.0, 1.2))
+
+
+class LocalTokenBucket(TokenBucket):
+    """In-process stand-in for DynamoTokenBucket (local runs, a single poller)."""
+
+    def __init__(self, bucket_id: str, rpm: float = QUOTA_RPM, tpm: float = QUOTA_TPM):
+        super().__init__(bucket_id, rpm, tpm)
+        self.requests = rpm
+        self.tokens = tpm
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _try_take(self, tokens: float) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self.requests, self.tokens = self._refill(self.requests, self.tokens, now - self.updated_at)
+            self.updated_at = now
+            wait = self._wait_for(self.requests, self.tokens, tokens)
+            if not wait:
+                self.requests -= 1
+                self.tokens -= tokens
+            return wait
+
+    def adjust(self, tokens_delta: float, requests_delta: float = 0):
+        with self._lock:
+            self.tokens -= tokens_delta
+            self.requests -= requests_delta
+            if self.rpm:
+                self.requests = min(self.rpm, self.requests)
+            if self.tpm:
+                self.tokens = min(self.tpm, self.tokens)
+
+
+class DynamoTokenBucket(TokenBucket):
+    """
+    Token bucket stored in one DynamoDB item, shared by every worker instance.
+
+    Takes are optimistic: read the item, refill it from its updated_at, and write the
+    new levels only if its version hasn't changed in between. Adjustments are
+    atomic ADDs that also bump the version.
+    """
+
+    def __init__(self, table, bucket_id: str, rpm: float = QUOTA_RPM, tpm: float = QUOTA_TPM):
+        super().__init__(bucket_id, rpm, tpm)
+        self.table = table
+
+    def _try_take(self, tokens: float) -> float:
+        item = self.table.get_item(Key={"bucket_id": self.bucket_id}, ConsistentRead=True).get("Item")
+        now = time.time()
+        if item is None:
+            requests, tokens_left, version = self.rpm, self.tpm, None
+        else:
+            requests, tokens_left = self._refill(
+                float(item.get("requests", 0)), float(item.get("tokens", 0)), now - float(item["updated_at"])
+            )
+            version = int(item["version"])
+
+        wait = self._wait_for(requests, tokens_left, tokens)
+        if wait:
+            return wait
+
+        values = {
+            ":requests": Decimal(str(round(requests - 1, 3))),
+            ":tokens": Decimal(str(round(tokens_left - tokens, 3))),
+            ":now": Decimal(str(round(now, 3))),
+            ":next": (version or 0) + 1,
+        }
+        if version is None:
+            condition = "attribute_not_exists(bucket_id)"
+        else:
+            condition = "#version = :version"
+            values[":version"] = version
+
+        try:
+            self.table.update_item(
+                Key={"bucket_id": self.bucket_id},
+                UpdateExpression="SET #requests = :requests, #tokens = :tokens, #updated_at = :now, #version = :next",
+                ConditionExpression=condition,
+                ExpressionAttributeNames=NAMES,
+                ExpressionAttributeValues=values,
+            )
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") != "ConditionalCheckFailedException":
+                raise
+            # Another worker took from the bucket in between: re-read and try again
+            return 0.05
+        return 0
+
+    def adjust(self, tokens_delta: float, requests_delta: float = 0):
+        if not tokens_delta and not requests_delta:
+            return
+        try:
+            self.table.update_item(
+                Key={"bucket_id": self.bucket_id},
+                UpdateExpression="ADD #tokens :delta, #requests :requests, #version :one",
+                ConditionExpression="attribute_exists(bucket_id)",
+                ExpressionAttributeNames={"#tokens": "tokens", "#requests": "requests", "#version": "version"},
+                ExpressionAttributeValues={
+                    ":delta": Decimal(str(round(-tokens_delta, 3))),
+                    ":requests": Decimal(str(round(-requests_delta, 3))),
+                    ":one": 1,
+                },
+            )
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") != "ConditionalCheckFailedException":
+                raise
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+_quota_table = None
+
+
+def _table():
+    global _quota_table
+    if _quota_table is None:
+        _quota_table = get_table(QUOTA_TABLE_NAME)
+    return _quota_table
+
+
+def get_bucket(model_id: str, region: str):
+    """
+    Returns the shared budget for a model in a region, or None when no quota is configured.
+
+    Uses the DynamoDB bucket when QUOTA_TABLE_NAME is set, otherwise the in-process stand-in.
+    """
+    if not QUOTA_RPM and not QUOTA_TPM:
+        return None
+    key = f"{model_id}@{region}"
+    with _buckets_lock:
+        if key not in _buckets:
+            if QUOTA_TABLE_NAME:
+                _buckets[key] = DynamoTokenBucket(_table(), key)
+            else:
+                _buckets[key] = LocalTokenBucket(key)
+        return _buckets[key]
+
+
+def charge(bucket, estimated_tokens: float, deadline=None):
+    """Takes the estimate from the budget before a call. Fails open if the quota table is unreachable."""
+    if bucket is None:
+        return
+    try:
+        bucket.acquire(estimated_tokens, deadline)
+    except ClientError as e:
+        logger.warning(f"⚠️ Quota table unavailable, calling Bedrock without the shared budget: {e}")
+
+
+def settle(bucket, estimated_tokens: float, actual_tokens: float):
+    """Charges the difference between the actual and estimated usage after a call."""
+    if bucket is None or actual_tokens is None:
+        return
+    try:
+        bucket.adjust(actual_tokens - estimated_tokens)
+    except ClientError as e:
+        logger.warning(f"⚠️ Could not settle quota usage for {bucket.bucket_id}: {e}")
+
+
+def refund(bucket, estimated_tokens: float):
+    """Gives back the request and estimated tokens taken by charge() for a call that failed or was never sent."""
+    if bucket is None:
+        return
+    try:
+        bucket.adjust(-estimated_tokens, requests_delta=-1)
+    except ClientError as e:
+        logger.warning(f"⚠️ Could not refund quota usage for {bucket.bucket_id}: {e}")
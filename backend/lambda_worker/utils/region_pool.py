@@ -0,0 +1,147 @@
+import os
+import time
+import random
+import logging
+import threading
+from collections import deque
+from utils.aws_clients import REGION
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Regions InvokeModel calls are spread across (comma separated); the first is the home region
+BEDROCK_REGIONS = [r.strip() for r in os.environ.get("BEDROCK_REGIONS", REGION).split(",") if r.strip()]
+
+# Recent call outcomes kept per region to compute its error rate
+STATS_WINDOW = int(os.environ.get("REGION_STATS_WINDOW", "50"))
+
+# How long a throttled region is taken out of rotation (seconds)
+THROTTLE_COOLDOWN_SECONDS = float(os.environ.get("REGION_THROTTLE_COOLDOWN_SECONDS", "30"))
+
+# Weight of the newest sample in the moving latency average
+LATENCY_EWMA_ALPHA = 0.2
+
+# Latency assumed for a region with no samples yet, so new regions get traffic
+DEFAULT_LATENCY_SECONDS = 2.0
+
+
+class RegionHealth:
+    """Recent latency, error rate and throttling state of one region."""
+
+    def __init__(self, region: str):
+        self.region = region
+        self.latency = None  # moving average, seconds
+        self.outcomes = deque(maxlen=STATS_WINDOW)  # True = error
+        self.cooldown_until = 0.0
+        self.calls = 0
+        self.errors = 0
+        self.throttles = 0
+
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return sum(self.outcomes) / len(self.outcomes)
+
+    def cooling_down(self, now: float) -> bool:
+        return now < self.cooldown_until
+
+    def score(self) -> float:
+        """Higher is better: fast regions with few recent errors get most of the traffic."""
+        latency = self.latency if self.latency is not None else DEFAULT_LATENCY_SECONDS
+        return (1 - self.error_rate()) ** 2 / max(latency, 0.05) + 1e-3
+
+
+class RegionPool:
+    """
+    Spreads Bedrock calls across regions by health score.
+
+    Each call picks a region at random, weighted by recent latency and error rate.
+    A region that throttles is skipped for THROTTLE_COOLDOWN_SECONDS, so traffic
+    fails over to the others until it recovers.
+    """
+
+    def __init__(self, regions):
+        self._health = {region: RegionHealth(region) for region in regions}
+        self._lock = threading.Lock()
+
+    @property
+    def regions(self):
+        return list(self._health)
+
+    def choose(self, exclude=()) -> str:
+        """
+        Picks a region for the next call.
+
+        Args:
+            exclude (iterable): Regions not to pick (e.g. the one that just throttled).
+
+        Returns:
+            str: The chosen region, or None if every region is excluded.
+        """
+        now = time.monotonic()
+        with self._lock:
+            candidates = [h for h in self._health.values() if h.region not in exclude]
+            if not candidates:
+                return None
+            # All cooling down: use the one that recovers first rather than failing
+            available = [h for h in candidates if not h.cooling_down(now)]
+            if not available:
+                return min(candidates, key=lambda h: h.cooldown_until).region
+            weights = [h.score() for h in available]
+        return random.choices(available, weights=weights)[0].region
+
+    def record(self, region: str, latency: float, error: bool = False, throttled: bool = False):
+        """
+        Records the outcome of a call.
+
+        Args:
+            region (str): Region the call went to.
+            latency (float): Seconds the call took.
+            error (bool): Whether the call failed.
+            throttled (bool): Whether it failed with throttling; starts the cooldown.
+        """
+        with self._lock:
+            health = self._health.get(region)
+            if health is None:
+                # Calls pinned to a region outside the pool (e.g. a knowledge base) are tracked too
+                health = self._health[region] = RegionHealth(region)
+            health.calls += 1
+            health.outcomes.append(error)
+            if error:
+                health.errors += 1
+            else:
+                health.latency = latency if health.latency is None else (
+                    LATENCY_EWMA_ALPHA * latency + (1 - LATENCY_EWMA_ALPHA) * health.latency
+                )
+            if throttled:
+                health.throttles += 1
+                health.cooldown_until = time.monotonic() + THROTTLE_COOLDOWN_SECONDS
+
+        if throttled:
+            logger.warning(f"🌏 Region {region} throttled, out of rotation for {THROTTLE_COOLDOWN_SECONDS:.0f}s")
+
+    def stats(self) -> dict:
+        """Returns a per-region snapshot (latency, error rate, counters, cooldown) for dashboards."""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                h.region: {
+                    "latency_ms": round(h.latency * 1000, 1) if h.latency is not None else None,
+                    "error_rate": round(h.error_rate(), 3),
+                    "calls": h.calls,
+                    "errors": h.errors,
+                    "throttles": h.throttles,
+                    "cooling_down": h.cooling_down(now),
+                    "score": round(h.score(), 3),
+                }
+                for h in self._health.values()
+            }
+
+
+# Process-wide pool shared by every agent thread
+region_pool = RegionPool(BEDROCK_REGIONS)
+
+
+def get_region_stats() -> dict:
+    """Returns the per-region health snapshot of the process-wide pool."""
+    return region_pool.stats()
@@ -0,0 +1,163 @@
+import os
+import json
+import random
+import logging
+from botocore.exceptions import ClientError
+from utils.bedrock import error_chain, error_code, is_retryable
+from utils.deadline import DeadlineExceeded
+from utils.idempotency import RequestInProgressError
+from utils.throttling import CircuitOpenError
+from utils import openmetrics
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Queue transient failures are re-sent to, and the dead-letter queue for permanent ones
+RETRY_QUEUE_URL = os.environ.get("RETRY_QUEUE_URL")
+DEAD_LETTER_QUEUE_URL = os.environ.get("DEAD_LETTER_QUEUE_URL")
+
+# Re-sends before a transient failure is dead-lettered too
+MAX_RETRY_ATTEMPTS = int(os.environ.get("MAX_RETRY_ATTEMPTS", "4"))
+
+# Delay of the first retry, doubled for each further attempt (seconds; SQS allows up to 900)
+RETRY_BASE_DELAY_SECONDS = int(os.environ.get("RETRY_BASE_DELAY_SECONDS", "10"))
+MAX_DELAY_SECONDS = 900
+
+# Non-Bedrock AWS errors (e.g. saving the answer to DynamoDB) that are worth retrying
+TRANSIENT_AWS_ERROR_CODES = {
+    "ProvisionedThroughputExceededException",
+    "RequestLimitExceeded",
+    "InternalServerError",
+    "ServiceUnavailable",
+}
+
+# Message attributes written by the retry tier
+ATTEMPT_ATTRIBUTE = "retry_attempt"
+ERROR_CLASS_ATTRIBUTE = "error_class"
+ERROR_MESSAGE_ATTRIBUTE = "error_message"
+
+
+# Errors that may succeed later, wherever they sit in the chain (agents wrap them in RuntimeError)
+TRANSIENT_ERRORS = (DeadlineExceeded, CircuitOpenError, RequestInProgressError)
+
+
+def is_transient(error: BaseException) -> bool:
+    """True for failures that may succeed later: throttling, timeouts, open circuits, busy claims."""
+    if any(isinstance(err, TRANSIENT_ERRORS) for err in error_chain(error)):
+        return True
+    return is_retryable(error) or error_code(error) in TRANSIENT_AWS_ERROR_CODES
+
+
+def error_class(error: BaseException) -> str:
+    """
+    Short error class recorded on the message, e.g. "ThrottlingException" or "KeyError".
+
+    Taken from the innermost known cause, so an agent's RuntimeError wrapping an open
+    circuit is recorded as "CircuitOpenError".
+    """
+    known = [err for err in error_chain(error) if isinstance(err, TRANSIENT_ERRORS + (ClientError,))]
+    cause = known[-1] if known else error
+    return error_code(cause) or type(cause).__name__
+
+
+def attempt_of(record: dict) -> int:
+    """Number of times the record has already been re-sent by the retry tier."""
+    attribute = record.get("messageAttributes", {}).get(ATTEMPT_ATTRIBUTE) or {}
+    try:
+        return int(attribute.get("stringValue") or 0)
+    except ValueError:
+        return 0
+
+
+def retry_delay(attempt: int) -> int:
+    """DelaySeconds for the given retry attempt (1-based): exponential with jitter."""
+    delay = RETRY_BASE_DELAY_SECONDS * (2 ** (attempt - 1))
+    return int(min(MAX_DELAY_SECONDS, delay * random.uniform(0.8, 1.2)))
+
+
+def _carried_attributes(record: dict) -> dict:
+    """Converts the record's message attributes back to SendMessage form, minus the tier's own."""
+    own = {ATTEMPT_ATTRIBUTE, ERROR_CLASS_ATTRIBUTE, ERROR_MESSAGE_ATTRIBUTE}
+    carried = {}
+    for name, value in record.get("messageAttributes", {}).items():
+        if name in own or value.get("stringValue") is None:
+            continue
+        carried[name] = {"DataType": value.get("dataType", "String"), "StringValue": value["stringValue"]}
+    return carried
+
+
+def _topic_of(record: dict) -> str:
+    try:
+        return str(json.loads(record["body"]).get("topic") or "none")
+    except (ValueError, KeyError, AttributeError):
+        return "none"
+
+
+class RetryTier:
+    """
+    Routes failed records off the main queue.
+
+    Transient failures are re-sent to the retry queue with an exponential DelaySeconds
+    and an attempt counter, so they neither wait on the visibility timeout nor use up
+    the source queue's maxReceiveCount. Permanent failures (bad messages, invalid topics,
+    validation errors) and records out of attempts go straight to the dead-letter queue,
+    tagged with their error class.
+    """
+
+    def __init__(self, sqs_client, retry_queue_url: str = RETRY_QUEUE_URL,
+                 dead_letter_queue_url: str = DEAD_LETTER_QUEUE_URL):
+        self._sqs = sqs_client
+        self.retry_queue_url = retry_queue_url
+        self.dead_letter_queue_url = dead_letter_queue_url
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.retry_queue_url and self.dead_letter_queue_url)
+
+    def handle_failure(self, record: dict, error: BaseException) -> bool:
+        """
+        Re-sends or dead-letters a failed record.
+
+        Args:
+            record (dict): The SQS record that failed.
+            error (BaseException): Why it failed.
+
+        Returns:
+            bool: True if the record was routed and can be deleted from its source queue,
+            False if the tier is disabled or the send failed (SQS redelivers it as before).
+        """
+        if not self.enabled:
+            return False
+
+        attributes = _carried_attributes(record)
+        attributes[ERROR_CLASS_ATTRIBUTE] = {"DataType": "String", "StringValue": error_class(error)}
+        attributes[ERROR_MESSAGE_ATTRIBUTE] = {"DataType": "String", "StringValue": str(error)[:256] or "-"}
+        attempt = attempt_of(record) + 1
+
+        try:
+            if is_transient(error) and attempt <= MAX_RETRY_ATTEMPTS:
+                delay = retry_delay(attempt)
+                attributes[ATTEMPT_ATTRIBUTE] = {"DataType": "Number", "StringValue": str(attempt)}
+                self._sqs.send_message(
+                    QueueUrl=self.retry_queue_url,
+                    MessageBody=record["body"],
+                    DelaySeconds=delay,
+                    MessageAttributes=attributes
+                )
+                logger.warning(f"🔁 Message {record.get('messageId')} re-sent to the retry queue "
+                               f"(attempt {attempt}, in {delay}s) after {error_class(error)}")
+                openmetrics.RETRIES.inc(topic=_topic_of(record), kind="requeue")
+            else:
+                attributes[ATTEMPT_ATTRIBUTE] = {"DataType": "Number", "StringValue": str(attempt - 1)}
+                self._sqs.send_message(
+                    QueueUrl=self.dead_letter_queue_url,
+                    MessageBody=record["body"],
+                    MessageAttributes=attributes
+                )
+                logger.error(f"🪦 Message {record.get('messageId')} dead-lettered: "
+                             f"{json.dumps({'error_class': error_class(error), 'attempts': attempt - 1})}")
+                openmetrics.RETRIES.inc(topic=_topic_of(record), kind="dead_letter")
+        except Exception as e:
+            logger.error(f"❌ Retry tier could not route message {record.get('messageId')}: {e}")
+            return False
+        return True
@@ -0,0 +1,186 @@
+import os
+import json
+import time
+import random
+import logging
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import replace
+from utils.bedrock import record_usage
+from utils import metrics
+from utils import tracing
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Share of live requests copied to the candidate configuration (0 = shadow mode off)
+SHADOW_SAMPLE_RATE = float(os.environ.get("SHADOW_SAMPLE_RATE", "0"))
+
+# Topics that may be shadowed
+SHADOW_TOPICS = set(os.environ.get("SHADOW_TOPICS", "owasp,labhint").split(","))
+
+# Candidate configuration: anything unset stays as in the production policy
+SHADOW_MODEL_ID = os.environ.get("SHADOW_MODEL_ID")
+SHADOW_MAX_TOKENS = int(os.environ["SHADOW_MAX_TOKENS"]) if os.environ.get("SHADOW_MAX_TOKENS") else None
+SHADOW_PROMPT_VARIANT = os.environ.get("SHADOW_PROMPT_VARIANT")  # e.g. "trimmed" -> owasp_agent_prompt.trimmed.txt
+
+# Topics whose agent reads policy.prompt_variant; the others always send their built-in prompt
+PROMPT_VARIANT_TOPICS = {"owasp"}
+
+# Shadow calls in flight at once; a sampled request is skipped rather than queued when all are busy
+SHADOW_CONCURRENCY = int(os.environ.get("SHADOW_CONCURRENCY", "2"))
+
+# Time budget for one shadow call (seconds)
+SHADOW_TIMEOUT_SECONDS = float(os.environ.get("SHADOW_TIMEOUT_SECONDS", "45"))
+
+
+def candidate_policy(topic: str, policy):
+    """
+    Returns the candidate version of a production policy (never hedged).
+
+    SHADOW_PROMPT_VARIANT only applies to PROMPT_VARIANT_TOPICS, so the comparison never
+    names a prompt the agent didn't send.
+    """
+    variant = SHADOW_PROMPT_VARIANT if topic in PROMPT_VARIANT_TOPICS else None
+    return replace(
+        policy,
+        model_id=SHADOW_MODEL_ID or policy.model_id,
+        max_tokens=SHADOW_MAX_TOKENS or policy.max_tokens,
+        prompt_variant=variant or policy.prompt_variant,
+        hedge=None,
+    )
+
+
+def differs(policy, candidate) -> bool:
+    """Whether the candidate would run anything other than production (hedging aside)."""
+    return replace(policy, hedge=None) != candidate
+
+
+def output_size(answer) -> int:
+    """Characters in an answer, whatever shape the agent returns."""
+    return len(answer if isinstance(answer, str) else json.dumps(answer))
+
+
+def measurement(policy, latency_ms: float, usage: dict, answer=None, error: BaseException = None) -> dict:
+    """Latency, token usage and output size of one run of a configuration."""
+    result = {
+        "model_id": policy.model_id,
+        "prompt_variant": policy.prompt_variant or "default",
+        "max_tokens": policy.max_tokens,
+        "latency_ms": int(latency_ms),
+        "calls": usage["calls"],
+        "input_tokens": usage["input_tokens"],
+        "output_tokens": usage["output_tokens"],
+        "output_chars": output_size(answer) if answer is not None else 0,
+    }
+    if error is not None:
+        result["error"] = f"{type(error).__name__}: {error}"[:256]
+    return result
+
+
+class ShadowRunner:
+    """
+    Runs sampled requests a second time against the candidate configuration, off the critical path.
+
+    The candidate runs on its own small pool after the production answer is ready and its
+    result is only recorded, never returned. Each comparison is logged as one JSON line and,
+    when a sink is set, passed to it with the request_id (the worker stores it next to the answer).
+
+    Lambda freezes the environment once the handler returns, so the handler calls drain()
+    first. A run still going after that is abandoned: its latency would include the frozen
+    time, so it is not recorded.
+    """
+
+    def __init__(self, concurrency: int = SHADOW_CONCURRENCY):
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="shadow")
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._in_flight = {}  # future -> Event set when the run is abandoned
+        self._in_flight_lock = threading.Lock()
+        self.sink = None  # callable(request_id, comparison: dict)
+
+    def should_shadow(self, topic: str) -> bool:
+        return SHADOW_SAMPLE_RATE > 0 and topic in SHADOW_TOPICS and random.random() < SHADOW_SAMPLE_RATE
+
+    def submit(self, topic: str, request_id: str, production: dict, policy, run_candidate) -> bool:
+        """
+        Starts the shadow run of a request unless every shadow slot is busy.
+
+        Args:
+            topic (str): The request's topic.
+            request_id (str): Used to store the comparison next to the production answer.
+            production (dict): measurement() of the production run.
+            policy (AgentPolicy): The candidate policy.
+            run_candidate (callable): Runs the agent with the candidate policy.
+
+        Returns:
+            bool: Whether the shadow run was started.
+        """
+        if not self._slots.acquire(blocking=False):
+            return False
+        abandoned = threading.Event()
+        try:
+            future = self._executor.submit(contextvars.copy_context().run, self._run, topic, request_id, production,
+                                           policy, run_candidate, abandoned)
+        except Exception:
+            self._slots.release()
+            raise
+        with self._in_flight_lock:
+            self._in_flight[future] = abandoned
+        future.add_done_callback(self._forget)
+        return True
+
+    def _forget(self, future):
+        with self._in_flight_lock:
+            self._in_flight.pop(future, None)
+
+    def drain(self, timeout: float) -> int:
+        """
+        Waits for the shadow runs in flight, abandoning any still going after `timeout` seconds.
+
+        Returns:
+            int: Number of runs abandoned.
+        """
+        with self._in_flight_lock:
+            in_flight = dict(self._in_flight)
+        if not in_flight:
+            return 0
+        _, pending = wait(list(in_flight), timeout=max(0.0, timeout))
+        for future in pending:
+            in_flight[future].set()
+        if pending:
+            logger.warning(f"⚠️ {len(pending)} shadow run(s) still going at the end of the invocation, not recorded")
+        return len(pending)
+
+    def _run(self, topic, request_id, production, policy, run_candidate, abandoned):
+        # Runs in a copy of the request's context: keep its log binding, not its metrics or trace
+        metrics.stop_request()
+        tracing.suppress()
+        try:
+            answer, error = None, None
+            with record_usage() as usage:
+                start = time.perf_counter()
+                try:
+                    answer = run_candidate()
+                except Exception as e:
+                    error = e
+                latency_ms = (time.perf_counter() - start) * 1000
+            if abandoned.is_set():
+                return
+
+            comparison = {
+                "topic": topic,
+                "production": production,
+                "shadow": measurement(policy, latency_ms, usage, answer, error),
+            }
+            logger.info(f"🌓 Shadow comparison for {request_id}: {json.dumps(comparison)}")
+            if self.sink is not None and request_id:
+                self.sink(request_id, comparison)
+        except Exception as e:
+            logger.warning(f"⚠️ Shadow run for {request_id} could not be recorded: {e}")
+        finally:
+            self._slots.release()
+
+
+# Process-wide runner used by agents.orchestrator.route_question
+shadow_runner = ShadowRunner()
@@ -0,0 +1,143 @@
+import os
+import json
+import random
+import logging
+import traceback
+import contextvars
+
+# Longest string kept in a logged field (characters); longer ones are cut with a note of what was dropped
+LOG_MAX_FIELD_CHARS = int(os.environ.get("LOG_MAX_FIELD_CHARS", "512"))
+
+# Fields whose values are never logged, at any depth (case-insensitive)
+LOG_REDACT_FIELDS = {
+    name.strip().lower()
+    for name in os.environ.get("LOG_REDACT_FIELDS", "password,secret,token,authorization,api_key,receipthandle").split(",")
+    if name.strip()
+}
+
+
+def _sample_rates(spec: str) -> dict:
+    rates = {}
+    for item in spec.split(","):
+        if "=" in item:
+            level, rate = item.split("=", 1)
+            rates[logging.getLevelName(level.strip().upper())] = float(rate)
+    return rates
+
+
+# Share of events kept per level, e.g. "DEBUG=0.01,INFO=1"; levels not listed are always kept
+LOG_SAMPLE_RATES = _sample_rates(os.environ.get("LOG_SAMPLE_RATES", "DEBUG=0,INFO=1,WARNING=1,ERROR=1"))
+
+# Requests logged in full (every level, no sampling) without changing their message
+LOG_DEBUG_REQUEST_IDS = set(filter(None, os.environ.get("LOG_DEBUG_REQUEST_IDS", "").split(",")))
+
+# Request fields added to every event of the record being processed
+_request = contextvars.ContextVar("log_request", default=None)
+
+# Own logger so DEBUG events reach the Lambda handler while the root logger stays at INFO
+_logger = logging.getLogger("worker.structured")
+_logger.setLevel(logging.DEBUG)
+
+
+def bind_request(request_id: str, topic: str = None, debug: bool = False):
+    """
+    Tags the rest of the current context's events with a request.
+
+    Args:
+        request_id (str): The request being processed.
+        topic (str, optional): Its topic.
+        debug (bool, optional): Log this request in full: DEBUG events and no sampling.
+            Also on for request IDs listed in LOG_DEBUG_REQUEST_IDS.
+
+    Each SQS record runs in its own copy of the context (see lambda_handler), so
+    the binding ends with the record.
+    """
+    _request.set({
+        "request_id": request_id,
+        "topic": topic,
+        "debug": bool(debug) or request_id in LOG_DEBUG_REQUEST_IDS,
+    })
+
+
+def _truncate(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}…[+{len(text) - limit} chars]"
+
+
+def scrub(value, limit: int = LOG_MAX_FIELD_CHARS, depth: int = 0):
+    """
+    Makes a value safe and cheap to log: redacts secret fields and cuts long strings.
+
+    Args:
+        value: Any JSON-like value (dicts, lists, strings, numbers); other objects are logged as str().
+        limit (int, optional): Longest string kept.
+
+    Returns:
+        The scrubbed copy.
+    """
+    if isinstance(value, dict):
+        if depth >= 4:
+            return _truncate(json.dumps(value, default=str), limit)
+        return {
+            key: "[REDACTED]" if str(key).lower() in LOG_REDACT_FIELDS else scrub(item, limit, depth + 1)
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        if depth >= 4:
+            return _truncate(json.dumps(value, default=str), limit)
+        return [scrub(item, limit, depth + 1) for item in value[:20]] + ([f"…[+{len(value) - 20} items]"] if len(value) > 20 else [])
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    return _truncate(value if isinstance(value, str) else str(value), limit)
+
+
+class StructuredLogger:
+    """
+    Writes one JSON object per event, with the bound request's fields.
+
+    Events are dropped per level according to LOG_SAMPLE_RATES before anything is
+    serialised, so a sampled-out DEBUG payload costs nothing. Field values are passed
+    through scrub(). A request bound with debug=True is logged in full.
+    """
+
+    def __init__(self, component: str):
+        self.component = component
+
+    def enabled(self, level: int) -> bool:
+        request = _request.get()
+        if request and request["debug"]:
+            return True
+        rate = LOG_SAMPLE_RATES.get(level, 1.0)
+        return rate >= 1 or (rate > 0 and random.random() < rate)
+
+    def log(self, level: int, message: str, **fields):
+        if not self.enabled(level):
+            return
+        event = {"level": logging.getLevelName(level), "component": self.component, "message": message}
+        request = _request.get()
+        if request:
+            event.update({key: value for key, value in request.items() if value})
+        event.update(scrub(fields))
+        _logger.log(level, json.dumps(event, ensure_ascii=False, default=str))
+
+    def debug(self, message: str, **fields):
+        self.log(logging.DEBUG, message, **fields)
+
+    def info(self, message: str, **fields):
+        self.log(logging.INFO, message, **fields)
+
+    def warning(self, message: str, **fields):
+        self.log(logging.WARNING, message, **fields)
+
+    def error(self, message: str, **fields):
+        self.log(logging.ERROR, message, **fields)
+
+    def exception(self, message: str, **fields):
+        """Logs an ERROR event with the traceback of the exception being handled."""
+        self.log(logging.ERROR, message, traceback=traceback.format_exc(limit=-3), **fields)
+
+
+def get_logger(component: str) -> StructuredLogger:
+    """Returns a structured logger for a module (use its short name, e.g. "labhint_agent")."""
+    return StructuredLogger(component)
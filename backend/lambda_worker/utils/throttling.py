@@ -0,0 +1,213 @@
+import os
+import time
+import logging
+import threading
+from utils.aws_clients import MAX_POOL_CONNECTIONS
+from utils.deadline import DeadlineExceeded
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# AIMD concurrency limit per (model, region): start, floor and ceiling
+AIMD_INITIAL_LIMIT = float(os.environ.get("AIMD_INITIAL_LIMIT", "4"))
+AIMD_MIN_LIMIT = float(os.environ.get("AIMD_MIN_LIMIT", "1"))
+AIMD_MAX_LIMIT = float(os.environ.get("AIMD_MAX_LIMIT", str(MAX_POOL_CONNECTIONS)))
+
+# Limit multiplier applied when a call is throttled
+AIMD_DECREASE_FACTOR = float(os.environ.get("AIMD_DECREASE_FACTOR", "0.5"))
+
+# Consecutive failures (throttling, 5xx, timeouts) that open the circuit
+CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get("CIRCUIT_FAILURE_THRESHOLD", "5"))
+
+# How long an open circuit fails fast before letting a probe call through (seconds)
+CIRCUIT_OPEN_SECONDS = float(os.environ.get("CIRCUIT_OPEN_SECONDS", "20"))
+
+# Outcomes returned by the classify callback of ModelCallGuard.call
+THROTTLED = "throttled"
+FAILED = "failed"
+NOT_SENT = "not_sent"  # failed before the request went out: says nothing about the service
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling the model while its circuit is open."""
+
+    def __init__(self, key, retry_after: float):
+        super().__init__(f"Circuit open for {key}, retry in {retry_after:.1f}s")
+        self.key = key
+        self.retry_after = retry_after
+
+
+class AimdLimiter:
+    """
+    Concurrency limit that grows by one per limit's worth of successes and halves on throttling.
+
+    Throttles from calls started before the last decrease are ignored, so one burst of
+    concurrent throttles only halves the limit once.
+    """
+
+    def __init__(self, initial: float = AIMD_INITIAL_LIMIT, minimum: float = AIMD_MIN_LIMIT,
+                 maximum: float = AIMD_MAX_LIMIT):
+        self.limit = min(max(initial, minimum), maximum)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self, deadline=None) -> float:
+        """
+        Waits for a free permit.
+
+        Returns:
+            float: The acquire time, to pass back to release.
+
+        Raises:
+            DeadlineExceeded: If no permit frees up before the deadline.
+        """
+        with self._cond:
+            while self.in_flight >= max(1, int(self.limit)):
+                timeout = deadline.remaining() if deadline is not None else None
+                if timeout is not None and timeout <= 0:
+                    raise DeadlineExceeded("No Bedrock capacity freed up before the deadline")
+                self._cond.wait(timeout)
+            self.in_flight += 1
+            return time.monotonic()
+
+    def release(self, started_at: float, succeeded: bool = True, throttled: bool = False):
+        with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                if started_at >= self._last_decrease:
+                    self.limit = max(self.minimum, self.limit * AIMD_DECREASE_FACTOR)
+                    self._last_decrease = time.monotonic()
+            elif succeeded:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+
+class CircuitBreaker:
+    """Closed → open after repeated failures → half-open single probe → closed again on success."""
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, key, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 open_seconds: float = CIRCUIT_OPEN_SECONDS):
+        self.key = key
+        self.state = self.CLOSED
+        self.failures = 0
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raises CircuitOpenError unless the call may go ahead."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            retry_after = self._opened_at + self.open_seconds - time.monotonic()
+            if self.state == self.OPEN and retry_after <= 0:
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return
+            raise CircuitOpenError(self.key, max(retry_after, 1.0))
+
+    def abandon_probe(self):
+        """Frees the half-open probe slot when the probe call never started."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record(self, failed: bool):
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probe_in_flight = False
+            if not failed:
+                if self.state != self.CLOSED:
+                    logger.info(f"🟢 Circuit closed for {self.key}")
+                self.state, self.failures = self.CLOSED, 0
+                return
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"🔴 Circuit opened for {self.key} after {self.failures} failure(s)")
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+class ModelCallGuard:
+    """One AIMD limiter and circuit breaker per (model, region), shared by every thread."""
+
+    def __init__(self):
+        self._limiters = {}
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        with self._lock:
+            if key not in self._limiters:
+                self._limiters[key] = AimdLimiter()
+                self._breakers[key] = CircuitBreaker(key)
+            return self._limiters[key], self._breakers[key]
+
+    def call(self, key, fn, deadline=None, classify=None):
+        """
+        Runs `fn` under the limiter and circuit breaker of `key`.
+
+        Args:
+            key: (model_id, region) of the call.
+            fn (callable): The model call.
+            deadline (Deadline, optional): Bounds the wait for a permit.
+            classify (callable, optional): Maps an error to THROTTLED, FAILED, NOT_SENT for
+                errors raised before the request went out, or None for errors that prove the
+                service is reachable (e.g. a bad request).
+
+        Raises:
+            CircuitOpenError: While the circuit is open (fn is not called).
+            DeadlineExceeded: If no permit frees up before the deadline.
+        """
+        limiter, breaker = self._get(key)
+        breaker.before_call()
+        try:
+            started_at = limiter.acquire(deadline)
+        except Exception:
+            breaker.abandon_probe()
+            raise
+
+        try:
+            result = fn()
+        except Exception as e:
+            outcome = classify(e) if classify else FAILED
+            limiter.release(started_at, succeeded=False, throttled=outcome == THROTTLED)
+            if outcome == NOT_SENT:
+                # Nothing reached the model: a half-open probe is still owed, not passed
+                breaker.abandon_probe()
+                raise
+            # An error unrelated to service health (e.g. a bad request) still proves it is reachable
+            breaker.record(failed=outcome is not None)
+            raise
+
+        limiter.release(started_at)
+        breaker.record(failed=False)
+        return result
+
+    def stats(self) -> dict:
+        """Returns the current limit, in-flight calls and circuit state per (model, region)."""
+        with self._lock:
+            return {
+                f"{key[0]}@{key[1]}": {
+                    "limit": round(self._limiters[key].limit, 2),
+                    "in_flight": self._limiters[key].in_flight,
+                    "circuit": self._breakers[key].state,
+                }
+                for key in self._limiters
+            }
+
+
+# Process-wide guard wrapped around every Bedrock model call
+call_guard = ModelCallGuard()
+
+
+def get_throttle_stats() -> dict:
+    return call_guard.stats()
@@ -0,0 +1,294 @@
+"""
+Request tracing across the submit Lambda, SQS, the worker, agents, Bedrock and DynamoDB.
+
+Trace context travels as a W3C traceparent ("00-<trace id>-<span id>-<flags>") in the
+SQS message attribute "traceparent". Each process records its spans in memory and,
+when its local root span ends, decides whether to keep the whole trace (tail-based
+sampling): slow traces (TRACE_SLOW_MS), failed ones and sampled ones are exported;
+everything else is dropped. A TRACE_SAMPLE_RATE share of traces is sampled where the
+trace starts (the submit Lambda) and the decision travels in the traceparent flag, so
+every process keeps the same traces.
+
+Exporters are pluggable (set_exporter, or TRACE_EXPORTER): "log" (default, one JSON
+line per span in the function's logs), "file" (JSON lines in TRACE_FILE, for tests and
+local runs) or "none".
+"""
+import os
+import json
+import time
+import random
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Traces kept regardless of sampling when their local root takes at least this long (ms)
+TRACE_SLOW_MS = float(os.environ.get("TRACE_SLOW_MS", "15000"))
+
+# Share of new traces kept whatever their duration (decided where the trace starts)
+TRACE_SAMPLE_RATE = float(os.environ.get("TRACE_SAMPLE_RATE", "0.01"))
+
+TRACE_EXPORTER = os.environ.get("TRACE_EXPORTER", "log")
+TRACE_FILE = os.environ.get("TRACE_FILE", "/tmp/traces.jsonl")
+
+# SQS message attribute carrying the trace context
+TRACEPARENT_ATTRIBUTE = "traceparent"
+
+# Most spans buffered per trace; later ones are counted but not kept
+MAX_SPANS_PER_TRACE = 200
+
+
+class _Trace:
+    """Spans of one trace finished in this process, waiting for the sampling decision."""
+
+    def __init__(self, sampled: bool):
+        self.sampled = sampled
+        self.spans = []
+        self.dropped = 0
+        self.failed = False
+        self.closed = False
+        self.lock = threading.Lock()
+
+    def add(self, span: dict, failed: bool = False):
+        with self.lock:
+            if self.closed:
+                return  # finished after its local root (e.g. a hedge that lost): not kept
+            self.failed = self.failed or failed
+            if len(self.spans) < MAX_SPANS_PER_TRACE:
+                self.spans.append(span)
+            else:
+                self.dropped += 1
+
+
+class Span:
+    """One timed operation in a trace."""
+
+    __slots__ = ("trace", "trace_id", "span_id", "parent_id", "name", "attributes", "start_ns", "end_ns",
+                 "error", "_started")
+
+    def __init__(self, trace: _Trace, trace_id: str, parent_id: str, name: str, attributes: dict):
+        self.trace = trace
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = {key: value for key, value in attributes.items() if value is not None}
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.error = None
+        self._started = time.perf_counter()
+
+    def child(self, name: str, attributes: dict) -> "Span":
+        return Span(self.trace, self.trace_id, self.span_id, name, attributes)
+
+    def set(self, key: str, value):
+        if value is not None:
+            self.attributes[key] = value
+
+    def finish(self):
+        if self.end_ns is None:
+            self.end_ns = self.start_ns + int((time.perf_counter() - self._started) * 1e9)
+        self.trace.add(self.to_dict(), failed=self.error is not None)
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "duration_ms": round(self.duration_ms, 2),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class LogExporter:
+    """Writes each span as one JSON line in the function's logs."""
+
+    def export(self, spans: list):
+        for span in spans:
+            logger.info(f"🧵 {json.dumps(span, default=str)}")
+
+
+class FileExporter:
+    """Appends each span as one JSON line to a file (tests, local runs)."""
+
+    def __init__(self, path: str = TRACE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans: list):
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            for span in spans:
+                f.write(json.dumps(span, default=str) + "\n")
+
+
+class NoopExporter:
+    def export(self, spans: list):
+        pass
+
+
+EXPORTERS = {"log": LogExporter, "file": FileExporter, "none": NoopExporter}
+
+_exporter = EXPORTERS.get(TRACE_EXPORTER, LogExporter)()
+
+# Span the current context's new spans are children of (None = not tracing)
+_current = contextvars.ContextVar("trace_span", default=None)
+_SUPPRESSED = object()
+
+
+def set_exporter(exporter):
+    """Replaces the exporter; any object with export(spans: list[dict])."""
+    global _exporter
+    _exporter = exporter
+
+
+def parse_traceparent(value: str):
+    """
+    Reads a W3C traceparent.
+
+    Returns:
+        tuple: (trace_id, parent span_id, sampled flag), or None if the value isn't valid.
+    """
+    parts = (value or "").strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or set(parts[1]) == {"0"}:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+        flags = int(parts[3], 16)
+    except ValueError:
+        return None
+    return parts[1], parts[2], bool(flags & 1)
+
+
+def format_traceparent(trace_id: str, span_id: str, sampled: bool = False) -> str:
+    return f"00-{trace_id}-{span_id}-{'01' if sampled else '00'}"
+
+
+def current_traceparent():
+    """traceparent of the current span, to pass downstream; None when not tracing."""
+    span = _current.get()
+    if span is None or span is _SUPPRESSED:
+        return None
+    return format_traceparent(span.trace_id, span.span_id, span.trace.sampled)
+
+
+def current_trace_id():
+    span = _current.get()
+    return None if span is None or span is _SUPPRESSED else span.trace_id
+
+
+def _keep(trace: _Trace, root: Span) -> bool:
+    return trace.sampled or trace.failed or root.duration_ms >= TRACE_SLOW_MS
+
+
+@contextmanager
+def start_trace(name: str, traceparent: str = None, sampled: bool = False, **attributes):
+    """
+    Opens this process's local root span, continuing the incoming trace if there is one.
+
+    When the block ends the trace's spans are exported or dropped (tail-based sampling).
+
+    Args:
+        name (str): Span name.
+        traceparent (str, optional): Incoming W3C traceparent; a new trace starts without one.
+        sampled (bool, optional): Keep this trace whatever its duration (e.g. debug requests).
+            A new trace is also sampled at TRACE_SAMPLE_RATE; a continued one follows the
+            incoming flag.
+        **attributes: Span attributes (None values are left out).
+
+    Yields:
+        Span: The root span.
+    """
+    incoming = parse_traceparent(traceparent) if traceparent else None
+    if incoming:
+        trace_id, parent_id, upstream_sampled = incoming
+    else:
+        trace_id, parent_id = os.urandom(16).hex(), None
+        upstream_sampled = TRACE_SAMPLE_RATE > 0 and random.random() < TRACE_SAMPLE_RATE
+
+    trace = _Trace(sampled or upstream_sampled)
+    root = Span(trace, trace_id, parent_id, name, attributes)
+    token = _current.set(root)
+    try:
+        yield root
+    except BaseException as e:
+        root.error = f"{type(e).__name__}: {e}"[:256]
+        raise
+    finally:
+        _current.reset(token)
+        root.finish()
+        with trace.lock:
+            trace.closed = True
+        if _keep(trace, root):
+            # The root finishes last, so it is itself dropped once the trace hits MAX_SPANS_PER_TRACE
+            root_dict = next((s for s in trace.spans if s["span_id"] == root.span_id), None)
+            if trace.dropped and root_dict is not None:
+                root_dict["attributes"]["dropped_spans"] = trace.dropped
+            try:
+                _exporter.export(trace.spans)
+            except Exception as e:
+                logger.warning(f"⚠️ Could not export trace {trace_id}: {e}")
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Records the block as a child of the current span.
+
+    Outside a trace (or under suppress()) it records nothing and yields None.
+    """
+    parent = _current.get()
+    if parent is None or parent is _SUPPRESSED:
+        yield None
+        return
+
+    child = parent.child(name, attributes)
+    token = _current.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.error = f"{type(e).__name__}: {e}"[:256]
+        raise
+    finally:
+        _current.reset(token)
+        child.finish()
+
+
+def record_span(name: str, start_ns: int, end_ns: int, **attributes):
+    """Records an operation that was timed elsewhere (e.g. the wait on the queue) under the current span."""
+    parent = _current.get()
+    if parent is None or parent is _SUPPRESSED:
+        return
+    recorded = parent.child(name, attributes)
+    recorded.start_ns = start_ns
+    recorded.end_ns = max(start_ns, end_ns)
+    recorded.finish()
+
+
+def annotate(**attributes):
+    """Adds attributes to the current span."""
+    current = _current.get()
+    if current is not None and current is not _SUPPRESSED:
+        for key, value in attributes.items():
+            current.set(key, value)
+
+
+def keep_trace():
+    """Keeps the current trace whatever its duration (e.g. a request sent with "debug": true)."""
+    current = _current.get()
+    if current is not None and current is not _SUPPRESSED:
+        current.trace.sampled = True
+
+
+def suppress():
+    """Stops recording spans in the current context (work that isn't part of the request, e.g. shadow runs)."""
+    _current.set(_SUPPRESSED)
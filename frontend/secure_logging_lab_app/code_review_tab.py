@@ -9,6 +9,7 @@ from utils import poll_for_answer, extract_codereview_feedback
 API_URL = st.secrets["api"]["codereview_presign_api"]
 ASK_URL = st.secrets["api"]["ask_url"]
 ANSWER_URL = st.secrets["api"]["get_answer_url"]
+CANCEL_URL = st.secrets["api"].get("cancel_url")
 
 # --- In-memory Comment Store ---
 COMMENTS_DB = {}
@@ -144,7 +145,7 @@ def render_code_review_tab():
                 return
 
             with st.spinner("Awaiting feedback..."):
-                answer = poll_for_answer(ANSWER_URL, request_id, max_attempts=10, delay_sec=3)
+                answer = poll_for_answer(ANSWER_URL, request_id, max_attempts=10, delay_sec=3, cancel_url=CANCEL_URL)
                 feedback = extract_codereview_feedback(answer)
 
             if st.session_state.get("lecturer_authenticated"):
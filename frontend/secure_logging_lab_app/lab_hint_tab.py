@@ -6,6 +6,7 @@ from utils import poll_for_answer
 
 ASK_URL = st.secrets["api"]["ask_url"]
 GET_URL = st.secrets["api"]["get_answer_url"]
+CANCEL_URL = st.secrets["api"].get("cancel_url")
 
 def render_lab_hint_tab(lab_choice="default_lab", step_choice="default_step"):
     st.subheader("💡 LabHints Agent")
@@ -56,7 +57,8 @@ def render_lab_hint_tab(lab_choice="default_lab", step_choice="default_step"):
                 request_id,
                 max_attempts=15,
                 delay_sec=3,
-                debug_sidebar=st.sidebar
+                debug_sidebar=st.sidebar,
+                cancel_url=CANCEL_URL
             )
 
             st.subheader("🔎 Hint")
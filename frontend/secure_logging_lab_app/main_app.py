@@ -133,7 +133,8 @@ if user_type == "Lecturer" and st.session_state["lecturer_authenticated"]:
                             st.session_state.request_id,
                             max_attempts=10,
                             delay_sec=3,
-                            debug_sidebar=st.sidebar
+                            debug_sidebar=st.sidebar,
+                            cancel_url=st.secrets["api"].get("cancel_url")
                         )
 
                         try:
@@ -25,7 +25,23 @@ def get_filename(prefix, lab, step, ext):
 
 
 
-def poll_for_answer(get_url, request_id, max_attempts=10, delay_sec=3, debug_sidebar=None):
+def cancel_request(cancel_url, request_id):
+    """
+    Asks the backend to drop a request nobody is waiting for any more.
+
+    Args:
+        cancel_url (str): URL of the Cancel API (None does nothing).
+        request_id (str): Request ID returned from Ask API.
+    """
+    if not cancel_url:
+        return
+    try:
+        requests.post(cancel_url, params={"request_id": request_id}, timeout=5)
+    except Exception:
+        pass
+
+
+def poll_for_answer(get_url, request_id, max_attempts=10, delay_sec=3, debug_sidebar=None, cancel_url=None):
     """
     Polls the Get Answer API until a valid response is received or timeout occurs.
 
@@ -35,6 +51,7 @@ def poll_for_answer(get_url, request_id, max_attempts=10, delay_sec=3, debug_sid
         max_attempts (int): Maximum number of polling attempts.
         delay_sec (int): Delay in seconds between attempts.
         debug_sidebar (st.sidebar or None): Optional Streamlit sidebar for debug output.
+        cancel_url (str or None): Cancel API URL; the request is cancelled if polling gives up.
 
     Returns:
         dict: Parsed response JSON or empty dict if failed.
@@ -60,6 +77,7 @@ def poll_for_answer(get_url, request_id, max_attempts=10, delay_sec=3, debug_sid
         except Exception as e:
             if debug_sidebar:
                 debug_sidebar.error(f"❌ Polling error: {e}")
+    cancel_request(cancel_url, request_id)
     return {}
 
 
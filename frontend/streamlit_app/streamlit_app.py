@@ -23,6 +23,7 @@ if not is_connected():
 # --- API and Secrets ---
 ASK_URL = st.secrets["api"]["ask_url"]
 GET_ANSWER_URL = st.secrets["api"]["get_answer_url"]
+CANCEL_URL = st.secrets["api"].get("cancel_url")
 HISTORY_URL = st.secrets["api"]["history_url"]
 DELETE_URL = st.secrets["api"]["delete_url"]
 ADMIN_PASSCODE = st.secrets["api"]["admin_passcode"]
@@ -132,6 +133,13 @@ with tab1:
                 except Exception:
                     raw_response = answer_response.text
                     continue
+            else:
+                # ⌛ Gave up waiting: cancel so the worker doesn't spend Bedrock time on it
+                if CANCEL_URL:
+                    try:
+                        requests.post(CANCEL_URL, params={"request_id": returned_request_id}, timeout=5)
+                    except requests.exceptions.RequestException:
+                        pass
 
         if answer_text:
             st.session_state.pop("persisted_request_id", None)
@@ -1,6 +1,19 @@
-from aws_cdk import Stack, aws_cloudwatch as cw
+from aws_cdk import Duration, Stack, aws_cloudwatch as cw
 from constructs import Construct
 
+# Namespace of the worker's per-stage EMF metrics (backend/lambda_worker/utils/metrics.py)
+WORKER_METRICS_NAMESPACE = "RAGWorker"
+
+
+def stage_by_topic(metric_name: str, statistic: str, label: str) -> cw.MathExpression:
+    """One line per topic for a worker stage metric (topic-only roll-up dimension)."""
+    return cw.MathExpression(
+        expression=f"SEARCH('{{{WORKER_METRICS_NAMESPACE},topic}} MetricName=\"{metric_name}\"', '{statistic}', 300)",
+        label=label,
+        period=Duration.minutes(5),
+    )
+
+
 class MonitoringDashboardStack(Stack):
     def __init__(self, scope: Construct, id: str, *, worker_lambda, submit_lambda, rag_queue, dlq, api, **kwargs):
         super().__init__(scope, id, **kwargs)
@@ -30,6 +43,39 @@ class MonitoringDashboardStack(Stack):
             )
         )
 
+        # 📊 Where the time goes inside a request, per topic (p95)
+        dashboard.add_widgets(
+            cw.GraphWidget(
+                title="Queue Wait p95 (ms)",
+                left=[stage_by_topic("QueueWaitMs", "p95", "Queue wait")]
+            ),
+            cw.GraphWidget(
+                title="Prompt Build p95 (ms)",
+                left=[stage_by_topic("PromptBuildMs", "p95", "Prompt build")]
+            ),
+            cw.GraphWidget(
+                title="Bedrock / Retrieval p95 (ms)",
+                left=[
+                    stage_by_topic("BedrockMs", "p95", "InvokeModel"),
+                    stage_by_topic("RetrieveAndGenerateMs", "p95", "RetrieveAndGenerate"),
+                ]
+            ),
+            cw.GraphWidget(
+                title="DynamoDB Write p95 (ms)",
+                left=[stage_by_topic("DynamoWriteMs", "p95", "Save answer")]
+            ),
+            cw.GraphWidget(
+                title="Tokens per 5 min",
+                left=[stage_by_topic("InputTokens", "Sum", "Input")],
+                right=[stage_by_topic("OutputTokens", "Sum", "Output")]
+            ),
+            cw.GraphWidget(
+                title="Record Total p95 (ms) / Failures",
+                left=[stage_by_topic("TotalMs", "p95", "Total")],
+                right=[stage_by_topic("Failed", "Sum", "Failed")]
+            )
+        )
+
         cw.Alarm(self, "DLQAlarm",
             metric=dlq.metric_approximate_number_of_messages_visible(),
             threshold=1,
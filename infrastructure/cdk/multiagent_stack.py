@@ -24,6 +24,13 @@ class MultiAgentStack(Stack):
         kb_id = self.node.try_get_context("kb_id") or "owasp-kb-001"
         rag_endpoint = self.node.try_get_context("rag_endpoint_url") or "https://bedrock-runtime.ap-southeast-1.amazonaws.com"
         kb_bucket_name = self.node.try_get_context("kb_bucket_name")
+        bedrock_regions = self.node.try_get_context("bedrock_regions") or self.region
+        # Account quotas for MODEL_ID per region, shared by all workers (0 = not limited)
+        quota_rpm = str(self.node.try_get_context("quota_rpm") or 0)
+        quota_tpm = str(self.node.try_get_context("quota_tpm") or 0)
+        # Optional on-demand profiling of the worker and history Lambdas (utils/profiling.py)
+        profile_bucket_name = self.node.try_get_context("profile_bucket_name")
+        profile_sample_rate = str(self.node.try_get_context("profile_sample_rate") or 0)
 
         self.dead_letter_queue = sqs.Queue(
             self, "RAGDLQ",
@@ -47,11 +54,37 @@ class MultiAgentStack(Stack):
             billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST
         )
 
+        # One record per request_id so redelivered SQS messages don't invoke the model twice
+        self.idempotency_table = dynamodb.Table(
+            self, "IdempotencyTable",
+            partition_key={"name": "request_id", "type": dynamodb.AttributeType.STRING},
+            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+            time_to_live_attribute="expires_at"
+        )
+
+        self.quota_table = dynamodb.Table(
+            self, "QuotaTable",
+            partition_key={"name": "bucket_id", "type": dynamodb.AttributeType.STRING},
+            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST
+        )
+
+        # Transient failures are re-sent here with a delay, so they don't compete with fresh questions
+        self.retry_queue = sqs.Queue(
+            self, "RAGRetryQueue",
+            queue_name="RAGRetryQueue",
+            visibility_timeout=Duration.seconds(60),
+            dead_letter_queue=sqs.DeadLetterQueue(
+                max_receive_count=5,
+                queue=self.dead_letter_queue
+            )
+        )
+
         self.submit_lambda = _lambda.Function(
             self, "SubmitLambda",
             runtime=_lambda.Runtime.PYTHON_3_11,
             handler="lambda_function.lambda_handler",
             code=_lambda.Code.from_asset(str(Path(__file__).resolve().parents[2] / "backend" / "lambda_submit")),
+            timeout=Duration.seconds(15),  # dry runs wait for the worker's estimate
             environment={"QUEUE_URL": self.rag_queue.queue_url},
         )
         self.rag_queue.grant_send_messages(self.submit_lambda)
@@ -67,11 +100,37 @@ class MultiAgentStack(Stack):
                 "MODEL_ID": model_id,
                 "KB_ID": kb_id,
                 "RAG_ENDPOINT_URL": rag_endpoint,
-                "TABLE_NAME": self.response_table.table_name
+                "TABLE_NAME": self.response_table.table_name,
+                "IDEMPOTENCY_TABLE_NAME": self.idempotency_table.table_name,
+                "WORKER_CONCURRENCY": "10",
+                "BEDROCK_REGIONS": bedrock_regions,
+                "QUOTA_TABLE_NAME": self.quota_table.table_name,
+                "QUOTA_RPM": quota_rpm,
+                "QUOTA_TPM": quota_tpm,
+                "RETRY_QUEUE_URL": self.retry_queue.queue_url,
+                "DEAD_LETTER_QUEUE_URL": self.dead_letter_queue.queue_url
             }
         )
-        self.worker_lambda.add_event_source(lambda_event_sources.SqsEventSource(self.rag_queue, batch_size=1))
+        self.worker_lambda.add_event_source(lambda_event_sources.SqsEventSource(
+            self.rag_queue,
+            batch_size=10,
+            report_batch_item_failures=True
+        ))
+        self.worker_lambda.add_event_source(lambda_event_sources.SqsEventSource(
+            self.retry_queue,
+            batch_size=10,
+            report_batch_item_failures=True,
+            max_concurrency=2
+        ))
+        self.retry_queue.grant_send_messages(self.worker_lambda)
+        self.dead_letter_queue.grant_send_messages(self.worker_lambda)
         self.response_table.grant_write_data(self.worker_lambda)
+        self.idempotency_table.grant_read_write_data(self.worker_lambda)
+        self.quota_table.grant_read_write_data(self.worker_lambda)
+
+        # 🧮 Dry runs on /ask are estimated by the worker, invoked synchronously
+        self.submit_lambda.add_environment("WORKER_FUNCTION_NAME", self.worker_lambda.function_name)
+        self.worker_lambda.grant_invoke(self.submit_lambda)
         self.worker_lambda.add_to_role_policy(iam.PolicyStatement(
             actions=["bedrock:*"],
             resources=["*"]
@@ -95,6 +154,26 @@ class MultiAgentStack(Stack):
         )
         self.response_table.grant_read_data(self.get_history_lambda)
 
+        # 🔬 Profiles go to S3 when a bucket is configured, otherwise to /tmp of the invocation
+        for profiled_lambda in (self.worker_lambda, self.get_history_lambda):
+            profiled_lambda.add_environment("PROFILE_SAMPLE_RATE", profile_sample_rate)
+            if profile_bucket_name:
+                profiled_lambda.add_environment("PROFILE_OUTPUT", f"s3://{profile_bucket_name}/profiles")
+        if profile_bucket_name:
+            profile_bucket = s3.Bucket.from_bucket_name(self, "ProfileBucket", profile_bucket_name)
+            profile_bucket.grant_put(self.worker_lambda, "profiles/*")
+            profile_bucket.grant_put(self.get_history_lambda, "profiles/*")
+
+        # Lets clients that stop polling cancel their request before the worker calls Bedrock
+        self.cancel_lambda = _lambda.Function(
+            self, "CancelLambda",
+            runtime=_lambda.Runtime.PYTHON_3_11,
+            handler="lambda_function.lambda_handler",
+            code=_lambda.Code.from_asset(str(Path(__file__).resolve().parents[2] / "backend" / "lambda_cancel")),
+            environment={"IDEMPOTENCY_TABLE_NAME": self.idempotency_table.table_name}
+        )
+        self.idempotency_table.grant_read_write_data(self.cancel_lambda)
+
         bucket = s3.Bucket.from_bucket_name(self, "KnowledgeBaseBucket", kb_bucket_name)
 
         self.presign_lambda = _lambda.Function(
@@ -162,6 +241,10 @@ class MultiAgentStack(Stack):
         get_history_resource.add_method("GET", apigateway.LambdaIntegration(self.get_history_lambda))
         get_history_resource.add_cors_preflight(allow_origins=apigateway.Cors.ALL_ORIGINS, allow_methods=["GET"])
 
+        cancel_resource = self.api.root.add_resource("cancel")
+        cancel_resource.add_method("POST", apigateway.LambdaIntegration(self.cancel_lambda))
+        cancel_resource.add_cors_preflight(allow_origins=apigateway.Cors.ALL_ORIGINS, allow_methods=["POST"])
+
         presigned_url_resource = self.api.root.add_resource("presigned-url")
         presigned_url_resource.add_method("POST", apigateway.LambdaIntegration(self.presign_lambda))
         presigned_url_resource.add_cors_preflight(allow_origins=apigateway.Cors.ALL_ORIGINS, allow_methods=["POST"])
@@ -186,6 +269,7 @@ class MultiAgentStack(Stack):
         CfnOutput(self, "SubmitLambdaName", value=self.submit_lambda.function_name, export_name="SubmitLambdaName")
         CfnOutput(self, "WorkerLambdaName", value=self.worker_lambda.function_name, export_name="WorkerLambdaName")
         CfnOutput(self, "GetAnswerLambdaName", value=self.get_answer_lambda.function_name, export_name="GetAnswerLambdaName")
+        CfnOutput(self, "CancelLambdaName", value=self.cancel_lambda.function_name, export_name="CancelLambdaName")
         CfnOutput(self, "GetHistoryLambdaName", value=self.get_history_lambda.function_name, export_name="GetHistoryLambdaName")
         CfnOutput(self, "ApiBaseUrl", value=self.api.url, export_name="RAGApiUrl")
         CfnOutput(self, "RagQueueUrl", value=self.rag_queue.queue_url, export_name="RagQueueUrl")